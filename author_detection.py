@@ -0,0 +1,125 @@
+# author_detection.py
+# ------------------------------------------------------------
+# Détection des chercheurs du laboratoire (liste téléversée) parmi les
+# auteurs Crossref des publications, partagée par les applications.
+# Même résultat que get_close_matches appelé pour chaque auteur (nom
+# complet, cutoff 0.85, puis forme à initiale, cutoff 0.9), mais chaque
+# nom distinct n'est traité qu'une fois : recherche exacte dans un
+# dictionnaire d'abord, puis scores flous calculés par lots pour les
+# noms restants seulement.
+# ------------------------------------------------------------
+
+from difflib import SequenceMatcher, get_close_matches
+
+import numpy as np
+import pandas as pd
+
+from normalisation import normalize_name
+from utils import get_initial_form
+
+# --- Optionnel : rapidfuzz pour le calcul des scores par lots
+try:
+    from rapidfuzz import fuzz, process
+    USE_RAPIDFUZZ = True
+except ImportError:
+    USE_RAPIDFUZZ = False
+
+FULL_NAME_CUTOFF = 0.85  # similarité minimale sur le nom complet normalisé
+INITIAL_FORM_CUTOFF = 0.9  # similarité minimale sur la forme « initiale nom »
+AUTHOR_DETECTION_CHUNK_ROWS = 1024  # noms scorés ensemble contre toute la liste (rapidfuzz)
+
+
+def _closest_matches(names, reference_keys, cutoff):
+    """
+    nom -> clé de reference_keys retenue par get_close_matches(nom, reference_keys, n=1, cutoff),
+    pour les noms qui en ont une.
+
+    Avec rapidfuzz, fuzz.ratio (distance Indel) majore le ratio de SequenceMatcher : cdist écarte
+    par lots les clés sous le seuil, puis le ratio exact départage les clés restantes (même score,
+    même ordre de préférence que get_close_matches).
+    """
+    matches = {}
+    if not names or not reference_keys:
+        return matches
+    if not USE_RAPIDFUZZ:
+        for name in names:
+            match = get_close_matches(name, reference_keys, n=1, cutoff=cutoff)
+            if match:
+                matches[name] = match[0]
+        return matches
+
+    score_cutoff = cutoff * 100 - 1e-6  # marge pour les arrondis flottants, le ratio exact tranche
+    for chunk_start in range(0, len(names), AUTHOR_DETECTION_CHUNK_ROWS):
+        chunk_names = names[chunk_start:chunk_start + AUTHOR_DETECTION_CHUNK_ROWS]
+        scores = process.cdist(chunk_names, reference_keys, scorer=fuzz.ratio, score_cutoff=score_cutoff,
+                               dtype=np.float64, workers=-1)
+        for row, col in zip(*np.nonzero(scores)):
+            name, key = chunk_names[row], reference_keys[col]
+            score = SequenceMatcher(None, key, name).ratio()
+            if score >= cutoff and (score, key) > matches.get(name, (-1, "")):
+                matches[name] = (score, key)
+    return {name: key for name, (score, key) in matches.items()}
+
+
+class KnownAuthorDetector(object):
+    """
+    Chercheurs de reference_names présents parmi les auteurs d'une publication.
+    detect_all(chaînes « Auteur 1; Auteur 2 » de la colonne Auteurs_Crossref) retourne, pour chaque
+    publication, les noms de la liste détectés, triés et séparés par « ; » ("" si aucun).
+    """
+
+    def __init__(self, reference_names, full_cutoff=FULL_NAME_CUTOFF, initial_cutoff=INITIAL_FORM_CUTOFF):
+        self.full_map = {normalize_name(n): n for n in reference_names}
+        self.initial_map = {get_initial_form(normalize_name(n)): n for n in reference_names}
+        self.full_keys = list(self.full_map)
+        self.initial_keys = list(self.initial_map)
+        self.full_cutoff = full_cutoff
+        self.initial_cutoff = initial_cutoff
+
+    @staticmethod
+    def split_authors(authors_crossref_str):
+        if pd.isna(authors_crossref_str) or not str(authors_crossref_str).strip():
+            return []
+        authors_crossref_str = str(authors_crossref_str)
+        if "Erreur" in authors_crossref_str or "Timeout" in authors_crossref_str:
+            return []
+        return [a.strip() for a in authors_crossref_str.split(';') if a.strip()]
+
+    def match_names(self, author_names):
+        """Nom d'auteur -> nom de la liste correspondant, pour les noms distincts de author_names qui en ont un."""
+        normalized = {name: normalize_name(name) for name in set(author_names)}
+        found = {}
+
+        # Nom complet : correspondance exacte, puis floue pour les noms restants
+        unmatched_full = set()
+        for norm in set(normalized.values()):
+            if norm in self.full_map:
+                found[norm] = self.full_map[norm]
+            else:
+                unmatched_full.add(norm)
+        fuzzy_full = _closest_matches(sorted(unmatched_full), self.full_keys, self.full_cutoff)
+        for norm, key in fuzzy_full.items():
+            found[norm] = self.full_map[key]
+
+        # Forme à initiale, pour les noms sans correspondance sur le nom complet
+        initial_by_norm = {norm: get_initial_form(norm) for norm in unmatched_full if norm not in fuzzy_full}
+        unmatched_initial = set()
+        for norm, initial in initial_by_norm.items():
+            if initial in self.initial_map:
+                found[norm] = self.initial_map[initial]
+            else:
+                unmatched_initial.add(initial)
+        fuzzy_initial = _closest_matches(sorted(unmatched_initial), self.initial_keys, self.initial_cutoff)
+        for norm, initial in initial_by_norm.items():
+            if initial in fuzzy_initial:
+                found[norm] = self.initial_map[fuzzy_initial[initial]]
+
+        return {name: found[norm] for name, norm in normalized.items() if norm in found}
+
+    def detect_all(self, authors_crossref_strs):
+        authors_by_publication = [self.split_authors(s) for s in authors_crossref_strs]
+        matches = self.match_names([a for authors in authors_by_publication for a in authors])
+        return ["; ".join(sorted({matches[a] for a in authors if a in matches})) for authors in authors_by_publication]
+
+    def detect(self, authors_crossref_str):
+        return self.detect_all([authors_crossref_str])[0]
@@ -0,0 +1,128 @@
+"""
+Benchmark et contrôle de parité de idref_hal_alignment.fuzzy_merge_file_hal.
+
+La fonction de référence est l'ancienne boucle (iterrows sur les formes HAL non
+appariées, similarity_score par paire). Le script vérifie que la nouvelle version
+donne exactement le même DataFrame à plusieurs seuils, puis mesure le temps de la
+nouvelle version sur un annuaire et une liste de formes HAL synthétiques.
+
+Usage : python benchmarks/bench_fuzzy_merge.py [nb_personnes_fichier] [nb_formes_hal]
+"""
+import logging
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+import idref_hal_alignment as alignment  # noqa: E402
+
+LAST_NAMES = ["Martin", "Bernard", "Dubois", "Thomas", "Robert", "Richard", "Petit", "Durand", "Leroy",
+              "Moreau", "Simon", "Laurent", "Lefèvre", "Michel", "García", "Nguyen", "Müller", "O'Brien"]
+FIRST_NAMES = ["Anne", "Jean", "Marie", "Pierre", "Sophie", "Luc", "Hélène", "José", "Li", "Camille"]
+
+
+def reference_fuzzy_merge(df_file, df_hal, threshold=85):
+    """Ancienne implémentation, recopiée telle quelle."""
+    normalize_text, similarity_score = alignment.normalize_text, alignment.similarity_score
+    hal_keep_cols = [
+        "form_i", "person_i", "lastName_s", "firstName_s", "valid_s",
+        "idHal_s", "halId_s", "idrefId_s", "orcidId_s", "emailDomain_s"
+    ]
+    hal_keep_cols = [c for c in hal_keep_cols if c in df_hal.columns]
+    df_file["norm_full"] = (df_file["Prénom"].fillna("").apply(normalize_text) + " " +
+                            df_file["Nom"].fillna("").apply(normalize_text)).str.strip()
+    df_hal["norm_full"] = (df_hal["firstName_s"].fillna("").apply(normalize_text) + " " +
+                           df_hal["lastName_s"].fillna("").apply(normalize_text)).str.strip()
+    df_hal["__matched"] = False
+    idref_cols = [
+        "Nom", "Prénom", "idref_ppn_list", "idref_status", "nb_match",
+        "match_info", "alt_names", "idref_orcid", "idref_description", "idref_idhal"
+    ]
+    idref_cols = [c for c in idref_cols if c in df_file.columns or c in ["Nom", "Prénom"]]
+    hal_prefixed_cols = [f"HAL_{c}" for c in hal_keep_cols]
+    final_cols = list(dict.fromkeys(idref_cols + hal_prefixed_cols + ["source", "match_score"]))
+    template = {c: None for c in final_cols}
+    merged_rows = []
+
+    for _, f_row in df_file.iterrows():
+        r = template.copy()
+        for c in idref_cols:
+            r[c] = f_row[c] if c in f_row.index else None
+        f_name = f_row.get("norm_full", "")
+        best_score, best_idx = -1, None
+        if f_name:
+            for h_idx, h_row in df_hal[df_hal["__matched"] == False].iterrows():
+                s = similarity_score(f_name, h_row["norm_full"])
+                if s > best_score:
+                    best_score, best_idx = s, h_idx
+                if f_name == h_row["norm_full"]:
+                    best_score, best_idx = 100.0, h_idx
+                    break
+        if best_idx is not None and best_score >= threshold:
+            h_row = df_hal.loc[best_idx]
+            for c in hal_keep_cols:
+                r[f"HAL_{c}"] = h_row.get(c)
+            r["source"], r["match_score"] = "Fichier + HAL", best_score
+            df_hal.at[best_idx, "__matched"] = True
+        else:
+            r["source"], r["match_score"] = "Fichier", best_score if best_score >= 0 else None
+        merged_rows.append(r)
+
+    for _, h_row in df_hal[df_hal["__matched"] == False].iterrows():
+        r = template.copy()
+        r["Nom"], r["Prénom"] = h_row.get("lastName_s"), h_row.get("firstName_s")
+        for c in hal_keep_cols:
+            r[f"HAL_{c}"] = h_row.get(c)
+        r["source"], r["match_score"] = "HAL", None
+        merged_rows.append(r)
+    return pd.DataFrame(merged_rows, columns=final_cols)
+
+
+def synthetic_frames(nb_file, nb_hal, seed=7):
+    rng = random.Random(seed)
+
+    def person():
+        last_name = rng.choice(LAST_NAMES) + (rng.choice(["", "-" + rng.choice(LAST_NAMES)]) if rng.random() < 0.2 else "")
+        return last_name + str(rng.randint(0, nb_hal // 20)), rng.choice(FIRST_NAMES)
+
+    def variant(last_name, first_name):
+        roll = rng.random()
+        if roll < 0.3:
+            return last_name, first_name[0] + "."
+        if roll < 0.4:
+            return last_name.upper(), first_name
+        if roll < 0.5:
+            return last_name[:-1], first_name
+        return last_name, first_name
+
+    people = [person() for _ in range(nb_file)]
+    df_file = pd.DataFrame({"Nom": [p[0] for p in people], "Prénom": [p[1] for p in people],
+                            "idref_status": "not_found"})
+    hal_people = [variant(*rng.choice(people)) if rng.random() < 0.5 else person() for _ in range(nb_hal)]
+    df_hal = pd.DataFrame({"form_i": range(nb_hal), "person_i": [rng.randint(1, 10**6) for _ in range(nb_hal)],
+                           "lastName_s": [p[0] for p in hal_people], "firstName_s": [p[1] for p in hal_people]})
+    return df_file, df_hal
+
+
+if __name__ == "__main__":
+    nb_file = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    nb_hal = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    df_file_small, df_hal_small = synthetic_frames(300, 1200)
+    for use_rapidfuzz in sorted({False, alignment.USE_RAPIDFUZZ}):
+        alignment.USE_RAPIDFUZZ = use_rapidfuzz
+        for threshold in (60, 75, 85, 95, 100):
+            expected = reference_fuzzy_merge(df_file_small.copy(), df_hal_small.copy(), threshold)
+            obtained = alignment.fuzzy_merge_file_hal(df_file_small.copy(), df_hal_small.copy(), threshold)
+            pd.testing.assert_frame_equal(expected, obtained)
+        print(f"parité OK (rapidfuzz={use_rapidfuzz}, seuils 60 à 100)")
+
+    df_file, df_hal = synthetic_frames(nb_file, nb_hal)
+    start = time.perf_counter()
+    merged = alignment.fuzzy_merge_file_hal(df_file.copy(), df_hal.copy(), 85)
+    elapsed = time.perf_counter() - start
+    print(f"{nb_file} x {nb_hal} : {elapsed:.2f}s, {int((merged['source'] == 'Fichier + HAL').sum())} appariements")
@@ -0,0 +1,195 @@
+"""
+Benchmark et contrôle de parité de l'export HAL-TEI (hal_xml_export).
+
+La fonction de référence est l'ancienne generate_hal_xml (arbre ElementTree
+complet construit pour chaque document). Le script vérifie que le rendu à partir
+du squelette pré-sérialisé donne exactement les mêmes octets, puis mesure la
+création du ZIP : ancienne boucle séquentielle, rendu séquentiel, pool de processus.
+
+Usage : python benchmarks/bench_hal_tei.py [nb_publications]
+"""
+import io
+import os
+import random
+import sys
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import hal_xml_export  # noqa: E402
+
+WORDS = ["Soil", "carbon", "dynamics", "in", "temperate", "forests", "Ecology", "&", "<b>", "Müller",
+         "Lévêque", "O'Brien", "α-synucléine", "CO₂", "\"quoted\"", "Rennes", "Université"]
+AFFILIATIONS = ["Univ Rennes, CNRS, ECOBIO - UMR 6553, F-35000 Rennes, France",
+                "INRAE, UMR SAS, 35000 Rennes, France", "Department of Biology, University of Leeds, UK",
+                "Laboratoire <LETG> & Co, Brest", ""]
+
+
+def reference_generate_hal_xml(publication):
+    """Ancienne implémentation (ElementTree complet par document), recopiée telle quelle."""
+
+    NS = {
+        None: "http://www.tei-c.org/ns/1.0",
+        "hal": "http://hal.archives-ouvertes.fr/"
+    }
+
+    # --- Racine TEI ---
+    TEI = ET.Element("TEI", {
+        "xmlns:xsi": "http://www.w3.org/2001/XMLSchema-instance",
+        "xsi:schemaLocation": "http://www.tei-c.org/ns/1.0 http://api.archives-ouvertes.fr/documents/aofr-sword.xsd"
+    })
+
+    # --- Arborescence principale ---
+    text = ET.SubElement(TEI, "text")
+    body = ET.SubElement(text, "body")
+    listBibl = ET.SubElement(body, "listBibl")
+    biblFull = ET.SubElement(listBibl, "biblFull")
+
+    # === titleStmt / seriesStmt / notesStmt ===
+    ET.SubElement(biblFull, "titleStmt")
+    ET.SubElement(biblFull, "seriesStmt")
+
+    notesStmt = ET.SubElement(biblFull, "notesStmt")
+    ET.SubElement(notesStmt, "note", {"type": "audience", "n": "2"})
+    ET.SubElement(notesStmt, "note", {"type": "popular", "n": "0"}).text = "No"
+    ET.SubElement(notesStmt, "note", {"type": "peer", "n": "1"}).text = "Yes"
+
+    # === sourceDesc / biblStruct ===
+    sourceDesc = ET.SubElement(biblFull, "sourceDesc")
+    biblStruct = ET.SubElement(sourceDesc, "biblStruct")
+    analytic = ET.SubElement(biblStruct, "analytic")
+
+    # --- Titre ---
+    title_el = ET.SubElement(analytic, "title", {"xml:lang": "en"})
+    title_el.text = publication.get("Title", "")
+
+    # --- Auteurs ---
+    # On mappe d'abord toutes les affiliations uniques pour leur donner un xml:id stable
+    raw_affs = sorted(set(publication.get("raw_affiliations", [])))
+    aff_id_map = {aff: f"localStruct-Aff{i+1}" for i, aff in enumerate(raw_affs)}
+
+    for author in publication.get("authors", []):
+        aut_el = ET.SubElement(analytic, "author", {"role": "aut"})
+        pers = ET.SubElement(aut_el, "persName")
+        ET.SubElement(pers, "forename", {"type": "first"}).text = author.get("forename", "")
+        ET.SubElement(pers, "surname").text = author.get("surname", "")
+        if author.get("orcid"):
+            ET.SubElement(aut_el, "idno", {"type": "ORCID"}).text = author["orcid"]
+
+        # Affiliation brute (rawAffs)
+        for aff_text in author.get("affiliations", []):
+            ET.SubElement(aut_el, "rawAffs").text = aff_text
+            # Si correspondance avec structure connue, on lie avec un ref
+            if aff_text in aff_id_map:
+                ET.SubElement(aut_el, "affiliation", {"ref": f"#{aff_id_map[aff_text]}"})
+
+    # --- Journal ---
+    monogr = ET.SubElement(biblStruct, "monogr")
+    ET.SubElement(monogr, "title", {"level": "j"}).text = publication.get("Source title", "")
+    imprint = ET.SubElement(monogr, "imprint")
+    ET.SubElement(imprint, "publisher").text = publication.get("publisher", "")
+    ET.SubElement(imprint, "date", {"type": "datePub"}).text = str(publication.get("Date", ""))
+
+    # --- Identifiants (DOI, PMID, etc.) ---
+    if publication.get("doi"):
+        ET.SubElement(biblStruct, "idno", {"type": "doi"}).text = publication["doi"]
+    if publication.get("pubmed"):
+        ET.SubElement(biblStruct, "idno", {"type": "pubmed"}).text = str(publication["pubmed"])
+
+    # === profileDesc (langue, typologie HAL, mots-clés) ===
+    profileDesc = ET.SubElement(biblFull, "profileDesc")
+
+    langUsage = ET.SubElement(profileDesc, "langUsage")
+    ET.SubElement(langUsage, "language", {"ident": "en"}).text = "English"
+
+    textClass = ET.SubElement(profileDesc, "textClass")
+    ET.SubElement(textClass, "classCode", {"scheme": "halTypology", "n": "ART"}).text = "Journal articles"
+
+    # Mots-clés optionnels
+    keywords = publication.get("keywords", [])
+    if keywords:
+        kw_el = ET.SubElement(textClass, "keywords", {"scheme": "author"})
+        for kw in keywords:
+            ET.SubElement(kw_el, "term", {"xml:lang": "en"}).text = kw
+
+    # --- Résumé optionnel ---
+    abstract_el = ET.SubElement(profileDesc, "abstract", {"xml:lang": "en"})
+    abstract_el.text = publication.get("abstract", "")
+
+    # === Structures d'affiliation ===
+    back = ET.SubElement(text, "back")
+    listOrg = ET.SubElement(back, "listOrg", {"type": "structures"})
+
+    for aff_text, aff_id in aff_id_map.items():
+        org_el = ET.SubElement(listOrg, "org", {"type": "institution", "xml:id": aff_id})
+        ET.SubElement(org_el, "orgName").text = aff_text
+        desc_el = ET.SubElement(org_el, "desc")
+        addr_el = ET.SubElement(desc_el, "address")
+        ET.SubElement(addr_el, "country", {"key": "FR"})
+
+    xml_bytes = ET.tostring(TEI, encoding="utf-8", xml_declaration=True)
+    return xml_bytes
+
+
+def synthetic_publications(nb_publications, seed=3):
+    rng = random.Random(seed)
+
+    def words(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n))
+
+    publications = []
+    for i in range(nb_publications):
+        authors = []
+        for _ in range(rng.randint(0, 12)):
+            author = {"forename": rng.choice(["Anne", "José", "", "Li"]), "surname": words(1),
+                      "affiliations": rng.sample(AFFILIATIONS, rng.randint(0, 2))}
+            if rng.random() < 0.3:
+                author["orcid"] = f"0000-0002-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}"
+            authors.append(author)
+        publication = {"Title": words(rng.randint(0, 15)), "Source title": words(3), "publisher": words(2),
+                       "Date": rng.choice([2021, "2023-05-01", ""]), "authors": authors,
+                       "raw_affiliations": [a for author in authors for a in author["affiliations"]],
+                       "doi": rng.choice(["", f"10.1000/xyz{i}"]), "abstract": words(rng.randint(0, 80))}
+        if rng.random() < 0.5:
+            publication["keywords"] = [words(1) for _ in range(rng.randint(0, 5))]
+        if rng.random() < 0.3:
+            publication["pubmed"] = rng.randint(10**7, 10**8)
+        publications.append((f"pub_{i}", publication))
+    return publications
+
+
+def reference_zip(publications_list):
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for pub_id, pub_data in publications_list:
+            zf.writestr(f"{pub_id}.xml", reference_generate_hal_xml(pub_data))
+    zip_buffer.seek(0)
+    return zip_buffer
+
+
+def zip_contents(zip_buffer):
+    with zipfile.ZipFile(zip_buffer) as zf:
+        return {name: zf.read(name) for name in zf.namelist()}
+
+
+if __name__ == "__main__":
+    nb_publications = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    publications = synthetic_publications(nb_publications)
+
+    edge_cases = [{}, {"Title": None, "Date": None, "authors": [{}]}, {"keywords": [], "pubmed": 0}]
+    for _, publication in publications[:2000] + [(None, p) for p in edge_cases]:
+        assert reference_generate_hal_xml(publication) == hal_xml_export.generate_hal_xml(publication), publication
+    print("parité OK (documents)")
+
+    timings = []
+    for label, build in (("ancienne boucle ElementTree", lambda: reference_zip(publications)),
+                         ("squelette, séquentiel", lambda: hal_xml_export.generate_zip_from_xmls(publications, max_workers=1)),
+                         ("squelette, pool de processus", lambda: hal_xml_export.generate_zip_from_xmls(publications))):
+        start = time.perf_counter()
+        zip_buffer = build()
+        timings.append((label, time.perf_counter() - start, zip_contents(zip_buffer)))
+    assert all(contents == timings[0][2] for _, _, contents in timings), "contenus des ZIP différents"
+    print(f"parité OK (ZIP de {nb_publications} documents, {hal_xml_export.TEI_MAX_WORKERS} processus au plus)")
+    for label, elapsed, _ in timings:
+        print(f"{label:<30} {elapsed:8.3f}s")
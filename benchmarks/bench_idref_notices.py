@@ -0,0 +1,209 @@
+"""
+Benchmark de la lecture des notices IdRef : parse_idref_notice (un seul parcours)
+contre la lecture d'origine, fonction par fonction sur la notice passée dans
+BeautifulSoup (référence conservée ici ; pydref n'utilise plus BeautifulSoup).
+
+Corpus : un dossier de notices .xml, ou la base du cache de notices
+(pydref.IDREF_NOTICE_CACHE_PATH par défaut). À défaut, des notices synthétiques.
+Le script vérifie aussi que les deux lectures donnent les mêmes champs.
+
+Usage : python benchmarks/bench_idref_notices.py [dossier_ou_base.sqlite] [nb_notices_synthétiques]
+"""
+import glob
+import os
+import random
+import sqlite3
+import sys
+import time
+import warnings
+
+from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pydref  # noqa: E402
+
+
+def load_saved_notices(path):
+    if os.path.isdir(path):
+        notices = []
+        for file_path in sorted(glob.glob(os.path.join(path, "*.xml"))):
+            with open(file_path, encoding="utf-8") as f:
+                notices.append(f.read())
+        return notices
+    if os.path.isfile(path):
+        with sqlite3.connect(path) as connection:
+            return [row[0] for row in connection.execute("SELECT xml FROM notices")]
+    return []
+
+
+def synthetic_notice(rng, ppn):
+    def datafield(tag, subfields):
+        inner = "".join(f'<subfield code="{code}">{text}</subfield>' for code, text in subfields)
+        return f'<datafield tag="{tag}" ind1=" " ind2=" ">{inner}</datafield>'
+
+    last_name, first_name = rng.choice(["Martin", "Lévêque", "Nguyen", "O'Brien"]), rng.choice(["Anne", "José", "Li"])
+    fields = [f'<controlfield tag="001">{ppn}</controlfield>', '<controlfield tag="003">http://www.idref.fr/</controlfield>']
+    fields.append(datafield("010", [("a", f"0000000{rng.randint(100000000, 999999999)}"), ("2", "ISNI")]))
+    fields.append(datafield("033", [("a", f"http://www.idref.fr/{ppn}")]))
+    fields.append(datafield("035", [("a", f"0000-0002-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}"), ("2", "ORCID")]))
+    fields.append(datafield("035", [("a", f"{rng.randint(10000, 99999)}"), ("2", "sudoc")]))
+    fields.append(datafield("103", [("a", f"19{rng.randint(20, 99)}{rng.randint(1, 12):02d}01"), ("b", rng.choice(["", "20210514"]))]))
+    fields.append(datafield("120", [("a", rng.choice(["aa", "ba", "ca"]))]))
+    fields.append(datafield("200", [("a", last_name), ("b", first_name), ("f", "1950-....")]))
+    for _ in range(rng.randint(0, 4)):
+        fields.append(datafield("340", [("a", rng.choice(["Chercheur en écologie", "Chanteur", "Maître de conférences"]))]))
+    for _ in range(rng.randint(0, 3)):
+        fields.append(datafield("400", [("a", last_name.upper()), ("b", first_name[0] + ".")]))
+    for tag in ("101", "102", "106", "150", "801", "810", "899"):
+        fields.append(datafield(tag, [("a", "x" * rng.randint(5, 60))]))
+    return f'<?xml version="1.0" encoding="UTF-8"?><record><leader>     cx  a22     3  45  </leader>{"".join(fields)}</record>'
+
+
+# --- Lecture de référence (anciennes méthodes Pydref.get_*_from_idref_notice) ---
+
+def get_alternative_names_from_idref_notice(soup):
+    alt_names = []
+    for datafield in soup.find_all("datafield", {"tag": "400"}):
+        last_name, first_name = "", ""
+        for subfield in datafield.find_all("subfield"):
+            if subfield.attrs['code'] == 'a':
+                last_name = subfield.text.strip()
+            if subfield.attrs['code'] == 'b':
+                first_name = subfield.text.strip()
+        full_name = f"{first_name} {last_name}".strip()
+        if full_name:
+            alt_names.append(full_name)
+            alt_names.append(f"{last_name} {first_name}".strip())
+    return alt_names
+
+def get_name_from_idref_notice(soup):
+    current_name, current_first_name = None, None
+    for datafield in soup.find_all("datafield"):
+        if (datafield.attrs['tag'] in ['200']):
+            current_name, current_first_name = '', ''
+            for subfield in datafield.find_all("subfield"):
+                if subfield.attrs['code'] == 'a':
+                    current_name = subfield.text
+                if subfield.attrs['code'] == 'b':
+                    current_first_name = subfield.text
+    return {"last_name": current_name, "first_name": current_first_name}
+
+def get_birth_and_death_date_from_idref_notice(api, soup):
+    birth, death = None, None
+    for datafield in soup.find_all("datafield"):
+        if (datafield.attrs['tag'] == '103'):
+            for subfield in datafield.find_all("subfield"):
+                if subfield.attrs['code'] == 'a':
+                    birth = api.valid_idref_date(subfield.text.strip())
+                if subfield.attrs['code'] == 'b':
+                    death = api.valid_idref_date(subfield.text.strip())
+    return (birth, death)
+
+def get_identifiers_from_idref_notice(soup):
+    identifiers = []
+
+    for controlfield in soup.find_all("controlfield"):
+        if (controlfield.attrs['tag'] == '001'):
+            identifiers.append({'idref': controlfield.text.strip()})
+            break
+
+    for datafield in soup.find_all("datafield"):
+
+        if (datafield.attrs['tag'] == '010'):
+            for subfield in datafield.find_all("subfield"):
+                if subfield.attrs['code'] == 'a':
+                    identifiers.append({'isni': subfield.text.strip()})
+                    break
+
+        if (datafield.attrs['tag'] == '033'):
+            for subfield in datafield.find_all("subfield"):
+                if subfield.attrs['code'] == 'a':
+                    identifiers.append({'ark': subfield.text.strip()})
+                    break
+
+        if (datafield.attrs['tag'] == '035'):
+            is_ORCID = False
+            for subfield in datafield.find_all("subfield"):
+                if subfield.text.strip().upper() == 'ORCID':
+                    is_ORCID = True
+                    break
+            if(is_ORCID):
+                for subfield in datafield.find_all("subfield"):
+                    if subfield.attrs['code'] == 'a':
+                        identifiers.append({'orcid': subfield.text.strip()})
+                        break
+
+        if (datafield.attrs['tag'] == '035'):
+            is_sudoc = False
+            for subfield in datafield.find_all("subfield"):
+                if subfield.text.strip().upper() == 'SUDOC':
+                    is_sudoc = True
+                    break
+            if(is_sudoc):
+                for subfield in datafield.find_all("subfield"):
+                    if subfield.attrs['code'] == 'a':
+                        identifiers.append({'sudoc': subfield.text.strip()})
+                        break
+    return identifiers
+
+def get_description_from_idref_notice(soup):
+    descriptions = []
+    for datafield in soup.find_all("datafield"):
+        if (datafield.attrs['tag'] == '340'):
+            for subfield in datafield.find_all("subfield"):
+                if subfield.attrs['code'] == 'a':
+                    descriptions.append(subfield.text.strip())
+    return descriptions
+
+def get_gender(soup):
+    for datafield in soup.find_all("datafield"):
+        if (datafield.attrs['tag'] == '120'):
+            for subfield in datafield.find_all("subfield"):
+                if subfield.attrs['code'] == 'a':
+                    subfield_value = subfield.text.strip()
+                    if subfield_value == 'aa':
+                        return 'F'
+                    elif subfield_value == 'ba':
+                        return 'M'
+    return None
+
+
+def parse_with_soup(api, notice):
+    soup = BeautifulSoup(notice, "lxml")
+    name = get_name_from_idref_notice(soup)
+    birth, death = get_birth_and_death_date_from_idref_notice(api, soup)
+    return (name["last_name"], name["first_name"], get_alternative_names_from_idref_notice(soup),
+            birth, death, get_identifiers_from_idref_notice(soup),
+            get_description_from_idref_notice(soup), get_gender(soup))
+
+
+def parse_single_pass(api, notice):
+    record = api.parse_idref_notice(notice)
+    return (record.last_name, record.first_name, record.alt_names, record.birth_date, record.death_date,
+            record.identifiers, record.descriptions, record.gender)
+
+
+if __name__ == "__main__":
+    corpus_path = sys.argv[1] if len(sys.argv) > 1 else pydref.IDREF_NOTICE_CACHE_PATH
+    notices = load_saved_notices(corpus_path)
+    if notices:
+        print(f"{len(notices)} notices enregistrées ({corpus_path})")
+    else:
+        nb_synthetic = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+        rng = random.Random(42)
+        notices = [synthetic_notice(rng, f"{rng.randint(10**7, 10**8 - 1)}X") for _ in range(nb_synthetic)]
+        print(f"{len(notices)} notices synthétiques")
+
+    warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
+    pydref.IDREF_NOTICE_CACHE_PATH = ""  # pas de base créée par le benchmark
+    api = pydref.Pydref()
+    for notice in notices:
+        assert parse_with_soup(api, notice) == parse_single_pass(api, notice), notice
+    print("parité OK")
+
+    for label, parser in (("BeautifulSoup + find_all", parse_with_soup), ("parse_idref_notice", parse_single_pass)):
+        start = time.perf_counter()
+        for notice in notices:
+            parser(api, notice)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<26} {elapsed:8.3f}s  ({elapsed / len(notices) * 1000:.3f} ms/notice)")
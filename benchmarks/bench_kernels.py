@@ -0,0 +1,310 @@
+"""
+Micro-benchmarks des noyaux de comparaison, avec courbes de montée en charge (N x M)
+et contrôle des sorties par rapport à des empreintes de référence.
+
+Noyaux : normalise, compare_inex, inex_in_coll, détection des auteurs connus
+(author_detection.KnownAuthorDetector, et author_detection_reference : l'ancienne boucle
+get_close_matches par auteur, qui doit donner les mêmes sorties), similarity_score (idref_hal_alignment), merge_rows_with_sources.
+
+Les corpus (titres avec variantes proches, noms avec formes à initiales) sont générés
+à partir d'une graine. Le contrôle calcule, sur un corpus fixe, une empreinte SHA-256 des
+sorties de chaque noyau et la compare à benchmarks/kernels_reference.json : une
+optimisation ne doit pas changer ces empreintes. --update-reference les réécrit (après
+un changement de comportement voulu).
+
+Usage : python benchmarks/bench_kernels.py [--kernels normalise compare_inex ...]
+        [--scale 1.0] [--repeat 3] [--output courbes.json] [--update-reference]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import sys
+import time
+from difflib import get_close_matches
+
+os.environ.setdefault("TQDM_DISABLE", "1")
+import pandas as pd  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+import normalisation  # noqa: E402
+import utils  # noqa: E402
+import idref_hal_alignment as alignment  # noqa: E402
+import author_detection  # noqa: E402
+
+REFERENCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kernels_reference.json")
+
+WORDS = ["étude", "analyse", "sol", "forêt", "carbone", "dynamique", "microbienne", "réponse", "climat",
+         "Zürich", "l'eau", "ARN", "co-culture", "Résumé", "São", "Paulo", "α-synucléine", "CO₂", "urban",
+         "river", "sediment", "bayesian", "inference", "protein", "folding", "cohort", "children", "language",
+         "medieval", "Brittany", "policy", "Europe", "ocean", "plankton", "genome", "deep", "learning"]
+LAST_NAMES = ["Martin", "Bernard", "Dubois", "Thomas", "Robert", "Richard", "Petit", "Durand", "Leroy",
+              "Moreau", "Simon", "Laurent", "Lefèvre", "Michel", "García", "Nguyen", "Müller", "Le Gall",
+              "Guillou", "Le Goff", "Tanguy", "Morvan", "Rossi", "Schmidt", "Kowalski", "Silva", "Chen"]
+FIRST_NAMES = ["Anne", "Jean", "Marie", "Pierre", "Sophie", "Luc", "Hélène", "José", "Li", "Camille", "Yann",
+               "Gwenaëlle", "Erwan", "Nathalie", "Claire", "Olivier", "Aurélie", "Karim", "Jean-François"]
+
+
+# --- Corpus ---
+def title_corpus(n_titles, seed=1):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 16))).capitalize() + rng.choice(["", ".", " :"])
+            for _ in range(n_titles)]
+
+
+def title_variant(title, rng):
+    """Variante proche d'un titre (casse, ponctuation, mot ou lettre en moins) ou titre inchangé."""
+    roll = rng.random()
+    if roll < 0.25:
+        return title.upper()
+    if roll < 0.45:
+        words = title.split()
+        return " ".join(words[:-1]) if len(words) > 3 else title + " !"
+    if roll < 0.6:
+        position = rng.randrange(len(title))
+        return title[:position] + title[position + 1:]
+    return title
+
+
+def query_titles(collection_titles, n_queries, seed=2):
+    """n_queries titres : moitié variantes de titres de la collection, moitié titres nouveaux."""
+    rng = random.Random(seed)
+    fresh_titles = title_corpus(n_queries, seed + 100)
+    return [title_variant(rng.choice(collection_titles), rng) if rng.random() < 0.5 else fresh_titles[i]
+            for i in range(n_queries)]
+
+
+def name_corpus(n_names, seed=3):
+    rng = random.Random(seed)
+    names = {}
+    while len(names) < n_names:
+        last_name = rng.choice(LAST_NAMES) + (("-" + rng.choice(LAST_NAMES)) if rng.random() < 0.3 else "")
+        names[f"{rng.choice(FIRST_NAMES)} {last_name}"] = None
+    return list(names)
+
+
+def author_strings(lab_names, n_publications, seed=4):
+    """Chaînes « Prénom Nom; ... » (format Auteurs_Crossref), mêlant chercheurs du labo et externes."""
+    rng = random.Random(seed)
+    externals = name_corpus(max(50, n_publications), seed + 100)
+    publications = []
+    for _ in range(n_publications):
+        authors = []
+        for _ in range(rng.randint(1, 10)):
+            if rng.random() < 0.3:
+                first_name, _, last_name = rng.choice(lab_names).partition(" ")
+                roll = rng.random()
+                if roll < 0.3:
+                    first_name = first_name[0] + "."
+                elif roll < 0.4:
+                    last_name = last_name.upper()
+                authors.append(f"{first_name} {last_name}")
+            else:
+                authors.append(rng.choice(externals))
+        publications.append("; ".join(authors))
+    return publications
+
+
+# --- Noyaux (mêmes appels que les applications) ---
+def make_author_detector(lab_names):
+    """Ancienne détection des applications (get_close_matches pour chaque auteur), référence de KnownAuthorDetector."""
+    chercheur_map_norm = {utils.normalize_name(n): n for n in lab_names}
+    initial_map_norm = {utils.get_initial_form(utils.normalize_name(n)): n for n in lab_names}
+
+    def detect_known_authors(authors_crossref_str):
+        if pd.isna(authors_crossref_str) or not str(authors_crossref_str).strip() or "Erreur" in authors_crossref_str or "Timeout" in authors_crossref_str:
+            return ""
+        authors_from_pub = [a.strip() for a in str(authors_crossref_str).split(';') if a.strip()]
+        noms_detectes_originaux = set()
+        for author_pub_orig in authors_from_pub:
+            author_pub_norm = utils.normalize_name(author_pub_orig)
+            author_pub_initial_norm = utils.get_initial_form(author_pub_norm)
+            match_complet = get_close_matches(author_pub_norm, chercheur_map_norm.keys(), n=1, cutoff=0.85)
+            if match_complet:
+                noms_detectes_originaux.add(chercheur_map_norm[match_complet[0]])
+                continue
+            match_initial = get_close_matches(author_pub_initial_norm, initial_map_norm.keys(), n=1, cutoff=0.9)
+            if match_initial:
+                noms_detectes_originaux.add(initial_map_norm[match_initial[0]])
+        return "; ".join(sorted(list(noms_detectes_originaux))) if noms_detectes_originaux else ""
+
+    return detect_known_authors
+
+
+def collection_frames(collection_titles):
+    collection_df = pd.DataFrame({"Hal_ids": [str(100000 + i) for i in range(len(collection_titles))],
+                                  "DOIs": "", "Titres": collection_titles, "Types de dépôts": "file",
+                                  "HAL Link": "", "HAL Ext ID": "", "HAL_URI": ""})
+    return collection_df, utils.build_hal_titles_df(collection_df)
+
+
+def source_rows(n_dois, seed=5):
+    """Lignes de sources à fusionner : 1 à 3 lignes par DOI, valeurs parfois divergentes."""
+    rng = random.Random(seed)
+    titles = title_corpus(n_dois, seed)
+    rows = []
+    for i in range(n_dois):
+        for source_name in rng.sample(["openalex", "scopus", "pubmed"], rng.randint(1, 3)):
+            rows.append({"Data source": source_name, "Title": titles[i] if rng.random() < 0.8 else titles[i].upper(),
+                         "doi": f"10.1000/k{i}", "id": f"{source_name}-{i}",
+                         "Source title": rng.choice(["Soil Biol", "PLOS ONE", None]),
+                         "Date": f"{2018 + i % 7}-0{1 + i % 9}-01"})
+    return pd.DataFrame(rows)
+
+
+def kernel_normalise(n, m):
+    titles = title_corpus(n * m)
+
+    def run():
+        normalisation.clear_normalisation_caches()
+        return [utils.normalise(t) for t in titles]
+    return run
+
+
+def kernel_compare_inex(n, m):
+    collection = [utils.normalise(t) for t in title_corpus(m)]
+    queries = [utils.normalise(t) for t in query_titles(title_corpus(m), n)]
+    return lambda: [[utils.compare_inex(q, c) for c in collection] for q in queries]
+
+
+def kernel_inex_in_coll(n, m):
+    collection_titles = title_corpus(m)
+    collection_df, hal_titles_df = collection_frames(collection_titles)
+    queries = query_titles(collection_titles, n)
+    normalised_queries = [utils.normalise(q) for q in queries]
+    return lambda: [utils.inex_in_coll(nq, q, collection_df, hal_titles_df) for nq, q in zip(normalised_queries, queries)]
+
+
+def kernel_author_detection(n, m):
+    lab_names = name_corpus(m)
+    publications = author_strings(lab_names, n)
+    return lambda: author_detection.KnownAuthorDetector(lab_names).detect_all(publications)
+
+
+def kernel_author_detection_reference(n, m):
+    lab_names = name_corpus(m)
+    publications = author_strings(lab_names, n)
+
+    def run():
+        detect_known_authors = make_author_detector(lab_names)
+        return [detect_known_authors(p) for p in publications]
+    return run
+
+
+def kernel_similarity_score(n, m):
+    names_a = [alignment.normalize_text(x) for x in name_corpus(n, seed=6)]
+    names_b = [alignment.normalize_text(x) for x in name_corpus(m, seed=7)]
+    return lambda: [[round(alignment.similarity_score(a, b), 6) for b in names_b] for a in names_a]
+
+
+def kernel_merge_rows(n, m):
+    rows_df = source_rows(n * m)
+    return lambda: rows_df.groupby('doi', as_index=False).apply(utils.merge_rows_with_sources)
+
+
+# nom -> (fonction, grille de montée en charge [(N, M)], taille fixe du contrôle)
+# N : titres, publications ou noms à traiter ; M : titres ou noms auxquels ils sont comparés.
+# Pour normalise et merge_rows_with_sources, N x M est simplement le nombre d'éléments.
+KERNELS = {
+    "normalise": (kernel_normalise, [(1000, 1), (5000, 1), (20000, 1), (50000, 1)], (500, 1)),
+    "compare_inex": (kernel_compare_inex, [(50, 200), (50, 800), (200, 800), (200, 2000)], (40, 150)),
+    "inex_in_coll": (kernel_inex_in_coll, [(50, 500), (50, 2000), (200, 2000), (200, 5000)], (60, 300)),
+    "author_detection": (kernel_author_detection, [(200, 50), (200, 200), (1000, 200), (1000, 800)], (150, 60)),
+    "author_detection_reference": (kernel_author_detection_reference, [(200, 50), (200, 200), (1000, 200), (1000, 800)],
+                                   (150, 60)),
+    "similarity_score": (kernel_similarity_score, [(100, 500), (100, 2000), (400, 2000), (400, 5000)], (40, 120)),
+    "merge_rows_with_sources": (kernel_merge_rows, [(100, 10), (100, 50), (100, 200)], (50, 4)),
+}
+
+
+def output_digest(output):
+    if isinstance(output, pd.DataFrame):
+        output = {"columns": [str(c) for c in output.columns], "rows": output.astype(object).where(output.notna(), None).values.tolist()}
+    encoded = json.dumps(output, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def reference_key(kernel_name):
+    # Les scores de similarity_score dépendent du moteur (rapidfuzz ou difflib)
+    if kernel_name == "similarity_score":
+        return f"{kernel_name}[rapidfuzz={alignment.USE_RAPIDFUZZ}]"
+    # Les deux détections d'auteurs doivent donner exactement les mêmes sorties
+    if kernel_name == "author_detection_reference":
+        return "author_detection"
+    return kernel_name
+
+
+def check_outputs(kernel_names, update_reference):
+    reference = {}
+    if os.path.exists(REFERENCE_PATH):
+        with open(REFERENCE_PATH, encoding="utf-8") as f:
+            reference = json.load(f)
+    failures = []
+    for kernel_name in kernel_names:
+        kernel, _, (n, m) = KERNELS[kernel_name]
+        digest = output_digest(kernel(n, m)())
+        key = reference_key(kernel_name)
+        if update_reference:
+            reference[key] = digest
+        elif key not in reference:
+            print(f"{kernel_name:<24} pas d'empreinte de référence ({key})")
+        elif reference[key] != digest:
+            failures.append(kernel_name)
+            print(f"{kernel_name:<24} SORTIES DIFFÉRENTES de la référence")
+        else:
+            print(f"{kernel_name:<24} sorties identiques à la référence")
+    if update_reference:
+        with open(REFERENCE_PATH, "w", encoding="utf-8") as f:
+            json.dump(reference, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"empreintes écrites dans {REFERENCE_PATH}")
+    return failures
+
+
+def best_time(run, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def scaling_curves(kernel_names, scale, repeat):
+    curves = {}
+    for kernel_name in kernel_names:
+        kernel, grid, _ = KERNELS[kernel_name]
+        curves[kernel_name] = []
+        for n, m in grid:
+            n, m = max(1, int(n * scale)), max(1, int(m * scale))
+            seconds = best_time(kernel(n, m), repeat)
+            curves[kernel_name].append({"n": n, "m": m, "seconds": round(seconds, 6),
+                                        "microseconds_per_item": round(seconds / (n * m) * 1e6, 3)})
+            print(f"{kernel_name:<24} N={n:<6} M={m:<6} {seconds:9.4f}s  {seconds / (n * m) * 1e6:10.3f} µs par N x M")
+    return curves
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--kernels", nargs="+", choices=list(KERNELS), default=list(KERNELS))
+    parser.add_argument("--scale", type=float, default=1.0, help="facteur appliqué aux tailles N et M de la grille")
+    parser.add_argument("--repeat", type=int, default=3, help="meilleur temps sur --repeat exécutions")
+    parser.add_argument("--output", help="courbes de montée en charge au format JSON")
+    parser.add_argument("--update-reference", action="store_true", help="réécrit les empreintes de référence")
+    parser.add_argument("--check-only", action="store_true", help="contrôle des sorties sans mesure")
+    args = parser.parse_args()
+
+    failures = check_outputs(args.kernels, args.update_reference)
+    if not args.check_only:
+        print()
+        curves = scaling_curves(args.kernels, args.scale, args.repeat)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump({"rapidfuzz": alignment.USE_RAPIDFUZZ, "scale": args.scale, "repeat": args.repeat,
+                           "curves": curves}, f, indent=2)
+                f.write("\n")
+    if failures:
+        sys.exit(1)
@@ -0,0 +1,133 @@
+"""
+Micro-benchmark et contrôle de parité du module normalisation.
+
+Les fonctions de référence ci-dessous sont les anciennes implémentations de
+utils.normalise, utils.normalize_name, pydref.normalize et
+idref_hal_alignment.normalize_text. Le script vérifie que les nouvelles
+fonctions donnent exactement les mêmes résultats, puis mesure les temps.
+
+Usage : python benchmarks/bench_normalisation.py [nombre_de_textes]
+"""
+import os
+import random
+import string
+import sys
+import time
+import unicodedata
+
+import regex as re
+from unidecode import unidecode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import normalisation  # noqa: E402
+
+
+# --- Implémentations de référence (avant le module normalisation) ---
+def ref_normalise(text_to_normalise):
+    if not isinstance(text_to_normalise, str):
+        return ""
+    text_unaccented = unidecode(text_to_normalise)
+    text_alphanum_spaces = re.sub(r'[^\w\s]', ' ', text_unaccented)
+    return re.sub(r'\s+', ' ', text_alphanum_spaces).lower().strip()
+
+
+def ref_normalize_name(name_to_normalize):
+    if not isinstance(name_to_normalize, str): return ""
+    name_lower = name_to_normalize.strip().lower()
+    name_unaccented = ''.join(c for c in unicodedata.normalize('NFD', name_lower)
+                              if unicodedata.category(c) != 'Mn')
+    name_cleaned_spaces = name_unaccented.replace('-', ' ').replace('.', ' ')
+    name_single_spaced = re.sub(r'\s+', ' ', name_cleaned_spaces).strip()
+    if ',' in name_single_spaced:
+        parts = [part.strip() for part in name_single_spaced.split(',', 1)]
+        if len(parts) == 2 and parts[0] and parts[1]:
+            return f"{parts[1]} {parts[0]}"
+    return name_single_spaced
+
+
+def ref_pydref_normalize(x):
+    x = x.replace('\xa0', ' ')
+    x = x.lower().translate(str.maketrans(string.punctuation, len(string.punctuation) * ' '))
+    x = ''.join(c for c in unicodedata.normalize('NFD', x) if unicodedata.category(c) != 'Mn')
+    return x.lower().strip()
+
+
+def ref_normalize_text(s):
+    if s is None:
+        return ""
+    s = str(s)
+    s = unicodedata.normalize("NFD", s)
+    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
+    return " ".join(s.lower().split())
+
+
+PAIRS = [
+    ("normalise", ref_normalise, normalisation.normalise),
+    ("normalize_name", ref_normalize_name, normalisation.normalize_name),
+    ("pydref.normalize", ref_pydref_normalize, normalisation.normalize_idref),
+    ("normalize_text", ref_normalize_text, normalisation.normalize_text),
+]
+
+# --- Corpus synthétique ---
+WORDS = ["étude", "Analyse", "sol", "forêt", "Ŝtrasse", "œuvre", "naïve", "Zürich", "l'eau",
+         "ARN", "co-culture", "Résumé", "São", "Paulo", "Dvořák", "α-synucléine", "CO₂",
+         "Müller", "García", "Lévêque", "Jean-François", "O'Brien", "Ngô", "Þór", "ﬁn"]
+PUNCT = [",", ".", ":", ";", " - ", "(", ")", "[", "]", "?", "!", "«", "»", "\xa0", "  ", "\t"]
+
+
+def synthetic_texts(n_texts, seed=42):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n_texts):
+        parts = []
+        for _ in range(rng.randint(1, 12)):
+            parts.append(rng.choice(WORDS))
+            if rng.random() < 0.3:
+                parts.append(rng.choice(PUNCT))
+        text_item = " ".join(parts)
+        if rng.random() < 0.2:
+            text_item = f"{rng.choice(WORDS)}, {rng.choice(WORDS)}"  # forme « Nom, Prénom »
+        texts.append(text_item)
+    # Répétitions comme dans les données réelles (mêmes titres et auteurs vus plusieurs fois)
+    return texts + rng.choices(texts, k=n_texts)
+
+
+def check_parity(texts):
+    extra_values = [None, 12, "", "   ", "ÉÈÊ", "Dupont,", ", Jean", "áb", "İstanbul"]
+    for label, ref_func, new_func in PAIRS:
+        for text_item in texts + extra_values:
+            try:
+                expected = ref_func(text_item)
+            except Exception as e:
+                expected = type(e)
+            try:
+                obtained = new_func(text_item)
+            except Exception as e:
+                obtained = type(e)
+            assert expected == obtained, f"{label}: {text_item!r} -> {expected!r} != {obtained!r}"
+        print(f"parité OK : {label} ({len(texts) + len(extra_values)} valeurs)")
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def run_benchmark(n_texts):
+    texts = synthetic_texts(n_texts)
+    check_parity(texts)
+    print(f"\n{len(texts)} textes ({n_texts} distincts au plus)")
+    print(f"{'fonction':<18} {'référence':>10} {'froid':>10} {'chaud':>10} {'many':>10}")
+    for label, ref_func, new_func in PAIRS:
+        normalisation.clear_normalisation_caches()
+        ref_time = timed(lambda: [ref_func(t) for t in texts])
+        cold_time = timed(lambda: [new_func(t) for t in texts])
+        warm_time = timed(lambda: [new_func(t) for t in texts])
+        normalisation.clear_normalisation_caches()
+        many_time = timed(normalisation.normalise_many, texts, new_func)
+        print(f"{label:<18} {ref_time:>9.3f}s {cold_time:>9.3f}s {warm_time:>9.3f}s {many_time:>9.3f}s")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
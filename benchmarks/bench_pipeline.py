@@ -0,0 +1,224 @@
+"""
+Benchmark hors ligne du pipeline c2LabHAL, étape par étape, sur un laboratoire synthétique.
+
+Les API (HAL, Unpaywall, OA.works, Crossref, IdRef) sont remplacées par le serveur local de
+standin_server.py, lancé dans un processus séparé, avec une latence et un taux d'erreur
+réglables. Étapes mesurées (temps écoulé, temps CPU du client, nombre de requêtes) :
+import de la collection HAL (HalCollImporter), fusion des doublons, check_df, Unpaywall,
+permissions, deduce_todo, auteurs Crossref, alignement IdRef (Pydref.identify_many).
+
+Le résultat est écrit en JSON (sortie standard ou --output) ; avec --compare, les temps sont
+comparés à un résultat précédent et le script sort en erreur si une étape a ralenti de plus
+de --tolerance.
+
+Usage : python benchmarks/bench_pipeline.py [--sizes 5000 20000 50000] [--latency-ms 20]
+        [--error-rate 0.01] [--seed 2024] [--unthrottled] [--output résultat.json]
+        [--compare référence.json --tolerance 0.25]
+"""
+import argparse
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("TQDM_DISABLE", "1")
+import pandas as pd  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+import pydref  # noqa: E402
+import utils  # noqa: E402
+import standin_server  # noqa: E402
+
+def deduplicate(combined_df):
+    """Étapes 4 et 5 de streamlit_app.py : normalisation des DOI puis fusion des lignes par DOI."""
+    combined_df = combined_df.copy()
+    combined_df['doi'] = combined_df['doi'].astype(str).apply(utils.clean_doi).str.lower().str.strip()
+    combined_df['doi'] = combined_df['doi'].replace(['none', 'nan', '', '<na>', 'na'], pd.NA)
+    with_doi_df = combined_df[combined_df['doi'].notna()].copy()
+    without_doi_df = combined_df[combined_df['doi'].isna()].copy()
+    merged_data_doi = pd.DataFrame()
+    if not with_doi_df.empty:
+        merged_data_doi = with_doi_df.groupby('doi', as_index=False).apply(utils.merge_rows_with_sources)
+        if 'doi' not in merged_data_doi.columns and merged_data_doi.index.name == 'doi':
+            merged_data_doi.reset_index(inplace=True)
+        if isinstance(merged_data_doi.columns, pd.MultiIndex):
+            merged_data_doi.columns = merged_data_doi.columns.droplevel(0)
+    return pd.concat([merged_data_doi, without_doi_df], ignore_index=True)
+
+
+def crossref_authors(result_df):
+    """Même appel que streamlit_app.py (10 threads, une requête par DOI)."""
+    dois_for_authors = result_df['doi'].fillna("").tolist()
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        return list(executor.map(utils.get_authors_from_crossref, dois_for_authors))
+
+
+def idref_alignment(names):
+    pydref.IDREF_NOTICE_CACHE_PATH = ""  # aucune notice déjà en cache
+    api = pydref.Pydref()
+    results = list(api.identify_many(names))
+    api.notice_executor.shutdown()
+    return [matches for _, matches, _ in results]
+
+
+class StageTimer(object):
+    def __init__(self, server_url):
+        self.server_url = server_url
+        self.stages = {}
+
+    def request_counts(self):
+        with urllib.request.urlopen(f"{self.server_url}/__stats__", timeout=10) as response:
+            return json.load(response)
+
+    def run(self, stage_name, func, *args):
+        counts_before = self.request_counts()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        result = func(*args)
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        counts_after = self.request_counts()
+        requests_by_host = {host: count - counts_before.get(host, 0) for host, count in counts_after.items()
+                            if count != counts_before.get(host, 0)}
+        self.stages[stage_name] = {"seconds": round(wall, 4), "cpu_seconds": round(cpu, 4),
+                                   "requests": sum(requests_by_host.values()), "requests_by_host": requests_by_host,
+                                   "rows": len(result) if hasattr(result, "__len__") else None}
+        print(f"  {stage_name:<18} {wall:8.2f}s  cpu {cpu:7.2f}s  {sum(requests_by_host.values()):7d} requêtes",
+              file=sys.stderr)
+        return result
+
+
+def run_pipeline(lab, server_url):
+    timer = StageTimer(server_url)
+    combined_df = pd.DataFrame(lab.source_records())
+
+    def hal_import():
+        importer = utils.HalCollImporter(standin_server.COLLECTION_CODE, standin_server.START_YEAR,
+                                         standin_server.END_YEAR)
+        return importer.import_data(), importer.titles_df
+
+    coll_df, coll_titles_df = timer.run("hal_import", hal_import)
+    merged_df = timer.run("dedup", deduplicate, combined_df)
+    result_df = timer.run("check_df", lambda: utils.check_df(
+        merged_df.copy(), coll_df, collection_code=standin_server.COLLECTION_CODE, hal_titles_df=coll_titles_df))
+    result_df = timer.run("unpaywall", utils.enrich_w_upw_parallel, result_df)
+    utils._PERMISSIONS_CACHE.clear()
+    result_df = timer.run("permissions", utils.add_permissions_parallel, result_df)
+    result_df['Action'] = timer.run("deduce_todo", lambda: result_df.apply(utils.deduce_todo, axis=1))
+    timer.run("crossref_authors", crossref_authors, result_df)
+    idref_matches = timer.run("idref_alignment", idref_alignment, lab.people_full_names())
+
+    timer.stages["hal_import"]["rows"] = len(coll_df)
+    summary = {
+        "source_rows": len(combined_df),
+        "unique_publications": len(merged_df),
+        "statut_hal": {str(k): int(v) for k, v in result_df['Statut_HAL'].value_counts().items() if v},
+        "actions_create_notice": int(result_df['Action'].astype(str).str.contains(utils.TEI_DEPOSIT_ACTION,
+                                                                                   regex=False).sum()),
+        "idref_single_match": sum(1 for matches in idref_matches if len(matches) == 1),
+    }
+    return timer.stages, summary
+
+
+def start_server(nb_publications, args):
+    parent_connection, child_connection = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=standin_server.serve, daemon=True,
+                                      args=(nb_publications, args.seed, args.latency_ms, args.error_rate,
+                                            child_connection))
+    process.start()
+    port = parent_connection.recv()
+    return process, f"http://127.0.0.1:{port}"
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare_results(results, reference, tolerance):
+    """Liste des (taille, étape, référence, mesure) ayant ralenti de plus de tolerance."""
+    reference_runs = {run["nb_publications"]: run for run in reference.get("runs", [])}
+    regressions = []
+    for run in results["runs"]:
+        reference_run = reference_runs.get(run["nb_publications"])
+        if not reference_run:
+            continue
+        for stage_name, measure in run["stages"].items():
+            reference_seconds = reference_run["stages"].get(stage_name, {}).get("seconds")
+            if reference_seconds and measure["seconds"] > reference_seconds * (1 + tolerance):
+                regressions.append((run["nb_publications"], stage_name, reference_seconds, measure["seconds"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000],
+                        help="nombres de publications du laboratoire synthétique (ex. 5000 20000 50000)")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="latence ajoutée à chaque réponse")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="part des URL qui répondent 503")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--unthrottled", action="store_true",
+                        help="lève la limite de requêtes IdRef (pydref.IDREF_MAX_REQUESTS_PER_SECOND)")
+    parser.add_argument("--output", help="fichier JSON de résultat (par défaut : sortie standard)")
+    parser.add_argument("--compare", help="résultat JSON de référence")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="ralentissement toléré (0.25 = +25 %%)")
+    args = parser.parse_args()
+
+    if args.unthrottled:
+        pydref.IDREF_MAX_REQUESTS_PER_SECOND = 10 ** 6
+
+    results = {
+        "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "cpu_count": os.cpu_count(),
+        "parameters": {"latency_ms": args.latency_ms, "error_rate": args.error_rate, "seed": args.seed,
+                       "idref_max_requests_per_second": pydref.IDREF_MAX_REQUESTS_PER_SECOND},
+        "runs": [],
+    }
+    for nb_publications in args.sizes:
+        print(f"Laboratoire synthétique de {nb_publications} publications", file=sys.stderr)
+        lab = standin_server.SyntheticLab(nb_publications, args.seed)
+        process, server_url = start_server(nb_publications, args)
+        restore_requests = standin_server.redirect_requests(server_url)
+        try:
+            start = time.perf_counter()
+            stages, summary = run_pipeline(lab, server_url)
+            results["runs"].append({"nb_publications": nb_publications, "people": len(lab.people),
+                                    "total_seconds": round(time.perf_counter() - start, 4),
+                                    "stages": stages, "summary": summary})
+        finally:
+            restore_requests()
+            process.terminate()
+            process.join()
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare_results(results, json.load(f), args.tolerance)
+        for nb_publications, stage_name, reference_seconds, seconds in regressions:
+            print(f"régression : {stage_name} ({nb_publications} publications) {reference_seconds:.2f}s -> {seconds:.2f}s",
+                  file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+Serveur HTTP local qui tient lieu des API interrogées par le pipeline (HAL, Unpaywall,
+OA.works, Crossref, IdRef), pour un laboratoire synthétique reproductible.
+
+Les requêtes du client sont redirigées vers ce serveur par redirect_requests : l'URL
+https://api.unpaywall.org/v2/<doi> devient http://127.0.0.1:<port>/api.unpaywall.org/v2/<doi>.
+Le code du pipeline (requests, pools de threads, lecture JSON) est donc exécuté tel quel.
+Chaque réponse est retardée de latency_ms ; une fraction error_rate des URL (toujours les
+mêmes pour une graine donnée) répond 503. GET /__stats__ donne le nombre de requêtes par hôte.
+
+Utilisé par bench_pipeline.py ; lancé dans un processus séparé pour ne pas fausser les mesures.
+"""
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+COLLECTION_CODE = "LABOSYNTH"
+START_YEAR, END_YEAR = 2018, 2024
+
+WORDS = ["soil", "carbon", "dynamics", "temperate", "forest", "microbial", "community", "response",
+         "climate", "warming", "nitrogen", "cycle", "urban", "river", "sediment", "model", "bayesian",
+         "inference", "protein", "folding", "cell", "signalling", "cancer", "therapy", "cohort", "study",
+         "children", "language", "acquisition", "medieval", "Brittany", "law", "policy", "Europe", "ocean",
+         "plankton", "genome", "assembly", "deep", "learning", "images", "graph", "network", "analysis"]
+LAST_NAMES = ["Martin", "Bernard", "Dubois", "Thomas", "Robert", "Richard", "Petit", "Durand", "Leroy",
+              "Moreau", "Simon", "Laurent", "Lefèvre", "Michel", "García", "Nguyen", "Müller", "Le Gall",
+              "Guillou", "Le Goff", "Tanguy", "Morvan", "Kerjean", "Rossi", "Schmidt", "Kowalski", "Silva",
+              "Chen", "Wang", "Haddad", "Benali", "Diallo", "Fontaine", "Chevalier", "Roux", "Blanc"]
+FIRST_NAMES = ["Anne", "Jean", "Marie", "Pierre", "Sophie", "Luc", "Hélène", "José", "Li", "Camille",
+               "Yann", "Gwenaëlle", "Erwan", "Nathalie", "Thomas", "Claire", "Olivier", "Aurélie", "Karim",
+               "Fatou", "Ming", "Elena", "Paul", "Julie", "Marc"]
+PUBLISHERS = ["Elsevier", "Springer", "Wiley", "MDPI", "Frontiers", "CNRS Éditions", "PUR"]
+JOURNALS = ["Soil Biology and Biochemistry", "Global Change Biology", "PLOS ONE", "Scientific Reports",
+            "Annales de Bretagne", "Journal of Ecology", "Nature Communications", "Revue d'histoire"]
+
+
+class SyntheticLab(object):
+    """
+    Laboratoire synthétique de nb_publications publications, entièrement déterminé par la graine :
+    sources (OpenAlex, Scopus), collection HAL, autres dépôts HAL, réponses Unpaywall, OA.works,
+    Crossref et IdRef.
+    """
+
+    def __init__(self, nb_publications, seed=2024):
+        rng = random.Random(seed)
+        nb_people = max(50, nb_publications // 20)
+        people_names = {}
+        while len(people_names) < nb_people:
+            last_name = rng.choice(LAST_NAMES)
+            if rng.random() < 0.3:
+                last_name += "-" + rng.choice(LAST_NAMES)
+            people_names[(rng.choice(FIRST_NAMES), last_name)] = None
+        self.people = list(people_names)
+        # IdRef : 80 % des personnes ont une notice, 5 % un homonyme né avant 1920
+        self.idref_people = []
+        for position, (first_name, last_name) in enumerate(self.people):
+            if rng.random() < 0.8:
+                self.idref_people.append({"ppn": f"{100000000 + position}X", "first_name": first_name,
+                                          "last_name": last_name, "birth": rng.randint(1950, 1995)})
+                if rng.random() < 0.05:
+                    self.idref_people.append({"ppn": f"{200000000 + position}X", "first_name": first_name,
+                                              "last_name": last_name, "birth": rng.randint(1850, 1910)})
+
+        self.publications = []
+        for position in range(nb_publications):
+            year = rng.randint(START_YEAR, END_YEAR)
+            authors = rng.sample(self.people, rng.randint(1, 4))
+            authors += [(rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)) for _ in range(rng.randint(0, 8))]
+            rng.shuffle(authors)
+            title_words = [rng.choice(WORDS) for _ in range(rng.randint(4, 14))]
+            self.publications.append({
+                "doi": f"10.{4000 + position % 700}/labosynth.{year}.{position}" if rng.random() < 0.92 else None,
+                "title": " ".join(title_words).capitalize() + f" ({position})",
+                "date": f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                "journal": rng.choice(JOURNALS),
+                "publisher": rng.choice(PUBLISHERS),
+                "authors": authors,
+                "in_openalex": rng.random() < 0.9,
+                "in_scopus": rng.random() < 0.6,
+                # HAL : 55 % dans la collection, 10 % déposées ailleurs dans HAL
+                "hal": rng.choices(["collection", "elsewhere", None], weights=[55, 10, 35])[0],
+                "submit_type": rng.choice(["file", "notice"]),
+                "oa": rng.choices(["publisher", "repository", "closed", "unknown"], weights=[30, 15, 50, 5])[0],
+                "permission": rng.choices(["accepted", "published", "none", "unknown"], weights=[55, 15, 20, 10])[0],
+                "in_crossref": rng.random() < 0.97,
+            })
+
+        self.hal_docs = []
+        for position, publication in enumerate(self.publications):
+            if publication["hal"]:
+                self.hal_docs.append(self._hal_doc(1000000 + position, publication, publication["hal"] == "collection"))
+        # Documents de la collection absents des sources
+        for position in range(nb_publications // 10):
+            year = rng.randint(START_YEAR, END_YEAR)
+            self.hal_docs.append(self._hal_doc(5000000 + position, {
+                "doi": f"10.9999/hal-only.{position}" if rng.random() < 0.5 else None,
+                "title": " ".join(rng.choice(WORDS) for _ in range(8)).capitalize() + f" [hal {position}]",
+                "date": f"{year}-01-01", "submit_type": rng.choice(["file", "notice"])}, True))
+
+    @staticmethod
+    def _hal_doc(docid, publication, in_collection):
+        hal_doc = {"docid": str(docid), "title_s": [publication["title"]], "submitType_s": publication["submit_type"],
+                   "uri_s": f"https://hal.science/hal-{docid:08d}", "linkExtUrl_s": "", "linkExtId_s": "",
+                   "collCode_s": ["UNIV-RENNES", COLLECTION_CODE] if in_collection else ["UNIV-NANTES"],
+                   "publicationDateY_i": int(publication["date"][:4])}
+        if publication["doi"]:
+            hal_doc["doiId_s"] = publication["doi"]
+        return hal_doc
+
+    def source_records(self):
+        """Lignes OpenAlex et Scopus (colonnes du DataFrame combiné des applications)."""
+        rows = []
+        for position, publication in enumerate(self.publications):
+            for source_name, present in (("openalex", publication["in_openalex"]), ("scopus", publication["in_scopus"])):
+                if present:
+                    doi = publication["doi"]
+                    rows.append({"Data source": source_name, "Title": publication["title"],
+                                 "doi": f"https://doi.org/{doi}" if doi and source_name == "openalex" else doi,
+                                 "id": f"{source_name}:{position}", "Source title": publication["journal"],
+                                 "Date": publication["date"]})
+        return rows
+
+    def people_full_names(self):
+        return [f"{first_name} {last_name}" for first_name, last_name in self.people]
+
+
+def _notice_xml(person):
+    def datafield(tag, subfields):
+        inner = "".join(f'<subfield code="{code}">{text}</subfield>' for code, text in subfields)
+        return f'<datafield tag="{tag}" ind1=" " ind2=" ">{inner}</datafield>'
+
+    fields = [f'<controlfield tag="001">{person["ppn"]}</controlfield>',
+              datafield("035", [("a", f"0000-0002-{person['ppn'][1:5]}-{person['ppn'][5:9]}"), ("2", "ORCID")]),
+              datafield("103", [("a", f"{person['birth']}0101")]),
+              datafield("120", [("a", "ba")]),
+              datafield("200", [("a", person["last_name"]), ("b", person["first_name"])]),
+              datafield("340", [("a", "Enseignant-chercheur")]),
+              datafield("400", [("a", person["last_name"].upper()), ("b", person["first_name"][0] + ".")])]
+    return f'<?xml version="1.0" encoding="UTF-8"?><record>{"".join(fields)}</record>'
+
+
+def _unescape_solr(value):
+    return re.sub(r"\\(.)", r"\1", value)
+
+
+class StandInApis(object):
+    """Réponses des API pour un SyntheticLab (index construits une fois)."""
+
+    def __init__(self, lab):
+        self.lab = lab
+        self.docs_by_doi = {}
+        self.docs_by_title = {}
+        for hal_doc in lab.hal_docs:
+            if hal_doc.get("doiId_s"):
+                self.docs_by_doi.setdefault(hal_doc["doiId_s"].lower(), []).append(hal_doc)
+            self.docs_by_title.setdefault(hal_doc["title_s"][0].lower(), []).append(hal_doc)
+        self.collection_docs = sorted((d for d in lab.hal_docs if COLLECTION_CODE in d["collCode_s"]),
+                                      key=lambda d: int(d["docid"]))
+        self.publications_by_doi = {p["doi"].lower(): p for p in lab.publications if p["doi"]}
+        self.idref_by_tokens = {}
+        self.idref_by_ppn = {}
+        for person in lab.idref_people:
+            tokens = frozenset(f"{person['first_name']} {person['last_name']}".lower().split())
+            self.idref_by_tokens.setdefault(tokens, []).append(person)
+            self.idref_by_ppn[person["ppn"]] = person
+
+    def respond(self, host, path, params):
+        """(statut HTTP, corps JSON ou texte)."""
+        if host == "api.archives-ouvertes.fr" and path.startswith("/search/"):
+            return self.hal_search(path[len("/search/"):].strip("/"), params)
+        if host == "api.unpaywall.org" and path.startswith("/v2/"):
+            return self.unpaywall(path[len("/v2/"):])
+        if host == "bg.api.oa.works" and path.startswith("/permissions/"):
+            return self.permissions(path[len("/permissions/"):])
+        if host == "api.crossref.org" and path.startswith("/works/"):
+            return self.crossref(path[len("/works/"):])
+        if host == "www.idref.fr" and path == "/Sru/Solr":
+            return self.idref_solr(params)
+        if host == "www.idref.fr" and path.endswith(".xml"):
+            person = self.idref_by_ppn.get(path[1:-len(".xml")])
+            return (200, _notice_xml(person)) if person else (404, "")
+        return 404, {"error": f"{host}{path} non simulé"}
+
+    def hal_search(self, collection, params):
+        query = params.get("q", "*:*")
+        if query.startswith("doiId_s:"):
+            dois = [_unescape_solr(doi).lower() for doi in re.findall(r'"((?:\\.|[^\\"])*)"', query)]
+            docs = [d for doi in dois for d in self.docs_by_doi.get(doi, [])]
+            return 200, {"response": {"numFound": len(docs), "docs": docs[:int(params.get("rows", 10))]}}
+        if query.startswith("title_t:"):
+            titles = [_unescape_solr(title).lower() for title in re.findall(r"title_t:\(((?:\\.|[^\\)])*)\)", query)]
+            docs = [d for title in titles for d in self.docs_by_title.get(title, [])]
+            return 200, {"response": {"numFound": len(docs), "docs": docs[:int(params.get("rows", 10))]}}
+
+        docs = self.collection_docs if collection == COLLECTION_CODE else []
+        year_filter = re.match(r"publicationDateY_i:(?:\[(\d+) TO (\d+|\*)\]|(\d+))$", params.get("fq", ""))
+        if year_filter:
+            first_year = int(year_filter.group(1) or year_filter.group(3))
+            last_year = year_filter.group(3) or year_filter.group(2)
+            last_year = 10 ** 6 if last_year == "*" else int(last_year)
+            docs = [d for d in docs if first_year <= d["publicationDateY_i"] <= last_year]
+        rows = int(params.get("rows", 10))
+        if params.get("facet") == "true":
+            counts = {}
+            for hal_doc in docs:
+                counts[hal_doc["publicationDateY_i"]] = counts.get(hal_doc["publicationDateY_i"], 0) + 1
+            facet = [value for year in sorted(counts) for value in (str(year), counts[year])]
+            return 200, {"response": {"numFound": len(docs), "docs": docs[:rows]},
+                         "facet_counts": {"facet_fields": {"publicationDateY_i": facet}}}
+        cursor = params.get("cursorMark", "*")
+        offset = 0 if cursor == "*" else int(cursor)
+        page = docs[offset:offset + rows]
+        next_cursor = str(offset + len(page)) if page else cursor
+        return 200, {"response": {"numFound": len(docs), "docs": page}, "nextCursorMark": next_cursor}
+
+    def unpaywall(self, doi):
+        publication = self.publications_by_doi.get(doi.lower())
+        if not publication or publication["oa"] == "unknown":
+            return 404, {"message": f"{doi} isn't in Unpaywall"}
+        body = {"doi": doi, "is_oa": publication["oa"] != "closed", "publisher": publication["publisher"],
+                "oa_status": {"publisher": "gold", "repository": "green", "closed": "closed"}[publication["oa"]],
+                "best_oa_location": None}
+        if publication["oa"] != "closed":
+            body["best_oa_location"] = {"host_type": publication["oa"], "license": "cc-by",
+                                        "url": f"https://example.org/{doi}", "url_for_pdf": f"https://example.org/{doi}.pdf"}
+        return 200, body
+
+    def permissions(self, doi):
+        publication = self.publications_by_doi.get(doi.lower())
+        if not publication or publication["permission"] == "unknown":
+            return 404, {}
+        if publication["permission"] == "none":
+            return 200, {"best_permission": None}
+        return 200, {"best_permission": {
+            "version": "acceptedVersion" if publication["permission"] == "accepted" else "publishedVersion",
+            "licence": "cc-by", "embargo_months": 6 if publication["permission"] == "accepted" else 0,
+            "locations": ["institutional repository"]}}
+
+    def crossref(self, doi):
+        publication = self.publications_by_doi.get(doi.lower())
+        if not publication or not publication["in_crossref"]:
+            return 404, "Resource not found."
+        return 200, {"status": "ok", "message": {
+            "DOI": doi, "author": [{"given": first_name, "family": last_name, "sequence": "additional"}
+                                   for first_name, last_name in publication["authors"]]}}
+
+    def idref_solr(self, params):
+        clauses = re.findall(r"persname_t: \(([^)]*)\)", params.get("q", ""))
+        docs = []
+        for clause in clauses:
+            tokens = frozenset(token.lower() for token in clause.split(" AND ") if token)
+            for person in self.idref_by_tokens.get(tokens, []):
+                docs.append({"ppn_z": person["ppn"], "nom_s": [person["last_name"]], "prenom_s": [person["first_name"]],
+                             "persname_t": [f"{person['last_name']}, {person['first_name']} ({person['birth']}-....)"],
+                             "datenaissance_dt": f"{person['birth']}-01-01T00:00:00Z"})
+        rows = int(params.get("rows", 10))
+        return 200, {"response": {"numFound": len(docs), "docs": docs[:rows]}}
+
+
+def make_handler(apis, latency_ms, error_rate):
+    stats = {}
+    stats_lock = threading.Lock()
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path == "/__stats__":
+                with stats_lock:
+                    return self._send(200, dict(stats))
+            host, _, rest = self.path[1:].partition("/")
+            url = urlsplit("/" + rest)
+            with stats_lock:
+                stats[host] = stats.get(host, 0) + 1
+            if latency_ms:
+                time.sleep(latency_ms / 1000.0)
+            if error_rate and zlib.crc32(self.path.encode("utf-8")) % 10000 < error_rate * 10000:
+                return self._send(503, "Service Unavailable")
+            params = {key: values[-1] for key, values in parse_qs(url.query, keep_blank_values=True).items()}
+            status, body = apis.respond(host, url.path, params)
+            self._send(status, body)
+
+        def _send(self, status, body):
+            if isinstance(body, str):
+                payload, content_type = body.encode("utf-8"), "text/xml; charset=utf-8"
+            else:
+                payload, content_type = json.dumps(body).encode("utf-8"), "application/json"
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return StandInHandler
+
+
+def serve(nb_publications, seed, latency_ms, error_rate, port_connection):
+    """Point d'entrée du processus serveur : envoie le port choisi puis sert indéfiniment."""
+    apis = StandInApis(SyntheticLab(nb_publications, seed))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(apis, latency_ms, error_rate))
+    server.daemon_threads = True
+    server.request_queue_size = 128
+    port_connection.send(server.server_address[1])
+    server.serve_forever()
+
+
+def redirect_requests(server_url):
+    """Redirige toutes les requêtes de requests vers le serveur local ; retourne la fonction qui annule."""
+    original_send = requests.adapters.HTTPAdapter.send
+
+    def send_to_standin(adapter, request, **kwargs):
+        url = urlsplit(request.url)
+        request.url = f"{server_url}/{url.netloc}{url.path}" + (f"?{url.query}" if url.query else "")
+        return original_send(adapter, request, **kwargs)
+
+    requests.adapters.HTTPAdapter.send = send_to_standin
+
+    def restore():
+        requests.adapters.HTTPAdapter.send = original_send
+    return restore
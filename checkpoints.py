@@ -0,0 +1,257 @@
+# checkpoints.py
+# ------------------------------------------------------------
+# Points de reprise du pipeline c2LabHAL : le résultat de chaque étape
+# terminée (et, pendant les étapes d'enrichissement, chaque ligne déjà
+# traitée) est enregistré sur disque, par laboratoire, période et
+# paramètres, pour qu'un traitement interrompu reparte de là où il
+# s'est arrêté.
+# ------------------------------------------------------------
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Base SQLite des points de reprise (désactivée si C2LABHAL_CHECKPOINT_PATH est vide)
+PIPELINE_CHECKPOINT_PATH = os.environ.get(
+    "C2LABHAL_CHECKPOINT_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "c2labhal", "pipeline_checkpoints.sqlite"))
+PIPELINE_CHECKPOINT_TTL = 24 * 3600  # secondes
+PIPELINE_CHECKPOINT_FLUSH_ROWS = 100  # lignes enregistrées par écriture
+PIPELINE_CHECKPOINT_MAX_ENTRIES = 64  # résultats conservés par étape (les plus anciens sont évincés)
+
+# Version du calcul de chaque étape, à incrémenter quand son code (ou celui des fonctions qu'elle
+# appelle) change : les points de reprise et les caches d'étape des versions précédentes sont ignorés.
+STAGE_VERSIONS = {
+    "openalex": 1,
+    "pubmed": 1,
+    "scopus": 1,
+    "sources": 1,
+    "hal_collection": 1,
+    "hal": 1,
+    "unpaywall": 1,
+    "permissions": 1,
+    "crossref_authors": 1,
+}
+
+
+def _digest(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class CheckpointStore(object):
+    """
+    Résultats d'étapes (stages) et de lignes (stage_rows) sur disque, dans une base SQLite,
+    sérialisés avec pickle. Une entrée plus ancienne que ttl est ignorée puis supprimée ; au-delà
+    de max_entries résultats pour une même étape, les plus anciens sont supprimés.
+    """
+
+    def __init__(self, path, ttl=PIPELINE_CHECKPOINT_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.connection = None
+        if not path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS stages (stage_key TEXT PRIMARY KEY, stage TEXT NOT NULL, "
+                "payload BLOB NOT NULL, stored_at REAL NOT NULL)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS stage_rows (stage_key TEXT NOT NULL, row_key TEXT NOT NULL, "
+                "payload BLOB NOT NULL, stored_at REAL NOT NULL, PRIMARY KEY (stage_key, row_key))")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS stages_stored_at ON stages (stored_at)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS stages_stage_stored_at ON stages (stage, stored_at)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS stage_rows_stored_at ON stage_rows (stored_at)")
+            self.connection.commit()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("Points de reprise désactivés (%s) : %s", path, e)
+            self.connection = None
+
+    def get_stage(self, stage_key, max_age=None):
+        """Résultat enregistré, ou None ; max_age (secondes, au plus ttl) restreint aux résultats plus récents."""
+        if self.connection is None:
+            return None
+        max_age = self.ttl if max_age is None else min(max_age, self.ttl)
+        try:
+            with self.lock:
+                row = self.connection.execute(
+                    "SELECT payload FROM stages WHERE stage_key = ? AND stored_at >= ?",
+                    (stage_key, time.time() - max_age)).fetchone()
+            return pickle.loads(row[0]) if row else None
+        except (sqlite3.Error, pickle.UnpicklingError, AttributeError, EOFError, ImportError) as e:
+            logger.error("Erreur de lecture du point de reprise %s : %s", stage_key, e)
+            return None
+
+    def put_stage(self, stage_key, stage_name, value, max_entries=PIPELINE_CHECKPOINT_MAX_ENTRIES):
+        if self.connection is None:
+            return
+        stored_at = time.time()
+        try:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            with self.lock:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO stages (stage_key, stage, payload, stored_at) VALUES (?, ?, ?, ?)",
+                    (stage_key, stage_name, payload, stored_at))
+                # Les lignes de l'étape sont désormais contenues dans son résultat
+                self.connection.execute("DELETE FROM stage_rows WHERE stage_key = ?", (stage_key,))
+                self._evict(stored_at, stage_name, max_entries)
+                self.connection.commit()
+        except (sqlite3.Error, pickle.PicklingError, TypeError) as e:
+            logger.error("Erreur d'écriture du point de reprise %s : %s", stage_name, e)
+
+    def get_rows(self, stage_key, row_keys):
+        """row_key -> résultat, pour les lignes déjà enregistrées et non expirées."""
+        if self.connection is None or not row_keys:
+            return {}
+        rows_found = {}
+        min_stored_at = time.time() - self.ttl
+        row_keys = list(row_keys)
+        try:
+            with self.lock:
+                for start in range(0, len(row_keys), 500):
+                    chunk = row_keys[start:start + 500]
+                    rows = self.connection.execute(
+                        f"SELECT row_key, payload FROM stage_rows WHERE stage_key = ? AND stored_at >= ? "
+                        f"AND row_key IN ({','.join('?' * len(chunk))})",
+                        [stage_key, min_stored_at] + chunk).fetchall()
+                    rows_found.update((row_key, pickle.loads(payload)) for row_key, payload in rows)
+        except (sqlite3.Error, pickle.UnpicklingError, AttributeError, EOFError, ImportError) as e:
+            logger.error("Erreur de lecture des lignes du point de reprise %s : %s", stage_key, e)
+            return {}
+        return rows_found
+
+    def put_rows(self, stage_key, values_by_row):
+        if self.connection is None or not values_by_row:
+            return
+        stored_at = time.time()
+        try:
+            payloads = [(stage_key, row_key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), stored_at)
+                        for row_key, value in values_by_row.items()]
+            with self.lock:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO stage_rows (stage_key, row_key, payload, stored_at) VALUES (?, ?, ?, ?)",
+                    payloads)
+                self.connection.commit()
+        except (sqlite3.Error, pickle.PicklingError, TypeError) as e:
+            logger.error("Erreur d'écriture des lignes du point de reprise %s : %s", stage_key, e)
+
+    def _evict(self, now, stage_name, max_entries):
+        self.connection.execute("DELETE FROM stages WHERE stored_at < ?", (now - self.ttl,))
+        self.connection.execute("DELETE FROM stage_rows WHERE stored_at < ?", (now - self.ttl,))
+        evicted = self.connection.execute(
+            "SELECT stage_key FROM stages WHERE stage = ? ORDER BY stored_at DESC LIMIT -1 OFFSET ?",
+            (stage_name, max_entries)).fetchall()
+        if evicted:
+            self.connection.executemany("DELETE FROM stages WHERE stage_key = ?", evicted)
+            self.connection.executemany("DELETE FROM stage_rows WHERE stage_key = ?", evicted)
+
+
+_checkpoint_store = None
+_checkpoint_store_lock = threading.Lock()
+
+
+def get_checkpoint_store():
+    """Base partagée par toutes les sessions du processus."""
+    global _checkpoint_store
+    with _checkpoint_store_lock:
+        if _checkpoint_store is None:
+            _checkpoint_store = CheckpointStore(PIPELINE_CHECKPOINT_PATH)
+    return _checkpoint_store
+
+
+def stage_cache_key(name, **params):
+    """Clé d'un résultat d'étape partagé par tous les traitements (stage_cache.py) : étape, version et paramètres."""
+    return _digest("stage_cache", name, STAGE_VERSIONS.get(name, 1), params)
+
+
+class StageCheckpoint(object):
+    """Point de reprise d'une étape : résultat complet (load/save) et lignes déjà traitées (get_rows/save_row)."""
+
+    def __init__(self, run, name, stage_key, rows_key):
+        self.run = run
+        self.name = name
+        self.stage_key = stage_key
+        self.rows_key = rows_key
+        self.pending_rows = {}
+
+    def load(self):
+        """
+        Résultat enregistré de l'étape, ou None. Dès qu'une étape doit être recalculée,
+        les suivantes le sont aussi (leurs résultats enregistrés ne correspondent plus).
+        """
+        if not self.run.resuming:
+            return None
+        value = self.run.store.get_stage(self.stage_key)
+        if value is None:
+            self.run.resuming = False
+        return value
+
+    def save(self, value, is_final=True):
+        """
+        Enregistre le résultat de l'étape. Avec is_final=False (résultat obtenu malgré des erreurs
+        transitoires), seules les lignes déjà obtenues sont conservées : l'étape sera refaite à la reprise.
+        """
+        if not is_final:
+            self.flush()
+            return
+        self.pending_rows = {}
+        self.run.store.put_stage(self.stage_key, self.name, value)
+
+    def get_rows(self, row_keys):
+        if not self.run.resume:
+            return {}
+        return self.run.store.get_rows(self.rows_key, row_keys)
+
+    def save_row(self, row_key, value):
+        self.pending_rows[row_key] = value
+        if len(self.pending_rows) >= PIPELINE_CHECKPOINT_FLUSH_ROWS:
+            self.flush()
+
+    def flush(self):
+        if self.pending_rows:
+            self.run.store.put_rows(self.rows_key, self.pending_rows)
+            self.pending_rows = {}
+
+
+RUN_EN_COURS = "en cours"
+RUN_TERMINE = "terminé"
+
+
+class PipelineCheckpoints(object):
+    """
+    Points de reprise d'un traitement, identifié par l'application et ses paramètres
+    (collection, identifiants du labo, années...). Seul un traitement qui n'a pas abouti
+    (interrompu, arrêté par une erreur) est repris : après finish(), le traitement suivant
+    avec les mêmes paramètres repart de zéro. Avec resume=False, rien n'est relu mais les
+    résultats sont enregistrés pour une reprise ultérieure.
+    """
+
+    def __init__(self, app_name, resume=True, store=None, **run_params):
+        self.store = store if store is not None else get_checkpoint_store()
+        self.run_key = _digest(app_name, run_params)
+        self.state_key = _digest(self.run_key, "run")
+        self.resume = resume and self.store.get_stage(self.state_key) == RUN_EN_COURS
+        self.resuming = self.resume
+        self.store.put_stage(self.state_key, "run", RUN_EN_COURS)
+
+    def finish(self):
+        """Traitement abouti : ses points de reprise ne seront plus relus."""
+        self.store.put_stage(self.state_key, "run", RUN_TERMINE)
+
+    def stage(self, name, shared_rows=False, **stage_params):
+        """
+        Point de reprise de l'étape name. Avec shared_rows=True, le résultat d'une ligne ne dépend que
+        de sa clé (un DOI, par exemple) : les lignes enregistrées sont partagées par tous les traitements.
+        """
+        version = STAGE_VERSIONS.get(name, 1)
+        stage_key = _digest(self.run_key, name, version, stage_params)
+        rows_key = _digest("rows", name, version) if shared_rows else stage_key
+        return StageCheckpoint(self, name, stage_key, rows_key)
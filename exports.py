@@ -0,0 +1,112 @@
+import datetime
+import os
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# --- Moteur Excel
+try:
+    import xlsxwriter
+    EXCEL_ENGINE = "xlsxwriter"
+except ImportError:
+    xlsxwriter = None
+    try:
+        import openpyxl
+        EXCEL_ENGINE = "openpyxl"
+    except ImportError:
+        EXCEL_ENGINE = None
+
+EXPORT_CHUNK_ROWS = 5000  # lignes converties à la fois
+
+
+def write_csv_chunks(df, text_file, chunk_rows=EXPORT_CHUNK_ROWS, **to_csv_kwargs):
+    """Écrit df en CSV dans un fichier texte ouvert, par blocs de chunk_rows lignes (même contenu que to_csv)."""
+    header = to_csv_kwargs.pop("header", True)
+    if df.empty:
+        df.to_csv(text_file, header=header, **to_csv_kwargs)
+        return
+    for start in range(0, len(df), chunk_rows):
+        df.iloc[start:start + chunk_rows].to_csv(text_file, header=header if start == 0 else False, **to_csv_kwargs)
+
+
+@contextmanager
+def temporary_export_path(suffix):
+    """Chemin d'un fichier temporaire, supprimé à la sortie du bloc."""
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def write_csv_export(df, path, encoding="utf-8", chunk_rows=EXPORT_CHUNK_ROWS, **to_csv_kwargs):
+    """Export CSV écrit par blocs dans le fichier path, sans construire le texte complet en mémoire. Retourne path."""
+    with open(path, "w", encoding=encoding, newline="") as text_file:
+        write_csv_chunks(df, text_file, chunk_rows=chunk_rows, **to_csv_kwargs)
+    return path
+
+
+@contextmanager
+def csv_export_file(df, encoding="utf-8", chunk_rows=EXPORT_CHUNK_ROWS, **to_csv_kwargs):
+    """
+    Export CSV (write_csv_export) dans un fichier temporaire.
+    Produit le fichier ouvert en lecture binaire (à passer à st.download_button), supprimé ensuite.
+    """
+    with temporary_export_path(".csv") as path:
+        write_csv_export(df, path, encoding=encoding, chunk_rows=chunk_rows, **to_csv_kwargs)
+        with open(path, "rb") as binary_file:
+            yield binary_file
+
+
+def _excel_value(value):
+    """Valeur de cellule acceptée par xlsxwriter (None pour une cellule vide, comme to_excel)."""
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime() if value.tzinfo is None else str(value)
+    if isinstance(value, (str, bool, int, float, datetime.date)):
+        return value
+    return str(value)
+
+
+def _write_sheet_constant_memory(workbook, sheet_name, df, header_format):
+    worksheet = workbook.add_worksheet(sheet_name)
+    worksheet.write_row(0, 0, [str(column) for column in df.columns], header_format)
+    for row_number, row in enumerate(df.itertuples(index=False, name=None), start=1):
+        worksheet.write_row(row_number, 0, [_excel_value(value) for value in row])
+
+
+@contextmanager
+def xlsx_export_file(sheets):
+    """
+    Classeur XLSX (une feuille par entrée de sheets : nom -> DataFrame) écrit dans un fichier
+    temporaire ; avec xlsxwriter, en mode constant_memory (lignes écrites dans l'ordre puis libérées).
+    Produit le fichier ouvert en lecture binaire, supprimé ensuite.
+    """
+    if EXCEL_ENGINE is None:
+        raise RuntimeError("Aucun moteur Excel disponible. Installez 'xlsxwriter' ou 'openpyxl'.")
+
+    with temporary_export_path(".xlsx") as path:
+        if EXCEL_ENGINE == "xlsxwriter":
+            workbook = xlsxwriter.Workbook(path, {"constant_memory": True,
+                                                  "default_date_format": "yyyy-mm-dd hh:mm:ss"})
+            header_format = workbook.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+            for sheet_name, df in sheets.items():
+                _write_sheet_constant_memory(workbook, sheet_name, df, header_format)
+            workbook.close()
+        else:
+            with pd.ExcelWriter(path, engine=EXCEL_ENGINE) as writer:
+                for sheet_name, df in sheets.items():
+                    df.to_excel(writer, sheet_name=sheet_name, index=False)
+        with open(path, "rb") as binary_file:
+            yield binary_file
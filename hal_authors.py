@@ -0,0 +1,272 @@
+# hal_authors.py
+# ------------------------------------------------------------
+# Identifiants auteurs d'une collection HAL et récupération de leurs
+# formes-auteurs (référentiel ref/author), partagés par
+# ExtracteurAuteursHAL.py et idref_hal_alignment.py.
+# ------------------------------------------------------------
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlencode
+
+import requests
+
+from rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+HAL_SEARCH_API = "https://api.archives-ouvertes.fr/search/"
+HAL_AUTHOR_API = "https://api.archives-ouvertes.fr/ref/author/"
+HAL_SEARCH_TIMEOUT = 120
+HAL_CURSOR_ROWS = 1000  # repli sans facette : documents par page (cursorMark)
+HAL_AUTHOR_MAX_URL_LENGTH = 6000  # longueur maximale d'URL d'un lot person_i:"..." OR ...
+HAL_AUTHOR_MAX_BATCH_SIZE = 200  # identifiants au plus par lot
+HAL_AUTHOR_WORKERS = 4  # lots en cours simultanément
+HAL_AUTHOR_REQUEST_TIMEOUT = 30
+HAL_AUTHOR_MAX_ROWS = 10000  # plafond HAL du paramètre rows
+
+# Cache disque person_i -> formes-auteurs (désactivé si HAL_AUTHOR_CACHE_PATH est vide)
+HAL_AUTHOR_CACHE_PATH = os.environ.get(
+    "HAL_AUTHOR_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "c2labhal", "hal_author_forms.sqlite"))
+HAL_AUTHOR_CACHE_TTL = 7 * 24 * 3600  # secondes
+HAL_AUTHOR_CACHE_MAX_ENTRIES = 200000
+
+
+# Identifiant de forme-auteur d'une valeur structHasAuthId_fs :
+# "..._JoinSep_<formId>-<personId>_FacetSep_<nom>" -> "<formId>-<personId>"
+_AUTHOR_FULL_ID_RE = re.compile(r"_JoinSep_((?:(?!_FacetSep|_JoinSep_).)*)", re.DOTALL)
+
+
+def fetch_collection_author_values(collection_code, query="*:*", fq=None):
+    """
+    Valeurs distinctes de structHasAuthId_fs pour une collection, en une requête (facette,
+    facet.limit=-1) ; à défaut de facette dans la réponse, pagination par cursorMark.
+    Retourne (nombre de publications, valeurs).
+    """
+    params = {"q": query, "wt": "json", "rows": 0, "facet": "true",
+              "facet.field": "structHasAuthId_fs", "facet.limit": -1, "facet.mincount": 1}
+    if fq:
+        params["fq"] = fq
+    url = f"{HAL_SEARCH_API}{collection_code}/"
+    response = requests.get(url, params=params, timeout=HAL_SEARCH_TIMEOUT)
+    response.raise_for_status()
+    data = response.json()
+    num_found = data.get("response", {}).get("numFound", 0)
+
+    facet_values = data.get("facet_counts", {}).get("facet_fields", {}).get("structHasAuthId_fs")
+    if facet_values is not None:
+        # Facette Solr : liste à plat [valeur1, nb1, valeur2, nb2, ...]
+        return num_found, facet_values[::2]
+
+    values = set()
+    params = {"q": query, "wt": "json", "fl": "structHasAuthId_fs", "rows": HAL_CURSOR_ROWS,
+              "sort": "docid asc", "cursorMark": "*"}
+    if fq:
+        params["fq"] = fq
+    while True:
+        response = requests.get(url, params=params, timeout=HAL_SEARCH_TIMEOUT)
+        response.raise_for_status()
+        data = response.json()
+        for doc in data.get("response", {}).get("docs", []):
+            values.update(doc.get("structHasAuthId_fs", []))
+        next_cursor = data.get("nextCursorMark")
+        if not next_cursor or next_cursor == params["cursorMark"]:
+            break
+        params["cursorMark"] = next_cursor
+    return num_found, list(values)
+
+
+def extract_author_ids(author_values):
+    """ person_i uniques (docid auteur) des valeurs structHasAuthId_fs. """
+    author_ids = set()
+    for value in author_values:
+        match = _AUTHOR_FULL_ID_RE.search(value)
+        if match:
+            docid = match.group(1).rsplit("-", 1)[-1].strip()
+            if docid.isdigit() and docid != "0":
+                author_ids.add(docid)
+    return list(author_ids)
+
+
+class AuthorFormCache(object):
+    """
+    Formes-auteurs HAL sur disque (SQLite), par person_i et liste de champs demandés.
+    Une entrée plus ancienne que ttl est ignorée ; au-delà de max_entries, les plus
+    anciennes sont supprimées. Seules les réponses valides de l'API y sont enregistrées.
+    """
+
+    def __init__(self, path, ttl=HAL_AUTHOR_CACHE_TTL, max_entries=HAL_AUTHOR_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = None
+        if not path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS author_forms (person_i TEXT NOT NULL, fields TEXT NOT NULL, "
+                "forms TEXT NOT NULL, stored_at REAL NOT NULL, PRIMARY KEY (person_i, fields))")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS author_forms_stored_at ON author_forms (stored_at)")
+            self.connection.commit()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("Cache des formes-auteurs désactivé (%s) : %s", path, e)
+            self.connection = None
+
+    def get_many(self, person_ids, fields):
+        """person_i -> liste de formes, pour les identifiants présents et non expirés."""
+        if self.connection is None or not person_ids:
+            return {}
+        cached = {}
+        min_stored_at = time.time() - self.ttl
+        person_ids = list(person_ids)
+        try:
+            with self.lock:
+                for start in range(0, len(person_ids), 500):
+                    chunk = person_ids[start:start + 500]
+                    rows = self.connection.execute(
+                        f"SELECT person_i, forms FROM author_forms WHERE fields = ? AND stored_at >= ? "
+                        f"AND person_i IN ({','.join('?' * len(chunk))})",
+                        [fields, min_stored_at] + chunk).fetchall()
+                    cached.update((person_id, json.loads(forms)) for person_id, forms in rows)
+        except sqlite3.Error as e:
+            logger.error("Erreur de lecture du cache des formes-auteurs : %s", e)
+            return {}
+        return cached
+
+    def put_many(self, forms_by_person, fields):
+        if self.connection is None or not forms_by_person:
+            return
+        stored_at = time.time()
+        try:
+            with self.lock:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO author_forms (person_i, fields, forms, stored_at) VALUES (?, ?, ?, ?)",
+                    [(person_id, fields, json.dumps(forms), stored_at) for person_id, forms in forms_by_person.items()])
+                self.connection.execute("DELETE FROM author_forms WHERE stored_at < ?", (stored_at - self.ttl,))
+                self.connection.execute(
+                    "DELETE FROM author_forms WHERE rowid IN "
+                    "(SELECT rowid FROM author_forms ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,))
+                self.connection.commit()
+        except sqlite3.Error as e:
+            logger.error("Erreur d'écriture du cache des formes-auteurs : %s", e)
+
+
+_author_form_cache = None
+_author_form_cache_lock = threading.Lock()
+
+
+def get_author_form_cache():
+    """Cache partagé par toutes les sessions du processus."""
+    global _author_form_cache
+    with _author_form_cache_lock:
+        if _author_form_cache is None:
+            _author_form_cache = AuthorFormCache(HAL_AUTHOR_CACHE_PATH)
+    return _author_form_cache
+
+
+def _author_params(batch, fields, rows):
+    or_query = " OR ".join([f'person_i:\"{i}\"' for i in batch])
+    return {"q": or_query, "wt": "json", "fl": fields, "rows": rows}
+
+
+def build_author_batches(person_ids, fields, max_batch_size=HAL_AUTHOR_MAX_BATCH_SIZE,
+                         max_url_length=HAL_AUTHOR_MAX_URL_LENGTH):
+    """Regroupe les identifiants en lots aussi grands que possible sans dépasser la longueur d'URL."""
+    batches, batch = [], []
+    for person_id in person_ids:
+        candidate = batch + [person_id]
+        url_length = len(HAL_AUTHOR_API) + 1 + len(urlencode(_author_params(candidate, fields, len(candidate))))
+        if batch and (len(candidate) > max_batch_size or url_length > max_url_length):
+            batches.append(batch)
+            candidate = [person_id]
+        batch = candidate
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _request_author_batch(batch, fields, rows, rate_limiter):
+    rate_limiter.wait()
+    response = requests.get(HAL_AUTHOR_API, params=_author_params(batch, fields, rows),
+                            timeout=HAL_AUTHOR_REQUEST_TIMEOUT)
+    response.raise_for_status()
+    data = response.json().get("response", {})
+    return data.get("docs", []), data.get("numFound", 0)
+
+
+def _fetch_author_batch(batch, fields, rate_limiter):
+    """
+    Formes-auteurs d'un lot, groupées par person_i (tous les identifiants du lot sont présents).
+    Une réponse incomplète est redemandée une fois avec rows=numFound ; au-delà du plafond HAL
+    (HAL_AUTHOR_MAX_ROWS), le lot est coupé en deux.
+    """
+    rows = min(max(len(batch) * 5, 100), HAL_AUTHOR_MAX_ROWS)
+    docs, num_found = _request_author_batch(batch, fields, rows, rate_limiter)
+    if num_found > len(docs) and rows < HAL_AUTHOR_MAX_ROWS:
+        # Un identifiant peut avoir plusieurs formes : redemander tout
+        rows = min(num_found, HAL_AUTHOR_MAX_ROWS)
+        docs, num_found = _request_author_batch(batch, fields, rows, rate_limiter)
+    if num_found > len(docs):
+        if len(batch) == 1:
+            raise ValueError(f"{num_found} formes-auteurs pour person_i {batch[0]}, au-delà de {len(docs)} renvoyées")
+        middle = len(batch) // 2
+        forms_by_person = _fetch_author_batch(batch[:middle], fields, rate_limiter)
+        forms_by_person.update(_fetch_author_batch(batch[middle:], fields, rate_limiter))
+        return forms_by_person
+    forms_by_person = {person_id: [] for person_id in batch}
+    for doc in docs:
+        forms_by_person.setdefault(str(doc.get("person_i", "")), []).append(doc)
+    return forms_by_person
+
+
+def fetch_author_forms(author_ids, fields, max_batch_size=HAL_AUTHOR_MAX_BATCH_SIZE, request_delay=0.3,
+                       max_workers=HAL_AUTHOR_WORKERS, on_progress=None):
+    """
+    Récupère les formes-auteurs HAL des person_i donnés : identifiants dédoublonnés, déjà connus
+    lus dans le cache disque, autres demandés par lots en parallèle (au plus une requête toutes
+    les request_delay secondes, tous lots confondus).
+    on_progress(nb_identifiants_traités, nb_identifiants) est appelé depuis le thread appelant.
+    Retourne (formes dans l'ordre des identifiants, [(lot, exception)] des lots en échec).
+    """
+    person_ids = list(dict.fromkeys(str(i).strip() for i in author_ids if i is not None and str(i).strip()))
+    if "person_i" not in [f.strip() for f in fields.split(",")]:
+        fields = f"{fields},person_i"
+    total = len(person_ids)
+    cache = get_author_form_cache()
+    forms_by_person = cache.get_many(person_ids, fields)
+    done = len(forms_by_person)
+    if on_progress and total:
+        on_progress(done, total)
+
+    missing_ids = [person_id for person_id in person_ids if person_id not in forms_by_person]
+    failed_batches = []
+    if missing_ids:
+        rate_limiter = RateLimiter(1.0 / request_delay if request_delay > 0 else 1000.0)
+        batches = build_author_batches(missing_ids, fields, max_batch_size)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_batch = {executor.submit(_fetch_author_batch, batch, fields, rate_limiter): batch
+                               for batch in batches}
+            for future in as_completed(future_to_batch):
+                batch = future_to_batch[future]
+                try:
+                    batch_forms = future.result()
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    failed_batches.append((batch, e))
+                else:
+                    forms_by_person.update(batch_forms)
+                    cache.put_many(batch_forms, fields)
+                done += len(batch)
+                if on_progress:
+                    on_progress(done, total)
+
+    authors = [form for person_id in person_ids for form in forms_by_person.get(person_id, [])]
+    return authors, failed_batches
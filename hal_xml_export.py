@@ -1,126 +1,225 @@
 import xml.etree.ElementTree as ET
 import io
+import logging
+import multiprocessing
+import os
+import re
 import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 
-def generate_hal_xml(publication):
-    """
-    Génère un fichier XML HAL-TEI pour une publication donnée.
-    publication : dict avec au moins :
-      Title, doi, Date, Source title, publisher, authors (liste), raw_affiliations (liste)
-    """
+from exports import temporary_export_path
 
-    NS = {
-        None: "http://www.tei-c.org/ns/1.0",
-        "hal": "http://hal.archives-ouvertes.fr/"
-    }
+logger = logging.getLogger(__name__)
 
-    # --- Racine TEI ---
+TEI_ZIP_BATCH_SIZE = 100  # publications rendues par tâche du pool
+TEI_PARALLEL_MIN_DOCS = 500  # en dessous, rendu dans le processus courant
+TEI_MAX_WORKERS = min(4, os.cpu_count() or 1)
+# Pas de fork : dans le serveur Streamlit (threads des jobs, pools IdRef, connexions SQLite), un
+# processus forké peut hériter d'un verrou tenu par un autre thread et se bloquer indéfiniment.
+TEI_POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+_XML_DECLARATION = "<?xml version='1.0' encoding='utf-8'?>\n"
+_SLOT_RE = re.compile(r'<slot name="(\w+)" />')
+
+
+def _build_skeleton():
+    """
+    Sérialise une seule fois (avec ElementTree) les parties fixes du document HAL-TEI :
+    racine et espaces de noms, notesStmt, langUsage, classCode...
+    Retourne les fragments fixes et le nom des emplacements variables qui les séparent.
+    """
     TEI = ET.Element("TEI", {
         "xmlns:xsi": "http://www.w3.org/2001/XMLSchema-instance",
         "xsi:schemaLocation": "http://www.tei-c.org/ns/1.0 http://api.archives-ouvertes.fr/documents/aofr-sword.xsd"
     })
-
-    # --- Arborescence principale ---
     text = ET.SubElement(TEI, "text")
     body = ET.SubElement(text, "body")
     listBibl = ET.SubElement(body, "listBibl")
     biblFull = ET.SubElement(listBibl, "biblFull")
 
-    # === titleStmt / seriesStmt / notesStmt ===
     ET.SubElement(biblFull, "titleStmt")
     ET.SubElement(biblFull, "seriesStmt")
-
     notesStmt = ET.SubElement(biblFull, "notesStmt")
     ET.SubElement(notesStmt, "note", {"type": "audience", "n": "2"})
     ET.SubElement(notesStmt, "note", {"type": "popular", "n": "0"}).text = "No"
     ET.SubElement(notesStmt, "note", {"type": "peer", "n": "1"}).text = "Yes"
 
-    # === sourceDesc / biblStruct ===
     sourceDesc = ET.SubElement(biblFull, "sourceDesc")
     biblStruct = ET.SubElement(sourceDesc, "biblStruct")
-    analytic = ET.SubElement(biblStruct, "analytic")
+    ET.SubElement(ET.SubElement(biblStruct, "analytic"), "slot", {"name": "analytic"})
+    ET.SubElement(ET.SubElement(biblStruct, "monogr"), "slot", {"name": "monogr"})
+    ET.SubElement(biblStruct, "slot", {"name": "idno"})
+
+    profileDesc = ET.SubElement(biblFull, "profileDesc")
+    langUsage = ET.SubElement(profileDesc, "langUsage")
+    ET.SubElement(langUsage, "language", {"ident": "en"}).text = "English"
+    textClass = ET.SubElement(profileDesc, "textClass")
+    ET.SubElement(textClass, "classCode", {"scheme": "halTypology", "n": "ART"}).text = "Journal articles"
+    ET.SubElement(textClass, "slot", {"name": "keywords"})
+    ET.SubElement(profileDesc, "slot", {"name": "abstract"})
+
+    back = ET.SubElement(text, "back")
+    ET.SubElement(back, "slot", {"name": "listOrg"})
+
+    parts = _SLOT_RE.split(_XML_DECLARATION + ET.tostring(TEI, encoding="unicode"))
+    return parts[0::2], parts[1::2]
+
+
+_SKELETON_PARTS, _SKELETON_SLOTS = _build_skeleton()
+
 
-    # --- Titre ---
-    title_el = ET.SubElement(analytic, "title", {"xml:lang": "en"})
-    title_el.text = publication.get("Title", "")
+def _escape(value):
+    """Texte d'élément échappé comme par ElementTree (None -> vide)."""
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        value = str(value)
+    if "&" in value:
+        value = value.replace("&", "&amp;")
+    if "<" in value:
+        value = value.replace("<", "&lt;")
+    if ">" in value:
+        value = value.replace(">", "&gt;")
+    return value
 
-    # --- Auteurs ---
+
+def _element(tag, attributes, content):
+    """<tag attributes>content</tag>, ou <tag attributes /> si content est vide (comme ElementTree)."""
+    if content:
+        return f"<{tag}{attributes}>{content}</{tag}>"
+    return f"<{tag}{attributes} />"
+
+
+def _render_slots(publication):
+    """Parties variables d'une publication, par emplacement du squelette."""
     # On mappe d'abord toutes les affiliations uniques pour leur donner un xml:id stable
     raw_affs = sorted(set(publication.get("raw_affiliations", [])))
     aff_id_map = {aff: f"localStruct-Aff{i+1}" for i, aff in enumerate(raw_affs)}
 
+    analytic = [_element("title", ' xml:lang="en"', _escape(publication.get("Title", "")))]
     for author in publication.get("authors", []):
-        aut_el = ET.SubElement(analytic, "author", {"role": "aut"})
-        pers = ET.SubElement(aut_el, "persName")
-        ET.SubElement(pers, "forename", {"type": "first"}).text = author.get("forename", "")
-        ET.SubElement(pers, "surname").text = author.get("surname", "")
+        author_parts = ["<persName>",
+                        _element("forename", ' type="first"', _escape(author.get("forename", ""))),
+                        _element("surname", "", _escape(author.get("surname", ""))),
+                        "</persName>"]
         if author.get("orcid"):
-            ET.SubElement(aut_el, "idno", {"type": "ORCID"}).text = author["orcid"]
-
-        # Affiliation brute (rawAffs)
+            author_parts.append(_element("idno", ' type="ORCID"', _escape(author["orcid"])))
+        # Affiliation brute (rawAffs), liée à la structure par un ref si elle est connue
         for aff_text in author.get("affiliations", []):
-            ET.SubElement(aut_el, "rawAffs").text = aff_text
-            # Si correspondance avec structure connue, on lie avec un ref
+            author_parts.append(_element("rawAffs", "", _escape(aff_text)))
             if aff_text in aff_id_map:
-                ET.SubElement(aut_el, "affiliation", {"ref": f"#{aff_id_map[aff_text]}"})
+                author_parts.append(f'<affiliation ref="#{aff_id_map[aff_text]}" />')
+        analytic.append(_element("author", ' role="aut"', "".join(author_parts)))
 
-    # --- Journal ---
-    monogr = ET.SubElement(biblStruct, "monogr")
-    ET.SubElement(monogr, "title", {"level": "j"}).text = publication.get("Source title", "")
-    imprint = ET.SubElement(monogr, "imprint")
-    ET.SubElement(imprint, "publisher").text = publication.get("publisher", "")
-    ET.SubElement(imprint, "date", {"type": "datePub"}).text = str(publication.get("Date", ""))
+    monogr = (_element("title", ' level="j"', _escape(publication.get("Source title", "")))
+              + "<imprint>"
+              + _element("publisher", "", _escape(publication.get("publisher", "")))
+              + _element("date", ' type="datePub"', _escape(str(publication.get("Date", ""))))
+              + "</imprint>")
 
-    # --- Identifiants (DOI, PMID, etc.) ---
+    idno = ""
     if publication.get("doi"):
-        ET.SubElement(biblStruct, "idno", {"type": "doi"}).text = publication["doi"]
+        idno += _element("idno", ' type="doi"', _escape(publication["doi"]))
     if publication.get("pubmed"):
-        ET.SubElement(biblStruct, "idno", {"type": "pubmed"}).text = str(publication["pubmed"])
+        idno += _element("idno", ' type="pubmed"', _escape(str(publication["pubmed"])))
 
-    # === profileDesc (langue, typologie HAL, mots-clés) ===
-    profileDesc = ET.SubElement(biblFull, "profileDesc")
+    keywords = publication.get("keywords", [])
+    keywords_xml = ""
+    if keywords:
+        keywords_xml = _element("keywords", ' scheme="author"',
+                                "".join(_element("term", ' xml:lang="en"', _escape(kw)) for kw in keywords))
+
+    orgs = "".join(
+        f'<org type="institution" xml:id="{aff_id}">'
+        + _element("orgName", "", _escape(aff_text))
+        + '<desc><address><country key="FR" /></address></desc></org>'
+        for aff_text, aff_id in aff_id_map.items())
+
+    return {
+        "analytic": "".join(analytic),
+        "monogr": monogr,
+        "idno": idno,
+        "keywords": keywords_xml,
+        "abstract": _element("abstract", ' xml:lang="en"', _escape(publication.get("abstract", ""))),
+        "listOrg": _element("listOrg", ' type="structures"', orgs),
+    }
 
-    langUsage = ET.SubElement(profileDesc, "langUsage")
-    ET.SubElement(langUsage, "language", {"ident": "en"}).text = "English"
 
-    textClass = ET.SubElement(profileDesc, "textClass")
-    ET.SubElement(textClass, "classCode", {"scheme": "halTypology", "n": "ART"}).text = "Journal articles"
+def generate_hal_xml(publication):
+    """
+    Génère un fichier XML HAL-TEI pour une publication donnée.
+    publication : dict avec au moins :
+      Title, doi, Date, Source title, publisher, authors (liste), raw_affiliations (liste)
+    Seules les parties variables sont construites ; le reste vient du squelette pré-sérialisé.
+    """
+    slots = _render_slots(publication)
+    pieces = [_SKELETON_PARTS[0]]
+    for slot_name, static_part in zip(_SKELETON_SLOTS, _SKELETON_PARTS[1:]):
+        pieces.append(slots[slot_name])
+        pieces.append(static_part)
+    return "".join(pieces).encode("utf-8", "xmlcharrefreplace")
 
-    # Mots-clés optionnels
-    keywords = publication.get("keywords", [])
-    if keywords:
-        kw_el = ET.SubElement(textClass, "keywords", {"scheme": "author"})
-        for kw in keywords:
-            ET.SubElement(kw_el, "term", {"xml:lang": "en"}).text = kw
 
-    # --- Résumé optionnel ---
-    abstract_el = ET.SubElement(profileDesc, "abstract", {"xml:lang": "en"})
-    abstract_el.text = publication.get("abstract", "")
+def _render_batch(batch):
+    """Tâche du pool : [(nom de fichier, XML)] pour un lot de (id_pub, dict_publication)."""
+    return [(f"{pub_id}.xml", generate_hal_xml(pub_data)) for pub_id, pub_data in batch]
 
-    # === Structures d'affiliation ===
-    back = ET.SubElement(text, "back")
-    listOrg = ET.SubElement(back, "listOrg", {"type": "structures"})
-
-    for aff_text, aff_id in aff_id_map.items():
-        org_el = ET.SubElement(listOrg, "org", {"type": "institution", "xml:id": aff_id})
-        ET.SubElement(org_el, "orgName").text = aff_text
-        desc_el = ET.SubElement(org_el, "desc")
-        addr_el = ET.SubElement(desc_el, "address")
-        ET.SubElement(addr_el, "country", {"key": "FR"})
-
-    # --- Sérialisation propre ---
-    xml_bytes = ET.tostring(TEI, encoding="utf-8", xml_declaration=True)
-    return xml_bytes
-    
-def generate_zip_from_xmls(publications_list):
+
+def _rendered_batches(publications_list, max_workers, batch_size):
+    """
+    Lots rendus, dans l'ordre de publications_list (ZIP identique d'une exécution à l'autre).
+    Au plus 2 * max_workers lots en cours, pour que la mémoire reste bornée quel que soit
+    le nombre de publications.
+    """
+    batches = [publications_list[i:i + batch_size] for i in range(0, len(publications_list), batch_size)]
+    executor = None
+    if max_workers > 1 and len(publications_list) >= TEI_PARALLEL_MIN_DOCS:
+        try:
+            executor = ProcessPoolExecutor(max_workers=max_workers,
+                                           mp_context=multiprocessing.get_context(TEI_POOL_START_METHOD))
+        except (OSError, NotImplementedError) as e:
+            logger.warning("Pool de processus indisponible, génération TEI séquentielle : %s", e)
+    if executor is None:
+        for batch in batches:
+            yield _render_batch(batch)
+        return
+
+    with executor:
+        pending = deque()
+        for batch in batches:
+            pending.append(executor.submit(_render_batch, batch))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def generate_zip_from_xmls(publications_list, output=None, max_workers=TEI_MAX_WORKERS,
+                           batch_size=TEI_ZIP_BATCH_SIZE):
     """
     Crée un fichier ZIP contenant un XML HAL-TEI par publication.
     publications_list : liste de tuples (id_pub, dict_publication)
+    output : chemin ou fichier binaire de destination ; à défaut, un BytesIO (renvoyé rembobiné).
+    Les documents sont rendus par lots dans un pool de processus et écrits dans le ZIP à mesure.
     """
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-        for pub_id, pub_data in publications_list:
-            xml_bytes = generate_hal_xml(pub_data)
-            zf.writestr(f"{pub_id}.xml", xml_bytes)
-    zip_buffer.seek(0)
-    return zip_buffer
+    publications_list = list(publications_list)
+    zip_output = io.BytesIO() if output is None else output
+    with zipfile.ZipFile(zip_output, "w", zipfile.ZIP_DEFLATED) as zf:
+        for rendered in _rendered_batches(publications_list, max_workers, batch_size):
+            for file_name, xml_bytes in rendered:
+                zf.writestr(file_name, xml_bytes)
+    if output is None:
+        zip_output.seek(0)
+    return zip_output
+
+
+@contextmanager
+def tei_zip_export_file(publications_list, max_workers=TEI_MAX_WORKERS):
+    """ZIP HAL-TEI écrit dans un fichier temporaire, produit ouvert en lecture binaire (pour st.download_button)."""
+    with temporary_export_path(".zip") as path:
+        generate_zip_from_xmls(publications_list, output=path, max_workers=max_workers)
+        with open(path, "rb") as binary_file:
+            yield binary_file
+
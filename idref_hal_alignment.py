@@ -1,54 +1,34 @@
 # streamlit_app_idref_hal_final.py
 import streamlit as st
 import pandas as pd
-import requests
+import numpy as np
 import datetime
-import time
-from urllib.parse import urlencode
-from io import BytesIO
-import unicodedata
 from difflib import SequenceMatcher
 from pydref import Pydref
+from hal_authors import (
+    fetch_collection_author_values, extract_author_ids, fetch_author_forms, HAL_AUTHOR_MAX_BATCH_SIZE
+)
+from normalisation import normalize_text
+from exports import csv_export_file, xlsx_export_file
 
 # --- Optionnel : rapidfuzz pour matching plus rapide
 try:
-    from rapidfuzz import fuzz
+    from rapidfuzz import fuzz, process
     USE_RAPIDFUZZ = True
 except ImportError:
     USE_RAPIDFUZZ = False
 
-# --- Moteur Excel
-try:
-    import xlsxwriter
-    EXCEL_ENGINE = "xlsxwriter"
-except ImportError:
-    try:
-        import openpyxl
-        EXCEL_ENGINE = "openpyxl"
-    except ImportError:
-        EXCEL_ENGINE = None
-
 # =========================================================
 # CONFIGURATION
 # =========================================================
 st.set_page_config(page_title="Alignement IdRef ↔ HAL (Final)", layout="wide")
 
-HAL_SEARCH_API = "https://api.archives-ouvertes.fr/search/"
-HAL_AUTHOR_API = "https://api.archives-ouvertes.fr/ref/author/"
 FIELDS_LIST = "docid,form_i,person_i,lastName_s,firstName_s,valid_s,idHal_s,halId_s,idrefId_s,orcidId_s,emailDomain_s"
 REQUEST_DELAY = 0.3
 
 # =========================================================
 # UTILITAIRES
 # =========================================================
-def normalize_text(s: str) -> str:
-    if s is None:
-        return ""
-    s = str(s)
-    s = unicodedata.normalize("NFD", s)
-    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
-    return " ".join(s.lower().split())
-
 def similarity_score(a, b):
     if not a and not b:
         return 100.0
@@ -65,85 +45,106 @@ def get_pydref_instance():
 
 pydref_api = get_pydref_instance()
 
-def search_idref_for_person(full_name, min_birth_year, min_death_year):
-    try:
-        return pydref_api.get_idref(
-            query=full_name,
+def search_idref_for_people(full_names, min_birth_year, min_death_year, progress):
+    """Recherche IdRef de toutes les personnes en parallèle, correspondances dans l'ordre des noms."""
+    matches_by_position = [[] for _ in full_names]
+    for nb_done, (position, matches, error) in enumerate(pydref_api.identify_many(
+            full_names,
             min_birth_year=min_birth_year,
             min_death_year=min_death_year,
             is_scientific=True,
             exact_fullname=True,
-        )
-    except Exception as e:
-        st.warning(f"Erreur IdRef pour '{full_name}': {e}")
-        return []
+    ), start=1):
+        if error is not None:
+            st.warning(f"Erreur IdRef pour '{full_names[position]}': {error}")
+        matches_by_position[position] = matches
+        progress.progress(nb_done / len(full_names))
+    return matches_by_position
 
 # =========================================================
 # HAL — récupération filtrée
 # =========================================================
-def fetch_publications_for_collection(collection_code, year_min=None, year_max=None):
-    """Récupère les publications HAL d'une collection, avec filtre sur les années."""
-    all_docs, rows, start = [], 10000, 0
+def collection_author_ids(collection_code, year_min=None, year_max=None):
+    """Identifiants des auteurs HAL d'une collection (facette structHasAuthId_fs), avec filtre sur les années."""
     base_query = "*:*"
     if year_min or year_max:
         year_min = year_min or 1900
         year_max = year_max or datetime.datetime.now().year
         base_query = f"producedDateY_i:[{year_min} TO {year_max}]"
+    _, author_values = fetch_collection_author_values(collection_code, query=base_query)
+    return extract_author_ids(author_values)
 
-    query_params = {"q": base_query, "wt": "json", "fl": "structHasAuthId_fs", "rows": rows}
-    while True:
-        query_params["start"] = start
-        url = f"{HAL_SEARCH_API}{collection_code}/?{urlencode(query_params)}"
-        r = requests.get(url)
-        r.raise_for_status()
-        data = r.json()
-        docs = data.get("response", {}).get("docs", [])
-        all_docs.extend(docs)
-        if len(docs) < rows:
-            break
-        start += rows
-        time.sleep(REQUEST_DELAY)
-    return all_docs
-
-def extract_author_ids(publications):
-    ids = set()
-    for doc in publications:
-        for a in doc.get("structHasAuthId_fs", []):
-            parts = a.split("_JoinSep_")
-            if len(parts) > 1:
-                full_id = parts[1].split("_FacetSep")[0]
-                docid = full_id.split("-")[-1].strip()
-                if docid.isdigit() and docid != "0":
-                    ids.add(docid)
-    return list(ids)
-
-def fetch_author_details_batch(author_ids, fields, batch_size=20):
-    authors = []
-    ids = [i.strip() for i in author_ids if i and str(i).strip()]
-    total = len(ids)
-    if total == 0:
+def fetch_author_details_batch(author_ids, fields, batch_size=HAL_AUTHOR_MAX_BATCH_SIZE):
+    if not author_ids:
         return []
     progress = st.progress(0, text="Chargement des formes-auteurs HAL...")
-    for start in range(0, total, batch_size):
-        batch = ids[start:start + batch_size]
-        or_query = " OR ".join([f'person_i:\"{i}\"' for i in batch])
-        params = {"q": or_query, "wt": "json", "fl": fields, "rows": batch_size}
-        url = f"{HAL_AUTHOR_API}?{urlencode(params)}"
-        try:
-            r = requests.get(url)
-            r.raise_for_status()
-            docs = r.json().get("response", {}).get("docs", [])
-            authors.extend(docs)
-        except Exception as e:
-            st.warning(f"⚠️ Erreur sur le lot {batch}: {e}")
-        progress.progress(min((start + batch_size) / total, 1.0))
-        time.sleep(REQUEST_DELAY)
+    authors, failed_batches = fetch_author_forms(
+        author_ids, fields, max_batch_size=batch_size, request_delay=REQUEST_DELAY,
+        on_progress=lambda done, total: progress.progress(done / total, text="Chargement des formes-auteurs HAL..."),
+    )
+    for batch, e in failed_batches:
+        st.warning(f"⚠️ Erreur sur le lot {batch}: {e}")
     progress.empty()
     return authors
 
 # =========================================================
 # FUSION FLOUE
 # =========================================================
+FUZZY_MERGE_CHUNK_ROWS = 256  # lignes du fichier scorées ensemble contre toutes les formes HAL (rapidfuzz)
+
+def best_hal_matches(file_names, hal_names, threshold):
+    """
+    Appariement glouton fichier -> formes HAL, dans l'ordre du fichier : pour chaque nom, la première
+    forme HAL encore libre de meilleur score (une forme identique l'emporte), retenue si score >= threshold.
+    Retourne une liste de (position HAL ou None, meilleur score ou -1, apparié) par nom du fichier.
+    """
+    hal_names = list(hal_names)
+    matched = np.zeros(len(hal_names), dtype=bool)
+    # Formes identiques : positions HAL par forme, dans l'ordre
+    exact_positions = {}
+    for h_pos, h_name in enumerate(hal_names):
+        exact_positions.setdefault(h_name, []).append(h_pos)
+
+    results = []
+    for chunk_start in range(0, len(file_names), FUZZY_MERGE_CHUNK_ROWS):
+        chunk_names = file_names[chunk_start:chunk_start + FUZZY_MERGE_CHUNK_ROWS]
+        chunk_scores = None
+        if USE_RAPIDFUZZ and hal_names:
+            chunk_scores = process.cdist([n or "" for n in chunk_names], hal_names,
+                                         scorer=fuzz.QRatio, dtype=np.float64, workers=-1)
+        for row_in_chunk, f_name in enumerate(chunk_names):
+            best_score, best_pos = -1, None
+            if f_name and not matched.all():
+                free_exact = [h_pos for h_pos in exact_positions.get(f_name, []) if not matched[h_pos]]
+                if free_exact:
+                    best_score, best_pos = 100.0, free_exact[0]
+                elif chunk_scores is not None:
+                    scores = np.where(matched, -1.0, chunk_scores[row_in_chunk])
+                    best_pos = int(np.argmax(scores))
+                    best_score = float(scores[best_pos])
+                else:
+                    best_score, best_pos = _best_hal_match_sequence_matcher(f_name, hal_names, matched)
+            is_match = best_pos is not None and best_score >= threshold
+            if is_match:
+                matched[best_pos] = True
+            results.append((best_pos, best_score, is_match))
+    return results
+
+def _best_hal_match_sequence_matcher(f_name, hal_names, matched):
+    """Sans rapidfuzz : SequenceMatcher, en écartant les formes dont la borne quick_ratio ne peut battre le meilleur score."""
+    best_score, best_pos = -1, None
+    matcher = SequenceMatcher(None, f_name)
+    for h_pos, h_name in enumerate(hal_names):
+        if matched[h_pos]:
+            continue
+        matcher.set_seq2(h_name)
+        if matcher.real_quick_ratio() * 100 <= best_score or matcher.quick_ratio() * 100 <= best_score:
+            continue
+        s = matcher.ratio() * 100
+        if s > best_score:
+            best_score, best_pos = s, h_pos
+    return best_score, best_pos
+
 def fuzzy_merge_file_hal(df_file, df_hal, threshold=85):
     hal_keep_cols = [
         "form_i", "person_i", "lastName_s", "firstName_s", "valid_s",
@@ -154,7 +155,6 @@ def fuzzy_merge_file_hal(df_file, df_hal, threshold=85):
                             df_file["Nom"].fillna("").apply(normalize_text)).str.strip()
     df_hal["norm_full"] = (df_hal["firstName_s"].fillna("").apply(normalize_text) + " " +
                            df_hal["lastName_s"].fillna("").apply(normalize_text)).str.strip()
-    df_hal["__matched"] = False
     idref_cols = [
         "Nom", "Prénom", "idref_ppn_list", "idref_status", "nb_match",
         "match_info", "alt_names", "idref_orcid", "idref_description", "idref_idhal"
@@ -165,29 +165,22 @@ def fuzzy_merge_file_hal(df_file, df_hal, threshold=85):
     template = {c: None for c in final_cols}
     merged_rows = []
 
-    for _, f_row in df_file.iterrows():
+    matches = best_hal_matches(df_file["norm_full"].tolist(), df_hal["norm_full"].tolist(), threshold)
+    hal_matched = [False] * len(df_hal)
+    for (_, f_row), (best_pos, best_score, is_match) in zip(df_file.iterrows(), matches):
         r = template.copy()
         for c in idref_cols:
             r[c] = f_row[c] if c in f_row.index else None
-        f_name = f_row.get("norm_full", "")
-        best_score, best_idx = -1, None
-        if f_name:
-            for h_idx, h_row in df_hal[df_hal["__matched"] == False].iterrows():
-                s = similarity_score(f_name, h_row["norm_full"])
-                if s > best_score:
-                    best_score, best_idx = s, h_idx
-                if f_name == h_row["norm_full"]:
-                    best_score, best_idx = 100.0, h_idx
-                    break
-        if best_idx is not None and best_score >= threshold:
-            h_row = df_hal.loc[best_idx]
+        if is_match:
+            h_row = df_hal.iloc[best_pos]
             for c in hal_keep_cols:
                 r[f"HAL_{c}"] = h_row.get(c)
             r["source"], r["match_score"] = "Fichier + HAL", best_score
-            df_hal.at[best_idx, "__matched"] = True
+            hal_matched[best_pos] = True
         else:
             r["source"], r["match_score"] = "Fichier", best_score if best_score >= 0 else None
         merged_rows.append(r)
+    df_hal["__matched"] = hal_matched
 
     for _, h_row in df_hal[df_hal["__matched"] == False].iterrows():
         r = template.copy()
@@ -202,17 +195,13 @@ def fuzzy_merge_file_hal(df_file, df_hal, threshold=85):
 # EXPORT XLSX
 # =========================================================
 def export_to_xlsx(fusion_df, idref_df, hal_df, params_info):
-    if EXCEL_ENGINE is None:
-        raise RuntimeError("Aucun moteur Excel disponible. Installez 'xlsxwriter' ou 'openpyxl'.")
-
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine=EXCEL_ENGINE) as writer:
-        fusion_df.to_excel(writer, sheet_name="Fusion", index=False)
-        idref_df.to_excel(writer, sheet_name="extraction IdRef", index=False)
-        hal_df.to_excel(writer, sheet_name="extraction HAL", index=False)
-        pd.DataFrame([params_info]).to_excel(writer, sheet_name="Paramètres", index=False)
-    output.seek(0)
-    return output
+    """ Classeur XLSX des résultats, à utiliser dans un bloc with (fichier temporaire). """
+    return xlsx_export_file({
+        "Fusion": fusion_df,
+        "extraction IdRef": idref_df,
+        "extraction HAL": hal_df,
+        "Paramètres": pd.DataFrame([params_info]),
+    })
 
 # =========================================================
 # INTERFACE STREAMLIT
@@ -234,7 +223,7 @@ year_max = col4.number_input("Année max des publications HAL", 1900, current_ye
 
 
 similarity_threshold = st.slider("Seuil de similarité (%)", 60, 100, 85)
-batch_size = st.slider("Taille des lots HAL", 10, 50, 20)
+batch_size = st.slider("Taille maximale des lots HAL", 10, HAL_AUTHOR_MAX_BATCH_SIZE, 100, step=10)
 
 if uploaded_file and collection_code:
     data = pd.read_csv(uploaded_file) if uploaded_file.name.endswith(".csv") else pd.read_excel(uploaded_file)
@@ -248,10 +237,11 @@ if uploaded_file and collection_code:
         idref_rows = []
         progress = st.progress(0, text="Recherche IdRef en cours...")
 
-        for idx, row in data.iterrows():
-            first, last = str(row[firstname_col]).strip(), str(row[name_col]).strip()
-            full = f"{first} {last}".strip()
-            matches = search_idref_for_person(full, min_birth_year, min_death_year)
+        people = [(str(row[firstname_col]).strip(), str(row[name_col]).strip()) for _, row in data.iterrows()]
+        full_names = [f"{first} {last}".strip() for first, last in people]
+        all_matches = search_idref_for_people(full_names, min_birth_year, min_death_year, progress)
+
+        for (first, last), matches in zip(people, all_matches):
             nb_match = len(matches)
 
             idref_row = {
@@ -296,7 +286,6 @@ if uploaded_file and collection_code:
                         idref_row["idref_idhal"] = m["idhal"]
 
             idref_rows.append(idref_row)
-            progress.progress((idx + 1) / len(data))
 
         idref_df = pd.DataFrame(idref_rows)
         progress.empty()
@@ -305,8 +294,7 @@ if uploaded_file and collection_code:
         # Étape 2 - Extraction HAL
         # =====================================================
         st.info(f"📡 Récupération HAL ({year_min}–{year_max}) pour {collection_code}...")
-        pubs = fetch_publications_for_collection(collection_code, year_min, year_max)
-        author_ids = extract_author_ids(pubs)
+        author_ids = collection_author_ids(collection_code, year_min, year_max)
         hal_authors = fetch_author_details_batch(author_ids, FIELDS_LIST, batch_size)
         hal_df = pd.DataFrame(hal_authors)
 
@@ -334,13 +322,13 @@ if uploaded_file and collection_code:
         # =====================================================
         # Étape 4 - Export
         # =====================================================
-        csv_output = merged_df.to_csv(index=False, sep=";", encoding="utf-8")
-        st.download_button(
-            "💾 Télécharger le CSV",
-            csv_output,
-            file_name=f"fusion_idref_hal_{collection_code}_{datetime.datetime.now():%Y%m%d}.csv",
-            mime="text/csv"
-        )
+        with csv_export_file(merged_df, index=False, sep=";", encoding="utf-8") as csv_output:
+            st.download_button(
+                "💾 Télécharger le CSV",
+                csv_output,
+                file_name=f"fusion_idref_hal_{collection_code}_{datetime.datetime.now():%Y%m%d}.csv",
+                mime="text/csv"
+            )
 
         try:
             params_info = {
@@ -351,12 +339,12 @@ if uploaded_file and collection_code:
                 "Taille des lots HAL": batch_size,
                 "Date extraction": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
             }
-            xlsx_output = export_to_xlsx(merged_df, idref_df, hal_df, params_info)
-            st.download_button(
-                "📘 Télécharger le fichier Excel (XLSX)",
-                xlsx_output,
-                file_name=f"fusion_idref_hal_{collection_code}_{datetime.datetime.now():%Y%m%d}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+            with export_to_xlsx(merged_df, idref_df, hal_df, params_info) as xlsx_output:
+                st.download_button(
+                    "📘 Télécharger le fichier Excel (XLSX)",
+                    xlsx_output,
+                    file_name=f"fusion_idref_hal_{collection_code}_{datetime.datetime.now():%Y%m%d}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
         except RuntimeError as re:
             st.warning(str(re))
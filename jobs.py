@@ -0,0 +1,378 @@
+# jobs.py
+# ------------------------------------------------------------
+# Exécution des traitements c2LabHAL en arrière-plan, hors du script
+# Streamlit : une interaction avec un widget (qui relance le script) ou
+# un rechargement de la page n'interrompt plus le traitement. Les jobs,
+# leur progression et leurs résultats sont conservés dans une base SQLite ;
+# l'interface les suit par interrogation régulière.
+# ------------------------------------------------------------
+
+import logging
+import os
+import pickle
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+# Base SQLite des jobs (en mémoire, donc perdue au redémarrage, si C2LABHAL_JOBS_PATH est vide)
+JOBS_DB_PATH = os.environ.get(
+    "C2LABHAL_JOBS_PATH", os.path.join(os.path.expanduser("~"), ".cache", "c2labhal", "jobs.sqlite"))
+# Fichiers produits par les jobs (exports CSV, ZIP HAL-TEI), un dossier par job, supprimé avec lui
+JOB_FILES_PATH = os.environ.get(
+    "C2LABHAL_JOB_FILES_PATH", os.path.join(os.path.expanduser("~"), ".cache", "c2labhal", "job_files"))
+JOB_MAX_WORKERS = 2  # traitements exécutés simultanément, les suivants attendent leur tour
+JOB_RESULT_TTL = 7 * 24 * 3600  # secondes de conservation d'un job terminé et de son résultat
+JOB_POLL_SECONDS = 2  # intervalle de rafraîchissement du suivi dans l'interface
+JOB_RECENT_LIMIT = 20  # jobs proposés dans la liste des traitements récents
+
+JOB_EN_ATTENTE = "en attente"
+JOB_EN_COURS = "en cours"
+JOB_TERMINE = "terminé"
+JOB_ERREUR = "erreur"
+JOB_INTERROMPU = "interrompu"
+JOB_ACTIFS = (JOB_EN_ATTENTE, JOB_EN_COURS)
+
+JobInfo = namedtuple(
+    'JobInfo', ['job_id', 'app', 'label', 'status', 'progress', 'step', 'error',
+                'created_at', 'started_at', 'finished_at']
+)
+
+_JOB_INFO_COLUMNS = ", ".join(JobInfo._fields)
+
+
+class JobError(Exception):
+    """Arrêt d'un traitement avec un message pour l'utilisateur (l'équivalent de st.error suivi de st.stop)."""
+
+
+class JobStore(object):
+    """
+    Table des jobs : état, progression et résultat (pickle) de chaque traitement ; ses messages
+    sont dans la table job_messages, une ligne par message. Les fichiers d'un job (files_path/<job_id>) sont supprimés en même temps que son enregistrement.
+    """
+
+    def __init__(self, path, files_path=JOB_FILES_PATH, ttl=JOB_RESULT_TTL):
+        self.ttl = ttl
+        self.files_path = files_path
+        self.lock = threading.Lock()
+        self.connection = None
+        if path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self.connection = sqlite3.connect(path, check_same_thread=False)
+                self._create_tables()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Base des jobs inaccessible (%s), jobs conservés en mémoire : %s", path, e)
+                self.connection = None
+        if self.connection is None:
+            self.connection = sqlite3.connect(":memory:", check_same_thread=False)
+            self._create_tables()
+        self._remove_orphan_files()
+
+    def _create_tables(self):
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, app TEXT NOT NULL, label TEXT NOT NULL, "
+            "status TEXT NOT NULL, progress INTEGER NOT NULL DEFAULT 0, step TEXT NOT NULL DEFAULT '', "
+            "error TEXT, result BLOB, created_at REAL NOT NULL, started_at REAL, finished_at REAL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS jobs_app_created_at ON jobs (app, created_at)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS job_messages (message_id INTEGER PRIMARY KEY, job_id TEXT NOT NULL, "
+            "level TEXT NOT NULL, message TEXT NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS job_messages_job_id ON job_messages (job_id, message_id)")
+        self.connection.commit()
+
+    def job_files_dir(self, job_id):
+        """Dossier des fichiers du job (créé au besoin)."""
+        path = os.path.join(self.files_path, job_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _remove_job_files(self, job_ids):
+        for job_id in job_ids:
+            shutil.rmtree(os.path.join(self.files_path, job_id), ignore_errors=True)
+
+    def _remove_orphan_files(self):
+        """Dossiers sans job correspondant (base en mémoire perdue au redémarrage, suppression interrompue)."""
+        try:
+            job_dirs = os.listdir(self.files_path)
+        except OSError:
+            return
+        with self.lock:
+            known = {row[0] for row in self.connection.execute("SELECT job_id FROM jobs")}
+        self._remove_job_files(job_id for job_id in job_dirs if job_id not in known)
+
+    def create(self, job_id, app, label):
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT INTO jobs (job_id, app, label, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, app, label, JOB_EN_ATTENTE, now))
+            expired = [row[0] for row in self.connection.execute(
+                "SELECT job_id FROM jobs WHERE created_at < ? AND status NOT IN (?, ?)",
+                (now - self.ttl,) + JOB_ACTIFS)]
+            self.connection.executemany("DELETE FROM jobs WHERE job_id = ?", [(job_id,) for job_id in expired])
+            self.connection.executemany("DELETE FROM job_messages WHERE job_id = ?", [(job_id,) for job_id in expired])
+            self.connection.commit()
+        self._remove_job_files(expired)
+
+    def update(self, job_id, **fields):
+        if "result" in fields:
+            fields["result"] = pickle.dumps(fields["result"], protocol=pickle.HIGHEST_PROTOCOL)
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        try:
+            with self.lock:
+                self.connection.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?",
+                                        list(fields.values()) + [job_id])
+                self.connection.commit()
+        except sqlite3.Error as e:
+            logger.error("Erreur de mise à jour du job %s : %s", job_id, e)
+
+    def add_message(self, job_id, level, message):
+        try:
+            with self.lock:
+                self.connection.execute("INSERT INTO job_messages (job_id, level, message) VALUES (?, ?, ?)",
+                                        (job_id, level, message))
+                self.connection.commit()
+        except sqlite3.Error as e:
+            logger.error("Erreur d'enregistrement d'un message du job %s : %s", job_id, e)
+
+    def get_messages(self, job_id, after_id=0):
+        """[(message_id, niveau, message)] du job, dans l'ordre, postérieurs à after_id."""
+        with self.lock:
+            return self.connection.execute(
+                "SELECT message_id, level, message FROM job_messages WHERE job_id = ? AND message_id > ? "
+                "ORDER BY message_id", (job_id, after_id)).fetchall()
+
+    def get(self, job_id):
+        with self.lock:
+            row = self.connection.execute(
+                f"SELECT {_JOB_INFO_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return JobInfo(*row) if row else None
+
+    def list_jobs(self, app, job_ids, limit=JOB_RECENT_LIMIT):
+        """Jobs de l'application parmi job_ids, du plus récent au plus ancien."""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return []
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT {_JOB_INFO_COLUMNS} FROM jobs WHERE app = ? AND job_id IN ({','.join('?' * len(job_ids))}) "
+                f"ORDER BY created_at DESC LIMIT ?",
+                [app] + job_ids + [limit]).fetchall()
+        return [JobInfo(*row) for row in rows]
+
+    def get_result(self, job_id):
+        with self.lock:
+            row = self.connection.execute("SELECT result FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if not row or row[0] is None:
+            return None
+        try:
+            return pickle.loads(row[0])
+        except (pickle.UnpicklingError, AttributeError, EOFError, ImportError) as e:
+            logger.error("Résultat du job %s illisible : %s", job_id, e)
+            return None
+
+    def mark_interrupted(self):
+        """Jobs laissés en attente ou en cours par un processus précédent (redémarrage de l'application)."""
+        with self.lock:
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status IN (?, ?)",
+                (JOB_INTERROMPU, "Traitement interrompu par un redémarrage de l'application. Relancez-le : "
+                 "les étapes déjà terminées seront reprises.", time.time()) + JOB_ACTIFS)
+            self.connection.commit()
+
+
+class JobReporter(object):
+    """
+    Remplace, dans un traitement en arrière-plan, la barre de progression, la zone d'étape
+    et les messages st.* : tout est enregistré dans la table des jobs. S'utilise aussi comme
+    progress_bar_st / progress_text_st de check_df et HalCollImporter.import_data.
+    """
+
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+        self.last_progress = 0
+
+    def progress(self, value):
+        value = max(0, min(int(value), 100))
+        if value != self.last_progress:
+            self.last_progress = value
+            self.store.update(self.job_id, progress=value)
+
+    def step(self, message):
+        self.store.update(self.job_id, step=message)
+
+    def _message(self, level, message):
+        self.store.add_message(self.job_id, level, str(message))
+
+    def info(self, message):
+        self._message("info", message)
+
+    def success(self, message):
+        self._message("success", message)
+
+    def warning(self, message):
+        self._message("warning", message)
+
+    def error(self, message):
+        self._message("error", message)
+
+    @contextmanager
+    def spinner(self, message):
+        self.step(message)
+        yield
+
+    def export_path(self, file_name):
+        """Chemin d'un fichier produit par le job, conservé (et supprimé) avec lui : à mettre dans son résultat."""
+        return os.path.join(self.store.job_files_dir(self.job_id), file_name)
+
+
+class JobRunner(object):
+    """Pool de threads partagé par toutes les sessions : au plus max_workers traitements à la fois."""
+
+    def __init__(self, store, max_workers=JOB_MAX_WORKERS):
+        self.store = store
+        self.store.mark_interrupted()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="c2labhal-job")
+
+    def submit(self, app, label, func, *args, **kwargs):
+        """Met en file func(reporter, *args, **kwargs) ; son résultat est conservé avec le job. Retourne l'identifiant du job."""
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, app, label)
+        self.executor.submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def _run(self, job_id, func, args, kwargs):
+        reporter = JobReporter(self.store, job_id)
+        self.store.update(job_id, status=JOB_EN_COURS, started_at=time.time())
+        try:
+            result = func(reporter, *args, **kwargs)
+        except JobError as e:
+            self.store.update(job_id, status=JOB_ERREUR, error=str(e), finished_at=time.time())
+        except Exception as e:
+            logger.exception("Erreur inattendue dans le job %s", job_id)
+            self.store.update(job_id, status=JOB_ERREUR, error=f"Erreur inattendue : {e}", finished_at=time.time())
+        else:
+            self.store.update(job_id, status=JOB_TERMINE, progress=100, result=result, finished_at=time.time())
+
+
+_job_runner = None
+_job_runner_lock = threading.Lock()
+
+
+def get_job_runner():
+    """Exécuteur partagé par toutes les sessions du processus."""
+    global _job_runner
+    with _job_runner_lock:
+        if _job_runner is None:
+            _job_runner = JobRunner(JobStore(JOBS_DB_PATH))
+    return _job_runner
+
+
+# --- Interface Streamlit ---
+
+def _selection_key(app):
+    return f"{app}_recent_jobs"
+
+
+def _session_jobs(app):
+    """
+    Identifiants des jobs de la session (lancés depuis la page ou ouverts par leur lien ?job=) :
+    seuls ceux-ci sont proposés, les traitements des autres visiteurs restent invisibles.
+    """
+    return st.session_state.setdefault(f"{app}_session_jobs", [])
+
+
+def submit_job(app, label, func, *args, **kwargs):
+    """Lance un traitement en arrière-plan et en fait le job suivi par la page (conservé dans l'URL)."""
+    job_id = get_job_runner().submit(app, label, func, *args, **kwargs)
+    _session_jobs(app).append(job_id)
+    st.session_state[_selection_key(app)] = job_id
+    st.query_params["job"] = job_id
+    return job_id
+
+
+def _format_job_option(job):
+    created = time.strftime("%d/%m %H:%M", time.localtime(job.created_at))
+    return f"{job.label} — {job.status} ({created})"
+
+
+def _job_messages(app, store, job_id):
+    """Messages du job, mis en cache dans la session : chaque rafraîchissement ne lit que les nouveaux."""
+    cache_key = f"{app}_job_messages"
+    cache = st.session_state.get(cache_key)
+    if not cache or cache["job_id"] != job_id:
+        cache = {"job_id": job_id, "last_id": 0, "messages": []}
+        st.session_state[cache_key] = cache
+    new_messages = store.get_messages(job_id, after_id=cache["last_id"])
+    if new_messages:
+        cache["messages"].extend((level, message) for _, level, message in new_messages)
+        cache["last_id"] = new_messages[-1][0]
+    return cache["messages"]
+
+
+def _show_job_progress(job, messages):
+    st.progress(job.progress)
+    if job.step:
+        st.info(job.step)
+    if messages:
+        with st.expander(f"Journal du traitement ({len(messages)} messages)"):
+            for level, message in messages:
+                getattr(st, level, st.write)(message)
+
+
+def follow_job(app, render_result):
+    """
+    Suivi du job choisi parmi les traitements récents de la session (par défaut celui de l'URL,
+    donc le dernier lancé depuis la page) : progression rafraîchie toutes les JOB_POLL_SECONDS
+    secondes tant qu'il est actif, puis render_result(résultat) une fois terminé.
+    """
+    store = get_job_runner().store
+    session_jobs = _session_jobs(app)
+    url_job_id = st.query_params.get("job")
+    if url_job_id and url_job_id not in session_jobs:
+        session_jobs.append(url_job_id)
+    jobs_by_id = {job.job_id: job for job in store.list_jobs(app, session_jobs)}
+    if not jobs_by_id:
+        return
+
+    selection_key = _selection_key(app)
+    if st.session_state.get(selection_key) not in jobs_by_id:
+        st.session_state[selection_key] = url_job_id if url_job_id in jobs_by_id else next(iter(jobs_by_id))
+    job_id = st.selectbox("🗂️ Traitements récents", list(jobs_by_id), key=selection_key,
+                          format_func=lambda option: _format_job_option(jobs_by_id[option]))
+    if url_job_id != job_id:
+        st.query_params["job"] = job_id
+
+    job = store.get(job_id)
+    if job.status in JOB_ACTIFS:
+        @st.fragment(run_every=JOB_POLL_SECONDS)
+        def job_progress_panel():
+            current_job = store.get(job_id)
+            if current_job.status not in JOB_ACTIFS:
+                st.rerun()
+            if current_job.status == JOB_EN_ATTENTE:
+                st.info(f"⏳ Traitement « {current_job.label} » en attente d'un emplacement libre...")
+            _show_job_progress(current_job, _job_messages(app, store, job_id))
+        job_progress_panel()
+        return
+
+    _show_job_progress(job, _job_messages(app, store, job_id))
+    if job.status == JOB_TERMINE:
+        result = store.get_result(job_id)
+        if result is None:
+            st.warning("Le résultat de ce traitement n'est plus disponible.")
+        else:
+            render_result(result)
+            st.success("🎉 Traitement terminé avec succès !")
+    else:
+        st.error(job.error or "Le traitement a échoué.")
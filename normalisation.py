@@ -0,0 +1,100 @@
+import string
+import unicodedata
+from functools import lru_cache
+
+import regex as re
+from unidecode import unidecode
+
+# Taille maximale de chaque mémo (titres HAL, noms d'auteurs : les mêmes chaînes reviennent souvent)
+NORMALISATION_CACHE_SIZE = 65536
+
+_NON_ALPHANUM_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+_PUNCT_TO_SPACE = str.maketrans(string.punctuation, len(string.punctuation) * ' ')
+
+
+def strip_combining_marks(text):
+    """Décomposition NFD puis suppression des diacritiques (catégorie Mn)."""
+    if text.isascii():
+        return text
+    return ''.join(c for c in unicodedata.normalize('NFD', text)
+                   if unicodedata.category(c) != 'Mn')
+
+
+def _memoised(normaliser):
+    """Mémo LRU borné pour les chaînes ; les autres valeurs passent directement par normaliser."""
+    cached_normaliser = lru_cache(maxsize=NORMALISATION_CACHE_SIZE)(normaliser)
+
+    def memoised_normaliser(value):
+        if type(value) is str:
+            return cached_normaliser(value)
+        return normaliser(value)
+
+    memoised_normaliser.__name__ = normaliser.__name__
+    memoised_normaliser.__doc__ = normaliser.__doc__
+    memoised_normaliser.cache_info = cached_normaliser.cache_info
+    memoised_normaliser.cache_clear = cached_normaliser.cache_clear
+    return memoised_normaliser
+
+
+@_memoised
+def normalise(text_to_normalise):
+    """Titres : translittération ASCII, ponctuation remplacée par des espaces, minuscules."""
+    if not isinstance(text_to_normalise, str):
+        return ""
+    text_unaccented = text_to_normalise if text_to_normalise.isascii() else unidecode(text_to_normalise)
+    text_alphanum_spaces = _NON_ALPHANUM_RE.sub(' ', text_unaccented)
+    return _WHITESPACE_RE.sub(' ', text_alphanum_spaces).lower().strip()
+
+
+@_memoised
+def normalize_name(name_to_normalize):
+    """Noms d'auteurs : sans accents, tirets et points remplacés, « Nom, Prénom » -> « prénom nom »."""
+    if not isinstance(name_to_normalize, str): return ""
+
+    name_unaccented = strip_combining_marks(name_to_normalize.strip().lower())
+    name_cleaned_spaces = name_unaccented.replace('-', ' ').replace('.', ' ')
+    name_single_spaced = _WHITESPACE_RE.sub(' ', name_cleaned_spaces).strip()
+
+    if ',' in name_single_spaced:
+        parts = [part.strip() for part in name_single_spaced.split(',', 1)]
+        if len(parts) == 2 and parts[0] and parts[1]:
+            return f"{parts[1]} {parts[0]}"
+
+    return name_single_spaced
+
+
+@_memoised
+def normalize_idref(x):
+    """Noms IdRef (pydref) : ponctuation ASCII remplacée par des espaces, sans accents, minuscules."""
+    x = x.replace('\xa0', ' ')
+    return strip_combining_marks(x.lower().translate(_PUNCT_TO_SPACE)).lower().strip()
+
+
+@_memoised
+def normalize_text(s):
+    """Comparaison IdRef ↔ HAL : sans accents, minuscules, espaces réduits."""
+    if s is None:
+        return ""
+    s = strip_combining_marks(str(s))
+    return " ".join(s.lower().split())
+
+
+def normalise_many(texts_to_normalise, normaliser=normalise):
+    """Applique normaliser à une liste de textes (chaque valeur distincte n'est calculée qu'une fois)."""
+    normalised_by_text = {}
+    normalised_texts = []
+    for text_item in texts_to_normalise:
+        if type(text_item) is not str:
+            normalised_texts.append(normaliser(text_item))
+            continue
+        text_normalised = normalised_by_text.get(text_item)
+        if text_normalised is None:
+            text_normalised = normalised_by_text[text_item] = normaliser(text_item)
+        normalised_texts.append(text_normalised)
+    return normalised_texts
+
+
+def clear_normalisation_caches():
+    for normaliser in (normalise, normalize_name, normalize_idref, normalize_text):
+        normaliser.cache_clear()
@@ -1,14 +1,36 @@
+import re
 import requests
 import unicodedata
 import string
-from bs4 import BeautifulSoup
 import datetime
+import os
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
 from tenacity import retry, stop_after_attempt, wait_fixed
-from functools import lru_cache
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from normalisation import normalize_idref as normalize
+from rate_limit import RateLimiter
 
 NOT_SCIENTIST_TOKEN = ['chanteur', 'dramaturge', 'journalist', 'poete', 'theater', 'theatre']
 
+# Champs Solr demandés : de quoi écarter un candidat (formes du nom, dates) avant de télécharger sa notice
+IDREF_SOLR_FIELDS = 'ppn_z,persname_t,ppn_date,nom_s,prenom_s,datenaissance_dt,datemort_dt'
+
+IDREF_BATCH_SIZE = 50  # personnes regroupées dans une même requête Solr (identify_many)
+IDREF_BATCH_ROWS = 1000  # résultats demandés pour une requête groupée
+
+IDREF_MAX_REQUESTS_PER_SECOND = 10  # limite globale (requêtes Solr + notices), toutes recherches confondues
+IDREF_QUERY_WORKERS = 6  # personnes recherchées simultanément par identify_many
+IDREF_NOTICE_WORKERS = 8  # téléchargements de notices simultanés (pool partagé)
+
+# Cache disque des notices XML, partagé entre sessions et relances (désactivé si PYDREF_CACHE_PATH est vide)
+IDREF_NOTICE_CACHE_PATH = os.environ.get(
+    "PYDREF_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "c2labhal", "idref_notices.sqlite"))
+IDREF_NOTICE_CACHE_TTL = 30 * 24 * 3600  # secondes
+IDREF_NOTICE_CACHE_MAX_ENTRIES = 50000
+
 
 @retry(stop=stop_after_attempt(5), wait=wait_fixed(2))
 def get_url(url, params={}, headers={}, timeout=2):
@@ -27,24 +49,129 @@ def delete_punct(w: str) -> str:
     return w.lower().translate(
         str.maketrans(string.punctuation, len(string.punctuation) * ' '))
 
-def normalize(x):
-    x = x.replace('\xa0', ' ')
-    return strip_accents(delete_punct(x)).lower().strip()
+
+class IdrefNotice(object):
+    """Champs d'une notice IdRef (UNIMARC) utilisés pour l'identification d'une personne."""
+    __slots__ = ('last_name', 'first_name', 'alt_names', 'birth_date', 'death_date',
+                 'identifiers', 'descriptions', 'gender')
+
+    def __init__(self: object) -> None:
+        self.last_name = None
+        self.first_name = None
+        self.alt_names = []
+        self.birth_date = None
+        self.death_date = None
+        self.identifiers = []
+        self.descriptions = []
+        self.gender = None
+
+
+def _local_tag(element) -> str:
+    return element.tag.rsplit('}', 1)[-1] if isinstance(element.tag, str) else ''
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _solr_year(value):
+    """Année d'une date Solr (« 1950-01-01T00:00:00Z »), None si absente ou illisible."""
+    for date_value in _as_list(value):
+        year = str(date_value)[0:4]
+        if year.isdigit():
+            return int(year)
+    return None
+
+
+def _subfields(datafield):
+    """(code, texte) des sous-champs d'une zone, dans l'ordre du document."""
+    return [(subfield.get('code'), ''.join(subfield.itertext()))
+            for subfield in datafield.iter() if _local_tag(subfield) == 'subfield']
+
+
+class NoticeCache(object):
+    """
+    Notices IdRef (XML) sur disque, par PPN, dans une base SQLite.
+    Une notice plus ancienne que ttl est ignorée ; au-delà de max_entries,
+    les notices les plus anciennes sont supprimées. Seules les notices
+    téléchargées avec succès y sont enregistrées.
+    """
+
+    def __init__(self: object, path: str, ttl: int = IDREF_NOTICE_CACHE_TTL,
+                 max_entries: int = IDREF_NOTICE_CACHE_MAX_ENTRIES) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.nb_puts = 0
+        self.connection = None
+        if not path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS notices (ppn TEXT PRIMARY KEY, xml TEXT NOT NULL, stored_at REAL NOT NULL)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS notices_stored_at ON notices (stored_at)")
+            self.connection.commit()
+        except (OSError, sqlite3.Error) as e:
+            print("IdRef notice cache disabled ({}): {}".format(path, e))
+            self.connection = None
+
+    def get(self: object, ppn: str):
+        if self.connection is None:
+            return None
+        try:
+            with self.lock:
+                row = self.connection.execute(
+                    "SELECT xml FROM notices WHERE ppn = ? AND stored_at >= ?",
+                    (ppn, time.time() - self.ttl)).fetchone()
+        except sqlite3.Error as e:
+            print("Error reading cached notice {} : {}".format(ppn, e))
+            return None
+        return row[0] if row else None
+
+    def put(self: object, ppn: str, xml: str) -> None:
+        if self.connection is None:
+            return
+        try:
+            with self.lock:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO notices (ppn, xml, stored_at) VALUES (?, ?, ?)",
+                    (ppn, xml, time.time()))
+                self.nb_puts += 1
+                if self.nb_puts % 100 == 0:
+                    self._evict()
+                self.connection.commit()
+        except sqlite3.Error as e:
+            print("Error caching notice {} : {}".format(ppn, e))
+
+    def _evict(self: object) -> None:
+        self.connection.execute("DELETE FROM notices WHERE stored_at < ?", (time.time() - self.ttl,))
+        self.connection.execute(
+            "DELETE FROM notices WHERE ppn IN (SELECT ppn FROM notices ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,))
+
 
 class Pydref(object):
 
     def __init__(self: object) -> None:
         self.timeout = 2
+        self.rate_limiter = RateLimiter(IDREF_MAX_REQUESTS_PER_SECOND)
+        self.notice_executor = ThreadPoolExecutor(max_workers=IDREF_NOTICE_WORKERS)
+        self.notice_cache = NoticeCache(IDREF_NOTICE_CACHE_PATH)
 
     def query(self: object, query: str):
         solr_query = " AND ".join(query.split(' '))
         params = {'q': 'persname_t: ({})'.format(solr_query),
                   'wt': 'json',
-                  'fl': 'ppn_z,persname_t,ppn_date',  # limiter les champs pour accélérer
+                  'fl': IDREF_SOLR_FIELDS,  # limiter les champs pour accélérer
                   'sort': 'score desc',
                   'version': '2.2'
                   }
   
+        self.rate_limiter.wait()
         r = get_url(
                     "https://www.idref.fr/Sru/Solr",
                     params=params,
@@ -54,73 +181,167 @@ class Pydref(object):
             return r.json()
         return {"error": r.text}
 
-    @lru_cache(maxsize=1024)
+    def query_many(self: object, queries):
+        """Une seule requête Solr pour plusieurs noms : clauses de query reliées par OR."""
+        clauses = ['persname_t: ({})'.format(" AND ".join(query.split(' '))) for query in queries]
+        params = {'q': ' OR '.join(clauses),
+                  'wt': 'json',
+                  'fl': IDREF_SOLR_FIELDS,
+                  'sort': 'score desc',
+                  'rows': IDREF_BATCH_ROWS,
+                  'version': '2.2'
+                  }
+
+        self.rate_limiter.wait()
+        r = get_url(
+                    "https://www.idref.fr/Sru/Solr",
+                    params=params,
+                    headers=None,
+                    timeout=self.timeout * 5)
+        if r.status_code == 200 and r.text:
+            return r.json()
+        return {"error": r.text}
+
     def get_idref_notice(self: object, idref: str):
+        cached_notice = self.notice_cache.get(idref)
+        if cached_notice:
+            return cached_notice
         try: 
+            self.rate_limiter.wait()
             r = get_url("https://www.idref.fr/{}.xml".format(idref))
-            if r.status_code != 200:
+            if r.status_code != 200 or not r.text:
                 print("Error in getting notice {} : {}".format(idref, r.text))
                 return {}
+            # Les échecs (retour {}) ne sont jamais mis en cache
+            self.notice_cache.put(idref, r.text)
             return r.text
         except:
             print("Error in getting notice {}".format(idref))
             return {}
 
-    def get_alternative_names_from_idref_notice(self: object, soup):
-        alt_names = []
-        for datafield in soup.find_all("datafield", {"tag": "400"}):
-            last_name, first_name = "", ""
-            for subfield in datafield.find_all("subfield"):
-                if subfield.attrs['code'] == 'a':
-                    last_name = subfield.text.strip()
-                if subfield.attrs['code'] == 'b':
-                    first_name = subfield.text.strip()
-            full_name = f"{first_name} {last_name}".strip()
-            if full_name:
-                alt_names.append(full_name)
-                alt_names.append(f"{last_name} {first_name}".strip())
-        return alt_names
+    def solr_name_forms(self: object, doc) -> set:
+        """
+        Formes normalisées du nom d'un résultat Solr (« prénom nom » et « nom prénom »), espaces réduits.
+        persname_t est le champ interrogé par query : une variante qui correspond à la requête y figure.
+        """
+        names = []
+        for last_name, first_name in zip(_as_list(doc.get('nom_s')), _as_list(doc.get('prenom_s'))):
+            names.append(f"{last_name}, {first_name}")
+        for persname in _as_list(doc.get('persname_t')):
+            names.append(re.sub(r'\(.*?\)', ' ', str(persname)))
+        forms = set()
+        for name in names:
+            last_name, _, first_name = name.partition(',')
+            for form in (name, f"{first_name} {last_name}", f"{last_name} {first_name}"):
+                forms.add(" ".join(normalize(form).split()))
+        forms.discard('')
+        return forms
+
+    def is_possible_candidate(self: object, doc, normalized_query: str, min_birth_year, min_death_year) -> bool:
+        """
+        Pré-filtre sur les champs Solr, avant le téléchargement de la notice : mêmes critères
+        (nom exact ou variante, dates) que get_idref, appliqués seulement quand le champ est présent.
+        """
+        name_forms = self.solr_name_forms(doc)
+        if name_forms and " ".join(normalized_query.split()) not in name_forms:
+            print(f'no fullname/variant match for {normalized_query} in Solr forms of {doc.get("ppn_z")}')
+            return False
+        birth_year = _solr_year(doc.get('datenaissance_dt'))
+        if birth_year is not None and birth_year < min_birth_year:
+            print(f'skipping birth year {birth_year} ({doc.get("ppn_z")})')
+            return False
+        death_year = _solr_year(doc.get('datemort_dt'))
+        if death_year is not None and death_year < min_death_year:
+            print(f'skipping death year {death_year} ({doc.get("ppn_z")})')
+            return False
+        return True
+
+    def fetch_notices(self: object, ppns) -> dict:
+        """Télécharge des notices en parallèle (pool partagé par toutes les recherches) : PPN -> notice."""
+        notices = {}
+        future_to_ppn = {self.notice_executor.submit(self.get_idref_notice, ppn): ppn for ppn in set(ppns)}
+        for future in as_completed(future_to_ppn):
+            ppn = future_to_ppn[future]
+            try:
+                notices[ppn] = future.result()
+            except Exception:
+                notices[ppn] = {}
+        return notices
 
     def get_idref(self: object, query: str, min_birth_year, min_death_year, is_scientific, exact_fullname):
         res = self.query(query)
+        return self.get_idref_from_docs(query, res.get('response', {}).get('docs', []),
+                                        min_birth_year, min_death_year, is_scientific, exact_fullname)
+
+    def get_idref_many(self: object, queries, min_birth_year, min_death_year, is_scientific, exact_fullname) -> dict:
+        """
+        get_idref pour plusieurs noms avec une seule requête Solr (query_many) : chaque résultat
+        est rattaché aux noms dont il porte exactement la forme normalisée (mêmes formes que
+        le pré-filtre). Si la réponse est tronquée ou qu'un résultat n'a pas de forme de nom,
+        les noms sont interrogés un par un. Retourne {nom: correspondances}.
+        """
+        response = self.query_many(queries).get('response', {})
+        docs = [d for d in response.get('docs', []) if 'ppn_z' in d]
+        forms_by_doc = [self.solr_name_forms(d) for d in docs]
+        if response.get('numFound', 0) > len(response.get('docs', [])) or not all(forms_by_doc):
+            return {query: self.get_idref(query, min_birth_year, min_death_year, is_scientific, exact_fullname)
+                    for query in queries}
+
+        queries_by_form = {}
+        for query in queries:
+            queries_by_form.setdefault(" ".join(normalize(query).split()), []).append(query)
+        docs_by_query = {query: [] for query in queries}
+        for d, forms in zip(docs, forms_by_doc):
+            for form in forms:
+                for query in queries_by_form.get(form, []):
+                    if d not in docs_by_query[query]:
+                        docs_by_query[query].append(d)
+
+        # Notices de tous les candidats du lot téléchargées ensemble
+        notices = self.fetch_notices(d['ppn_z'] for query_docs in docs_by_query.values() for d in query_docs)
+        return {query: self.get_idref_from_docs(query, docs_by_query[query], min_birth_year, min_death_year,
+                                                is_scientific, exact_fullname, notices=notices)
+                for query in queries}
+
+    def get_idref_from_docs(self: object, query: str, docs, min_birth_year, min_death_year, is_scientific,
+                            exact_fullname, notices=None):
+        """Suite de get_idref à partir des résultats Solr : pré-filtre, notices, contrôles sur les notices."""
         possible_match = []
+        normalized_query = normalize(query)
+        docs = [d for d in docs
+                if 'ppn_z' in d and self.is_possible_candidate(d, normalized_query, min_birth_year, min_death_year)]
 
-        # Précharger toutes les notices en parallèle
-        ppns = [d['ppn_z'] for d in res.get('response', {}).get('docs', []) if 'ppn_z' in d]
-        notices = {}
-        with ThreadPoolExecutor(max_workers=8) as executor:
-            future_to_ppn = {executor.submit(self.get_idref_notice, ppn): ppn for ppn in ppns}
-            for future in as_completed(future_to_ppn):
-                ppn = future_to_ppn[future]
-                try:
-                    notices[ppn] = future.result()
-                except Exception:
-                    notices[ppn] = {}
+        # Précharger les notices des candidats restants en parallèle
+        notices = dict(notices or {})
+        notices.update(self.fetch_notices(d['ppn_z'] for d in docs if d['ppn_z'] not in notices))
 
-        for d in res.get('response', {}).get('docs', []):
+        for d in docs:
             if 'ppn_z' in d:
                 ppn = d['ppn_z']
                 person = {'idref' : "idref{}".format(ppn)}
                 notice = notices.get(ppn)
                 if not notice:
                     continue
-                soup = BeautifulSoup(notice, 'lxml')
-                person_name = self.get_name_from_idref_notice(soup)
-                person['last_name'] = person_name.get("last_name")
-                person['first_name'] = person_name.get("first_name")
+                try:
+                    record = self.parse_idref_notice(notice)
+                except ET.ParseError as e:
+                    print(f'unreadable notice {ppn}: {e}')
+                    continue
+                person['last_name'] = record.last_name
+                person['first_name'] = record.first_name
                 person['full_name'] = f"{person['first_name']} {person['last_name']}".strip()
                 person['full_name2'] = f"{person['last_name']} {person['first_name']}".strip()
                 exact_fullname = [normalize(person['full_name']), normalize(person['full_name2'])]
 
-                alt_names = self.get_alternative_names_from_idref_notice(soup)
+                alt_names = record.alt_names
                 person['alt_names'] = alt_names
                 for alt in alt_names:
                     exact_fullname.append(normalize(alt))
 
-                if normalize(query) not in exact_fullname:
+                if normalized_query not in exact_fullname:
                     print(f'no fullname/variant match for {query} vs {exact_fullname}')
                     continue
-                birth, death = self.get_birth_and_death_date_from_idref_notice(soup)
+                birth, death = record.birth_date, record.death_date
                 if birth:
                     person['birth_date'] = birth
                 if death:
@@ -134,11 +355,11 @@ class Pydref(object):
                     print(f'skipping death date {death}')
                     continue
 
-                identifiers = self.get_identifiers_from_idref_notice(soup)
+                identifiers = record.identifiers
                 person['identifiers'] = identifiers
 
                 skip = False
-                person['description'] = self.get_description_from_idref_notice(soup)
+                person['description'] = record.descriptions
                 if is_scientific:
                     for d in person['description']:
                         for w in NOT_SCIENTIST_TOKEN:
@@ -149,7 +370,7 @@ class Pydref(object):
                 if skip:
                     continue
 
-                person['gender'] = self.get_gender(soup)
+                person['gender'] = record.gender
 
                 possible_match.append(person)
         return possible_match
@@ -171,6 +392,43 @@ class Pydref(object):
             return res
         return {}
 
+    def identify_many(self: object, names, min_birth_year = 1920, min_death_year = 2005, is_scientific = True,
+                      exact_fullname = True, max_workers = IDREF_QUERY_WORKERS, batch_size = IDREF_BATCH_SIZE):
+        """
+        Recherche IdRef pour une liste de noms, par lots de batch_size noms (get_idref_many,
+        une requête Solr par lot ; batch_size=1 : get_idref nom par nom), plusieurs lots à la fois.
+        Générateur : produit (position, correspondances, erreur) au fil des réponses, dans l'ordre
+        d'achèvement ; erreur vaut None si la recherche a abouti. Un nom présent plusieurs fois
+        n'est interrogé qu'une fois, un nom vide ne l'est pas.
+        """
+        positions_by_name = {}
+        for position, name in enumerate(names):
+            name = str(name).strip() if name else ""
+            if not name:
+                yield position, [], None
+                continue
+            positions_by_name.setdefault(name, []).append(position)
+
+        def search_batch(batch_names):
+            if len(batch_names) == 1:
+                return {batch_names[0]: self.get_idref(batch_names[0], min_birth_year, min_death_year,
+                                                       is_scientific, exact_fullname)}
+            return self.get_idref_many(batch_names, min_birth_year, min_death_year, is_scientific, exact_fullname)
+
+        distinct_names = list(positions_by_name)
+        batch_size = max(batch_size, 1)
+        batches = [distinct_names[i:i + batch_size] for i in range(0, len(distinct_names), batch_size)]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_batch = {executor.submit(search_batch, batch_names): batch_names for batch_names in batches}
+            for future in as_completed(future_to_batch):
+                try:
+                    matches_by_name, error = future.result(), None
+                except Exception as e:
+                    matches_by_name, error = {}, e
+                for name in future_to_batch[future]:
+                    for position in positions_by_name[name]:
+                        yield position, matches_by_name.get(name, []), error
+
     def keep_digits(self: object, x: str) -> str:
         return str("".join([c for c in x if c.isdigit()]).strip())
 
@@ -198,93 +456,68 @@ class Pydref(object):
             date_str = datetime.datetime(year, 1, 1).isoformat()
         return date_str
 
-    def get_name_from_idref_notice(self: object, soup):
-        current_name, current_first_name = None, None
-        for datafield in soup.find_all("datafield"):
-            if (datafield.attrs['tag'] in ['200']):
-                current_name, current_first_name = '', ''
-                for subfield in datafield.findAll("subfield"):
-                    if subfield.attrs['code'] == 'a':
-                        current_name = subfield.text
-                    if subfield.attrs['code'] == 'b':
-                        current_first_name = subfield.text
-        return {"last_name": current_name, "first_name": current_first_name}
-
-    def get_birth_and_death_date_from_idref_notice(self: object, soup):
-        birth, death = None, None
-        for datafield in soup.find_all("datafield"):
-            if (datafield.attrs['tag'] == '103'):
-                for subfield in datafield.findAll("subfield"):
-                    if subfield.attrs['code'] == 'a':
-                        birth = self.valid_idref_date(subfield.text.strip())
-                    if subfield.attrs['code'] == 'b':
-                        death = self.valid_idref_date(subfield.text.strip())
-        return (birth, death)
-
-    def get_identifiers_from_idref_notice(self: object, soup):
-        identifiers = []
-
-        for controlfield in soup.find_all("controlfield"):
-            if (controlfield.attrs['tag'] == '001'):
-                identifiers.append({'idref': controlfield.text.strip()})
-                break
-
-        for datafield in soup.find_all("datafield"):
-
-            if (datafield.attrs['tag'] == '010'):
-                for subfield in datafield.findAll("subfield"):
-                    if subfield.attrs['code'] == 'a':
-                        identifiers.append({'isni': subfield.text.strip()})
+    def parse_idref_notice(self: object, notice: str) -> IdrefNotice:
+        """
+        Lit une notice XML en un seul parcours (même résultat que la lecture BeautifulSoup
+        d'origine, conservée comme référence dans benchmarks/bench_idref_notices.py).
+        """
+        record = IdrefNotice()
+        idref_id = None
+        other_identifiers = []
+        for field in ET.fromstring(notice).iter():
+            field_name = _local_tag(field)
+            if field_name == 'controlfield':
+                if idref_id is None and field.get('tag') == '001':
+                    idref_id = ''.join(field.itertext()).strip()
+                continue
+            if field_name != 'datafield':
+                continue
+
+            tag = field.get('tag')
+            if tag == '200':
+                record.last_name, record.first_name = '', ''
+                for code, text in _subfields(field):
+                    if code == 'a':
+                        record.last_name = text
+                    if code == 'b':
+                        record.first_name = text
+            elif tag == '400':
+                last_name, first_name = "", ""
+                for code, text in _subfields(field):
+                    if code == 'a':
+                        last_name = text.strip()
+                    if code == 'b':
+                        first_name = text.strip()
+                full_name = f"{first_name} {last_name}".strip()
+                if full_name:
+                    record.alt_names.append(full_name)
+                    record.alt_names.append(f"{last_name} {first_name}".strip())
+            elif tag == '103':
+                for code, text in _subfields(field):
+                    if code == 'a':
+                        record.birth_date = self.valid_idref_date(text.strip())
+                    if code == 'b':
+                        record.death_date = self.valid_idref_date(text.strip())
+            elif tag in ('010', '033'):
+                first_a = next((text for code, text in _subfields(field) if code == 'a'), None)
+                if first_a is not None:
+                    other_identifiers.append({'isni' if tag == '010' else 'ark': first_a.strip()})
+            elif tag == '035':
+                subfields = _subfields(field)
+                sources = {text.strip().upper() for _, text in subfields}
+                first_a = next((text for code, text in subfields if code == 'a'), None)
+                for source, key in (('ORCID', 'orcid'), ('SUDOC', 'sudoc')):
+                    if source in sources and first_a is not None:
+                        other_identifiers.append({key: first_a.strip()})
+            elif tag == '340':
+                record.descriptions.extend(text.strip() for code, text in _subfields(field) if code == 'a')
+            elif tag == '120' and record.gender is None:
+                for code, text in _subfields(field):
+                    if code == 'a' and text.strip() in ('aa', 'ba'):
+                        record.gender = 'F' if text.strip() == 'aa' else 'M'
                         break
 
-            if (datafield.attrs['tag'] == '033'):
-                for subfield in datafield.findAll("subfield"):
-                    if subfield.attrs['code'] == 'a':
-                        identifiers.append({'ark': subfield.text.strip()})
-                        break
-
-            if (datafield.attrs['tag'] == '035'):
-                is_ORCID = False
-                for subfield in datafield.findAll("subfield"):
-                    if subfield.text.strip().upper() == 'ORCID':
-                        is_ORCID = True
-                        break
-                if(is_ORCID):
-                    for subfield in datafield.findAll("subfield"):
-                        if subfield.attrs['code'] == 'a':
-                            identifiers.append({'orcid': subfield.text.strip()})
-                            break
-
-            if (datafield.attrs['tag'] == '035'):
-                is_sudoc = False
-                for subfield in datafield.findAll("subfield"):
-                    if subfield.text.strip().upper() == 'SUDOC':
-                        is_sudoc = True
-                        break
-                if(is_sudoc):
-                    for subfield in datafield.findAll("subfield"):
-                        if subfield.attrs['code'] == 'a':
-                            identifiers.append({'sudoc': subfield.text.strip()})
-                            break
-        return identifiers
-
-    def get_description_from_idref_notice(self: object, soup):
-        descriptions = []
-        for datafield in soup.find_all("datafield"):
-            if (datafield.attrs['tag'] == '340'):
-                for subfield in datafield.findAll("subfield"):
-                    if subfield.attrs['code'] == 'a':
-                        descriptions.append(subfield.text.strip())
-        return descriptions
-
-    def get_gender(self: object, soup):
-        for datafield in soup.find_all("datafield"):
-            if (datafield.attrs['tag'] == '120'):
-                for subfield in datafield.findAll("subfield"):
-                    if subfield.attrs['code'] == 'a':
-                        subfield_value = subfield.text.strip()
-                        if subfield_value == 'aa':
-                            return 'F'
-                        elif subfield_value == 'ba':
-                            return 'M'
-        return None
+        if idref_id is not None:
+            record.identifiers.append({'idref': idref_id})
+        record.identifiers.extend(other_identifiers)
+        return record
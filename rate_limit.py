@@ -0,0 +1,19 @@
+import threading
+import time
+
+
+class RateLimiter(object):
+    """Espace les requêtes d'au moins 1/max_per_second seconde, quel que soit le thread appelant."""
+
+    def __init__(self: object, max_per_second: float) -> None:
+        self.min_interval = 1.0 / max_per_second
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self: object) -> None:
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
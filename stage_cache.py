@@ -0,0 +1,92 @@
+# stage_cache.py
+# ------------------------------------------------------------
+# Étapes coûteuses du pipeline mémoïsées avec des clés explicites, dans
+# la base des points de reprise (checkpoints.py) : moissonnage de chaque
+# source (requête, donc labo, années et configuration de la source) et
+# import de la collection HAL (collection, années). Changer une option
+# qui ne les concerne pas ne les relance pas ; les étapes suivantes sont
+# reprises par les points de reprise du traitement. Les résultats sont
+# partagés par tous les traitements et utilisables depuis les threads
+# des jobs (jobs.py), sans contexte de script Streamlit.
+# Les messages des étapes (erreurs d'API...) vont à messages_st : st, ou
+# le JobReporter d'un traitement en arrière-plan.
+# ------------------------------------------------------------
+
+import pandas as pd
+import streamlit as st
+
+from checkpoints import get_checkpoint_store, stage_cache_key
+from utils import get_openalex_data, get_pubmed_data, get_scopus_data, HalCollImporter
+
+SOURCES_CACHE_TTL = 12 * 3600  # secondes ; les sources bibliographiques évoluent lentement
+HAL_COLLECTION_CACHE_TTL = 3600  # secondes ; une collection HAL change à chaque dépôt
+STAGE_CACHE_MAX_ENTRIES = 16  # résultats conservés par étape (les plus anciens sont évincés)
+
+
+def _is_empty(result):
+    if isinstance(result, tuple):
+        result = result[0]
+    if isinstance(result, pd.DataFrame):
+        return result.empty
+    return not result
+
+
+def _run_cached(stage_name, ttl, compute, refresh=False, failures=None, **params):
+    """
+    Résultat de compute() pour l'étape stage_name et ces paramètres, relu s'il date de moins de ttl secondes.
+    compute() retourne (résultat, erreurs) : un résultat obtenu malgré des erreurs (moissonnage
+    interrompu, partition HAL manquante...) est incomplet et n'est pas conservé ; ses erreurs sont
+    ajoutées à failures. Un résultat vide (source indisponible...) n'est pas conservé non plus.
+    refresh=True recalcule le résultat. Au plus STAGE_CACHE_MAX_ENTRIES résultats par étape.
+    """
+    store = get_checkpoint_store()
+    cache_key = stage_cache_key(stage_name, **params)
+    if not refresh:
+        result = store.get_stage(cache_key, max_age=ttl)
+        if result is not None:
+            return result
+    result, compute_failures = compute()
+    if compute_failures:
+        if failures is not None:
+            failures.extend(compute_failures)
+    elif not _is_empty(result):
+        store.put_stage(cache_key, stage_name, result, max_entries=STAGE_CACHE_MAX_ENTRIES)
+    return result
+
+
+def _harvest(get_data, *args, **kwargs):
+    harvest_failures = []
+    return get_data(*args, failures=harvest_failures, **kwargs), harvest_failures
+
+
+def harvest_openalex(query, max_items=5000, refresh=False, messages_st=st, failures=None):
+    return _run_cached("openalex", SOURCES_CACHE_TTL,
+                       lambda: _harvest(get_openalex_data, query, max_items=max_items, messages_st=messages_st),
+                       refresh=refresh, failures=failures, query=query, max_items=max_items)
+
+
+def harvest_pubmed(query, max_items=5000, refresh=False, messages_st=st, failures=None):
+    return _run_cached("pubmed", SOURCES_CACHE_TTL,
+                       lambda: _harvest(get_pubmed_data, query, max_items=max_items, messages_st=messages_st),
+                       refresh=refresh, failures=failures, query=query, max_items=max_items)
+
+
+def harvest_scopus(api_key, query, max_items=5000, refresh=False, messages_st=st, failures=None):
+    # La clé API ne fait pas partie de la clé de cache
+    return _run_cached("scopus", SOURCES_CACHE_TTL,
+                       lambda: _harvest(get_scopus_data, api_key, query, max_items=max_items, messages_st=messages_st),
+                       refresh=refresh, failures=failures, query=query, max_items=max_items)
+
+
+def import_hal_collection(collection_code, start_year, end_year, progress_bar_st=None, refresh=False, messages_st=st,
+                          failures=None):
+    """
+    (notices de la collection, titres) comme HalCollImporter.import_data / titles_df, mémoïsés par collection
+    et années ; failures reçoit les erreurs d'import (collection incomplète, non conservée).
+    """
+    def compute():
+        coll_importer = HalCollImporter(collection_code, start_year, end_year, messages_st=messages_st)
+        coll_df = coll_importer.import_data(progress_bar_st=progress_bar_st)
+        return (coll_df, coll_importer.titles_df), coll_importer.failures
+    return _run_cached("hal_collection", HAL_COLLECTION_CACHE_TTL, compute, refresh=refresh, failures=failures,
+                       collection_code=collection_code, start_year=int(start_year), end_year=int(end_year))
@@ -2,18 +2,27 @@ import os
 import streamlit as st
 import pandas as pd
 import io
+from exports import write_csv_export
+from hal_xml_export import generate_zip_from_xmls
+from checkpoints import PipelineCheckpoints
+from jobs import JobError, submit_job, follow_job
+from stage_cache import harvest_openalex, harvest_pubmed, harvest_scopus, import_hal_collection
+from author_detection import KnownAuthorDetector
 # Supprimé: requests, json, metapub, regex, unidecode, unicodedata, difflib, langdetect, tqdm, concurrent
 # Ces imports sont maintenant dans utils.py
 
 # Importer les fonctions et constantes partagées depuis utils.py
 from utils import (
-    get_scopus_data, get_openalex_data, get_pubmed_data, convert_to_dataframe,
-    clean_doi, HalCollImporter, merge_rows_with_sources, get_authors_from_crossref,
-    check_df, enrich_w_upw_parallel, add_permissions_parallel, deduce_todo,
-    normalise, normalize_name, get_initial_form # normalise est utilisé par HalCollImporter et check_df via statut_titre
+    convert_to_dataframe,
+    clean_doi, merge_rows_with_sources, get_authors_from_crossref_parallel,
+    check_df, enrich_w_upw_parallel, add_permissions_parallel, deduce_todo, render_deposit_conditions,
+    normalise, # normalise est utilisé par HalCollImporter et check_df via statut_titre
+    build_openalex_authorship_table, build_deposit_publications
 )
 # Les constantes comme HAL_API_ENDPOINT, etc., sont utilisées par les fonctions dans utils.py
 
+APP_NAME = "c2labhal" # identifiant des jobs et points de reprise de cette application
+
 # Fonction pour ajouter le menu de navigation dans la barre latérale (spécifique à cette app)
 def add_sidebar_menu():
     
@@ -41,73 +50,42 @@ def add_sidebar_menu():
     st.sidebar.markdown("[🐙 Voir sur GitHub](https://github.com/GuillaumeGodet/c2labhal)")
 
 
-# Fonction principale
-def main():
-    st.set_page_config(page_title="c2LabHAL", layout="wide")
-    add_sidebar_menu() 
-
-    st.title("🥎 c2LabHAL")
-    st.subheader("Comparez les publications d'un labo dans Scopus, OpenAlex et Pubmed avec sa collection HAL")
-
-    collection_a_chercher = st.text_input(
-        "Collection HAL",
-        value="", 
-        key="collection_hal",
-        help="Saisissez le code de la collection HAL du laboratoire (ex: MIP). Laissez vide pour comparer avec tout HAL (non recommandé, très long)."
+def run_pipeline(reporter, collection_a_chercher, openalex_institution_id, pubmed_query_input, scopus_lab_id,
+                 start_year, end_year, fetch_authors=False, compare_authors=False, authors_file_content=None,
+                 resume_run=True, scopus_api_key_secret=None):
+    """
+    Étapes 1 à 9 du traitement, exécutées en arrière-plan (voir jobs.py) : reporter y remplace
+    la barre de progression et les messages. Retourne les résultats et la table des auteurs OpenAlex.
+    """
+    # Points de reprise : une étape déjà terminée pour ces paramètres n'est pas refaite
+    checkpoints = PipelineCheckpoints(
+        APP_NAME, resume=resume_run, collection=collection_a_chercher, openalex_id=openalex_institution_id,
+        pubmed_query=pubmed_query_input, scopus_id=scopus_lab_id if scopus_api_key_secret else "",
+        start_year=int(start_year), end_year=int(end_year)
     )
 
-    openalex_institution_id = st.text_input("Identifiant OpenAlex du labo", help="Saisissez l'identifiant du labo dans OpenAlex (ex: i4392021216 pour MIP).")
-
-    pubmed_query_input = st.text_input("Requête PubMed", help="Saisissez la requête Pubmed qui rassemble le mieux les publications du labo, par exemple ((MIP[Affiliation]) AND ((mans[Affiliation]) OR (nantes[Affiliation]))) OR (EA 4334[Affiliation]) OR (EA4334[Affiliation]) OR (UR 4334[Affiliation]) OR (UR4334[Affiliation]) OR (Movement Interactions Performance[Affiliation] OR (Motricité Interactions Performance[Affiliation]) OR (mouvement interactions performance[Affiliation])")
-    
-    scopus_lab_id = st.text_input("Identifiant Scopus du labo (AF-ID)", help="Saisissez le Scopus Affiliation Identifier (AF-ID) du laboratoire, par exemple 60105638.")
-    
-    
-    col1_dates, col2_dates = st.columns(2)
-    with col1_dates:
-        start_year = st.number_input("Année de début", min_value=1900, max_value=2100, value=2020)
-    with col2_dates:
-        end_year = st.number_input("Année de fin", min_value=1900, max_value=2100, value=pd.Timestamp.now().year) 
-
-    with st.expander("🔧 Options avancées"):
-        fetch_authors = st.checkbox("🧑‍🔬 Récupérer les auteurs via Crossref", value=False)
-        compare_authors = False
-        uploaded_authors_file = None
-        if fetch_authors:
-            compare_authors = st.checkbox("🔍 Comparer les auteurs Crossref avec ma liste de chercheurs", value=False)
-            if compare_authors:
-                uploaded_authors_file = st.file_uploader(
-                    "📤 Téléversez un fichier CSV avec la liste des chercheurs du labo (colonnes: 'collection', 'prénom nom')", 
-                    type=["csv"],
-                    help="Le fichier CSV doit avoir une colonne 'collection' (code de la collection HAL) et une colonne 'prénom nom' avec les noms des chercheurs."
-                )
-
-    progress_bar = st.progress(0)
-    progress_text_area = st.empty() 
-
-    if st.button("🚀 Lancer la recherche et la comparaison"):
-        scopus_api_key_secret = st.secrets.get("SCOPUS_API_KEY")
-        pubmed_api_key_secret = st.secrets.get("PUBMED_API_KEY")
-        
-        if pubmed_api_key_secret and pubmed_query_input:
-            os.environ['NCBI_API_KEY'] = pubmed_api_key_secret # PubMedFetcher utilise cette variable d'environnement
-        
-        if not openalex_institution_id and not pubmed_query_input and not scopus_lab_id:
-            st.error("Veuillez configurer au moins une source de données (OpenAlex, PubMed ou Scopus).")
-            st.stop()
-
+    sources_checkpoint = checkpoints.stage("sources")
+    resumed_sources = sources_checkpoint.load()
+    if resumed_sources is not None:
+        merged_data, openalex_authorships = resumed_sources
+        reporter.info(f"Reprise : {len(merged_data)} publications uniques déjà récupérées et fusionnées (étapes 1 à 5).")
+    else:
         scopus_df = pd.DataFrame()
         openalex_df = pd.DataFrame()
         pubmed_df = pd.DataFrame()
-        
+        openalex_authorships = {} # DOI -> auteurs/affiliations OpenAlex, pour l'export HAL-TEI
+        source_failures = [] # erreurs de moissonnage : sources incomplètes, étape non enregistrée
+    
         # --- Étape 1 : Récupération des données OpenAlex ---
         if openalex_institution_id:
-            with st.spinner("Récupération OpenAlex..."):
-                progress_text_area.info("Étape 1/9 : Récupération des données OpenAlex...")
-                progress_bar.progress(5)
+            with reporter.spinner("Récupération OpenAlex..."):
+                reporter.step("Étape 1/9 : Récupération des données OpenAlex...")
+                reporter.progress(5)
                 openalex_query = f"authorships.institutions.id:{openalex_institution_id},publication_year:{start_year}-{end_year}"
-                openalex_data = get_openalex_data(openalex_query, max_items=5000) 
+                openalex_data = harvest_openalex(openalex_query, max_items=5000, refresh=not resume_run, messages_st=reporter,
+                                                 failures=source_failures)
                 if openalex_data:
+                    openalex_authorships = build_openalex_authorship_table(openalex_data)
                     openalex_df = convert_to_dataframe(openalex_data, 'openalex')
                     openalex_df['Source title'] = openalex_df.apply(
                         lambda row: row.get('primary_location', {}).get('source', {}).get('display_name') if isinstance(row.get('primary_location'), dict) and row['primary_location'].get('source') else None, axis=1
@@ -117,32 +95,34 @@ def main():
                     openalex_df['doi'] = openalex_df.get('doi', pd.Series(index=openalex_df.index, dtype='object'))
                     openalex_df['id'] = openalex_df.get('id', pd.Series(index=openalex_df.index, dtype='object')) 
                     openalex_df['Title'] = openalex_df.get('title', pd.Series(index=openalex_df.index, dtype='object'))
-                    
+                
                     cols_to_keep = ['Data source', 'Title', 'doi', 'id', 'Source title', 'Date'] # 'Data source' est déjà là
                     # S'assurer que toutes les colonnes à garder existent avant de les sélectionner
                     openalex_df = openalex_df[[col for col in cols_to_keep if col in openalex_df.columns]]
                     if 'doi' in openalex_df.columns:
                         openalex_df['doi'] = openalex_df['doi'].apply(clean_doi)
-                st.success(f"{len(openalex_df)} publications trouvées sur OpenAlex.")
-        progress_bar.progress(10)
+                reporter.success(f"{len(openalex_df)} publications trouvées sur OpenAlex.")
+        reporter.progress(10)
 
         # --- Étape 2 : Récupération des données PubMed ---
         if pubmed_query_input:
-            with st.spinner("Récupération PubMed..."):
-                progress_text_area.info("Étape 2/9 : Récupération des données PubMed...")
+            with reporter.spinner("Récupération PubMed..."):
+                reporter.step("Étape 2/9 : Récupération des données PubMed...")
                 pubmed_full_query = f"({pubmed_query_input}) AND ({start_year}/01/01[Date - Publication] : {end_year}/12/31[Date - Publication])"
-                pubmed_data = get_pubmed_data(pubmed_full_query, max_items=5000) 
+                pubmed_data = harvest_pubmed(pubmed_full_query, max_items=5000, refresh=not resume_run, messages_st=reporter,
+                                             failures=source_failures)
                 if pubmed_data:
                     pubmed_df = pd.DataFrame(pubmed_data) 
-                st.success(f"{len(pubmed_df)} publications trouvées sur PubMed.")
-        progress_bar.progress(20)
+                reporter.success(f"{len(pubmed_df)} publications trouvées sur PubMed.")
+        reporter.progress(20)
 
         # --- Étape 3 : Récupération des données Scopus ---
         if scopus_lab_id and scopus_api_key_secret:
-            with st.spinner("Récupération Scopus..."):
-                progress_text_area.info("Étape 3/9 : Récupération des données Scopus...")
+            with reporter.spinner("Récupération Scopus..."):
+                reporter.step("Étape 3/9 : Récupération des données Scopus...")
                 scopus_query = f"AF-ID({scopus_lab_id}) AND PUBYEAR > {start_year - 1} AND PUBYEAR < {end_year + 1}"
-                scopus_data = get_scopus_data(scopus_api_key_secret, scopus_query, max_items=5000)
+                scopus_data = harvest_scopus(scopus_api_key_secret, scopus_query, max_items=5000, refresh=not resume_run, messages_st=reporter,
+                                             failures=source_failures)
                 if scopus_data:
                     scopus_df_raw = convert_to_dataframe(scopus_data, 'scopus')
                     required_scopus_cols = {'dc:title', 'prism:doi', 'dc:identifier', 'prism:publicationName', 'prism:coverDate'}
@@ -152,30 +132,29 @@ def main():
                         if 'doi' in scopus_df.columns:
                              scopus_df['doi'] = scopus_df['doi'].apply(clean_doi)
                     else:
-                        st.warning("Certaines colonnes attendues sont manquantes dans les données Scopus. Scopus ne sera pas inclus.")
+                        reporter.warning("Certaines colonnes attendues sont manquantes dans les données Scopus. Scopus ne sera pas inclus.")
                         scopus_df = pd.DataFrame()
-                st.success(f"{len(scopus_df)} publications trouvées sur Scopus.")
+                reporter.success(f"{len(scopus_df)} publications trouvées sur Scopus.")
         elif scopus_lab_id and not scopus_api_key_secret:
-            st.warning("L'ID Scopus est fourni mais la clé API Scopus (SCOPUS_API_KEY) n'est pas configurée dans les secrets. Scopus sera ignoré.")
-        progress_bar.progress(30)
+            reporter.warning("L'ID Scopus est fourni mais la clé API Scopus (SCOPUS_API_KEY) n'est pas configurée dans les secrets. Scopus sera ignoré.")
+        reporter.progress(30)
 
         # --- Étape 4 : Combinaison des données ---
-        progress_text_area.info("Étape 4/9 : Combinaison des données sources...")
+        reporter.step("Étape 4/9 : Combinaison des données sources...")
         combined_df = pd.concat([scopus_df, openalex_df, pubmed_df], ignore_index=True)
 
         if combined_df.empty:
-            st.error("Aucune publication n'a été récupérée depuis OpenAlex, PubMed ou Scopus. Vérifiez vos paramètres.")
-            st.stop()
-        
+            raise JobError("Aucune publication n'a été récupérée depuis OpenAlex, PubMed ou Scopus. Vérifiez vos paramètres.")
+    
         if 'doi' in combined_df.columns:
             combined_df['doi'] = combined_df['doi'].astype(str).apply(clean_doi).str.lower().str.strip()
             combined_df['doi'] = combined_df['doi'].replace(['nan', ''], pd.NA)
 
 
       # --- Étape 5 : Fusion des lignes en double ---
-        progress_text_area.info("Étape 5/9 : Fusion des doublons...")
-        progress_bar.progress(40)
-        
+        reporter.step("Étape 5/9 : Fusion des doublons...")
+        reporter.progress(40)
+    
         # S'assurer que la colonne 'doi' existe
         if 'doi' not in combined_df.columns:
             combined_df['doi'] = pd.NA # Assigner pd.NA pour créer la colonne avec le bon type pour les NaN
@@ -201,7 +180,7 @@ def main():
         with_doi_df = combined_df[combined_df['doi'].notna()].copy()
         without_doi_df = combined_df[combined_df['doi'].isna()].copy()
 
-        
+    
         merged_data_doi = pd.DataFrame()
         if not with_doi_df.empty:
             merged_data_doi = with_doi_df.groupby('doi', as_index=False).apply(merge_rows_with_sources)
@@ -209,143 +188,238 @@ def main():
                 merged_data_doi.reset_index(inplace=True)
             if isinstance(merged_data_doi.columns, pd.MultiIndex):
                  merged_data_doi.columns = merged_data_doi.columns.droplevel(0)
-        
-        
+    
+    
         merged_data_no_doi = pd.DataFrame()
         if not without_doi_df.empty:
             merged_data_no_doi = without_doi_df.copy() 
-        
-      
+    
+  
         merged_data = pd.concat([merged_data_doi, merged_data_no_doi], ignore_index=True)
 
-        st.success(f"{len(merged_data)} publications uniques après fusion.")
-        progress_bar.progress(50)
+        reporter.success(f"{len(merged_data)} publications uniques après fusion.")
+        sources_checkpoint.save((merged_data, openalex_authorships), is_final=not source_failures)
+    reporter.progress(50)
 
-        # --- Étape 6 : Comparaison avec HAL ---
+    # --- Étape 6 : Comparaison avec HAL ---
+    hal_checkpoint = checkpoints.stage("hal")
+    final_df = hal_checkpoint.load()
+    if final_df is not None:
+        reporter.info("Reprise : comparaison avec HAL déjà effectuée.")
+    else:
         coll_df = pd.DataFrame() 
+        coll_titles_df = None
+        hal_failures = [] # erreurs d'import ou de vérification HAL : statuts par défaut, étape non enregistrée
         if collection_a_chercher: 
-            with st.spinner(f"Import de la collection HAL '{collection_a_chercher}'..."):
-                progress_text_area.info(f"Étape 6a/9 : Import de la collection HAL '{collection_a_chercher}'...")
-                coll_importer = HalCollImporter(collection_a_chercher, start_year, end_year)
-                coll_df = coll_importer.import_data() 
+            with reporter.spinner(f"Import de la collection HAL '{collection_a_chercher}'..."):
+                reporter.step(f"Étape 6a/9 : Import de la collection HAL '{collection_a_chercher}'...")
+                coll_df, coll_titles_df = import_hal_collection(collection_a_chercher, start_year, end_year,
+                                                                progress_bar_st=reporter, refresh=not resume_run, messages_st=reporter,
+                                                                failures=hal_failures)
                 if coll_df.empty:
-                    st.warning(f"La collection HAL '{collection_a_chercher}' est vide ou n'a pas pu être chargée pour les années {start_year}-{end_year}.")
+                    reporter.warning(f"La collection HAL '{collection_a_chercher}' est vide ou n'a pas pu être chargée pour les années {start_year}-{end_year}.")
                 else:
-                    st.success(f"{len(coll_df)} notices trouvées dans la collection HAL '{collection_a_chercher}'.")
+                    reporter.success(f"{len(coll_df)} notices trouvées dans la collection HAL '{collection_a_chercher}'.")
         else: 
-            st.info("Aucun code de collection HAL fourni. La comparaison se fera avec l'ensemble de HAL (peut être long et moins précis).")
-        
-        progress_text_area.info("Étape 6b/9 : Comparaison avec les données HAL...")
-        final_df = check_df(merged_data.copy(), coll_df, progress_bar_st=progress_bar, progress_text_st=progress_text_area) 
-        st.success("Comparaison avec HAL terminée.")
-        # progress_bar est géré par check_df, donc pas besoin de le mettre à jour ici explicitement à 60%
-
-        # --- Étape 7 : Enrichissement Unpaywall ---
-        with st.spinner("Enrichissement Unpaywall..."):
-            progress_text_area.info("Étape 7/9 : Enrichissement avec Unpaywall...")
-            final_df = enrich_w_upw_parallel(final_df.copy()) 
-            st.success("Enrichissement Unpaywall terminé.")
-        progress_bar.progress(70)
-
-        # --- Étape 8 : Ajout des permissions de dépôt (OA.Works) ---
-        with st.spinner("Récupération des permissions de dépôt (OA.Works)..."):
-            progress_text_area.info("Étape 8/9 : Récupération des permissions de dépôt...")
-            final_df = add_permissions_parallel(final_df.copy()) 
-            st.success("Récupération des permissions terminée.")
-        progress_bar.progress(80)
-
-        # --- Étape 9 : Déduction des actions et récupération des auteurs (si cochée) ---
-        progress_text_area.info("Étape 9/9 : Déduction des actions et traitement des auteurs...")
-        if 'Action' not in final_df.columns: 
-            final_df['Action'] = pd.NA
-        final_df['Action'] = final_df.apply(deduce_todo, axis=1)
-        
-        if fetch_authors:
-            with st.spinner("Récupération des auteurs via Crossref..."):
-                if 'doi' in final_df.columns:
-                    # Utiliser ThreadPoolExecutor directement ici pour get_authors_from_crossref
-                    from concurrent.futures import ThreadPoolExecutor
-                    from tqdm import tqdm
-
-                    dois_for_authors = final_df['doi'].fillna("").tolist()
-                    authors_results = []
-                    with ThreadPoolExecutor(max_workers=10) as executor:
-                        authors_results = list(tqdm(executor.map(get_authors_from_crossref, dois_for_authors), total=len(dois_for_authors), desc="Récupération auteurs Crossref"))
-                    
-                    final_df['Auteurs_Crossref'] = ['; '.join(author_list) if isinstance(author_list, list) and not any("Erreur" in str(a) or "Timeout" in str(a) for a in author_list) else (author_list[0] if isinstance(author_list, list) and author_list else '') for author_list in authors_results]
-                    st.success("Récupération des auteurs terminée.")
-                else:
-                    st.warning("Colonne 'doi' non trouvée, impossible de récupérer les auteurs.")
-                    final_df['Auteurs_Crossref'] = ''
-
-            if compare_authors and uploaded_authors_file and collection_a_chercher: 
-                with st.spinner("Comparaison des auteurs avec le fichier fourni..."):
-                    try:
-                        user_authors_df = pd.read_csv(uploaded_authors_file)
-                        if not ({'collection', user_authors_df.columns[1]} <= set(user_authors_df.columns)): 
-                            st.error("Le fichier CSV des chercheurs doit contenir une colonne 'collection' et une deuxième colonne avec 'prénom nom'.")
+            reporter.info("Aucun code de collection HAL fourni. La comparaison se fera avec l'ensemble de HAL (peut être long et moins précis).")
+    
+        reporter.step("Étape 6b/9 : Comparaison avec les données HAL...")
+        final_df = check_df(merged_data.copy(), coll_df, progress_bar_st=reporter, progress_text_st=reporter, collection_code=collection_a_chercher, hal_titles_df=coll_titles_df, messages_st=reporter, failures=hal_failures) 
+        reporter.success("Comparaison avec HAL terminée.")
+        hal_checkpoint.save(final_df, is_final=not hal_failures)
+    # progress_bar est géré par check_df, donc pas besoin de le mettre à jour ici explicitement à 60%
+
+    # --- Étape 7 : Enrichissement Unpaywall ---
+    # (à la reprise d'une étape interrompue, seuls les DOI pas encore traités sont interrogés)
+    upw_checkpoint = checkpoints.stage("unpaywall", shared_rows=True)
+    upw_df = upw_checkpoint.load()
+    if upw_df is not None:
+        final_df = upw_df
+        reporter.info("Reprise : enrichissement Unpaywall déjà effectué.")
+    else:
+        with reporter.spinner("Enrichissement Unpaywall..."):
+            reporter.step("Étape 7/9 : Enrichissement avec Unpaywall...")
+            upw_failures = []
+            final_df = enrich_w_upw_parallel(final_df.copy(), checkpoint=upw_checkpoint, messages_st=reporter,
+                                             failures=upw_failures)
+            upw_checkpoint.save(final_df, is_final=not upw_failures)
+            reporter.success("Enrichissement Unpaywall terminé.")
+    reporter.progress(70)
+
+    # --- Étape 8 : Ajout des permissions de dépôt (OA.Works) ---
+    permissions_checkpoint = checkpoints.stage("permissions", shared_rows=True)
+    permissions_df = permissions_checkpoint.load()
+    if permissions_df is not None:
+        final_df = permissions_df
+        reporter.info("Reprise : permissions de dépôt déjà récupérées.")
+    else:
+        with reporter.spinner("Récupération des permissions de dépôt (OA.Works)..."):
+            reporter.step("Étape 8/9 : Récupération des permissions de dépôt...")
+            permissions_failures = []
+            final_df = add_permissions_parallel(final_df.copy(), checkpoint=permissions_checkpoint, messages_st=reporter,
+                                                failures=permissions_failures)
+            permissions_checkpoint.save(final_df, is_final=not permissions_failures)
+            reporter.success("Récupération des permissions terminée.")
+    reporter.progress(80)
+
+    # --- Étape 9 : Déduction des actions et récupération des auteurs (si cochée) ---
+    reporter.step("Étape 9/9 : Déduction des actions et traitement des auteurs...")
+    if 'Action' not in final_df.columns: 
+        final_df['Action'] = pd.NA
+    final_df['Action'] = final_df.apply(deduce_todo, axis=1)
+    
+    if fetch_authors:
+        with reporter.spinner("Récupération des auteurs via Crossref..."):
+            if 'doi' in final_df.columns:
+                authors_checkpoint = checkpoints.stage("crossref_authors", shared_rows=True)
+                authors_results = authors_checkpoint.load()
+                if authors_results is None:
+                    authors_failures = []
+                    authors_results = get_authors_from_crossref_parallel(final_df['doi'].tolist(), checkpoint=authors_checkpoint,
+                                                                         failures=authors_failures)
+                    authors_checkpoint.save(authors_results, is_final=not authors_failures)
+
+                final_df['Auteurs_Crossref'] = ['; '.join(author_list) if isinstance(author_list, list) and not any("Erreur" in str(a) or "Timeout" in str(a) for a in author_list) else (author_list[0] if isinstance(author_list, list) and author_list else '') for author_list in authors_results]
+                reporter.success("Récupération des auteurs terminée.")
+            else:
+                reporter.warning("Colonne 'doi' non trouvée, impossible de récupérer les auteurs.")
+                final_df['Auteurs_Crossref'] = ''
+
+        if compare_authors and authors_file_content and collection_a_chercher: 
+            with reporter.spinner("Comparaison des auteurs avec le fichier fourni..."):
+                try:
+                    user_authors_df = pd.read_csv(io.BytesIO(authors_file_content))
+                    if not ({'collection', user_authors_df.columns[1]} <= set(user_authors_df.columns)): 
+                        reporter.error("Le fichier CSV des chercheurs doit contenir une colonne 'collection' et une deuxième colonne avec 'prénom nom'.")
+                    else:
+                        author_name_col = user_authors_df.columns[1] 
+                        noms_ref_list = user_authors_df[user_authors_df["collection"].astype(str).str.lower() == str(collection_a_chercher).lower()][author_name_col].dropna().unique().tolist()
+                        
+                        if not noms_ref_list:
+                            reporter.warning(f"Aucun chercheur trouvé pour la collection '{collection_a_chercher}' dans le fichier fourni.")
                         else:
-                            author_name_col = user_authors_df.columns[1] 
-                            noms_ref_list = user_authors_df[user_authors_df["collection"].astype(str).str.lower() == str(collection_a_chercher).lower()][author_name_col].dropna().unique().tolist()
-                            
-                            if not noms_ref_list:
-                                st.warning(f"Aucun chercheur trouvé pour la collection '{collection_a_chercher}' dans le fichier fourni.")
-                            else:
-                                chercheur_map_norm = {normalize_name(n): n for n in noms_ref_list} 
-                                initial_map_norm = {get_initial_form(normalize_name(n)): n for n in noms_ref_list} 
-                                
-                                from difflib import get_close_matches # S'assurer de l'import si pas global à utils
-
-                                def detect_known_authors_optimized(authors_crossref_str):
-                                    if pd.isna(authors_crossref_str) or not str(authors_crossref_str).strip() or "Erreur" in authors_crossref_str or "Timeout" in authors_crossref_str :
-                                        return ""
-                                    
-                                    authors_from_pub = [a.strip() for a in str(authors_crossref_str).split(';') if a.strip()]
-                                    noms_detectes_originaux = set() 
-
-                                    for author_pub_orig in authors_from_pub:
-                                        author_pub_norm = normalize_name(author_pub_orig) 
-                                        author_pub_initial_norm = get_initial_form(author_pub_norm) 
-
-                                        match_complet = get_close_matches(author_pub_norm, chercheur_map_norm.keys(), n=1, cutoff=0.85) 
-                                        if match_complet:
-                                            noms_detectes_originaux.add(chercheur_map_norm[match_complet[0]])
-                                            continue 
-
-                                        match_initial = get_close_matches(author_pub_initial_norm, initial_map_norm.keys(), n=1, cutoff=0.9) 
-                                        if match_initial:
-                                            noms_detectes_originaux.add(initial_map_norm[match_initial[0]])
-                                            
-                                    return "; ".join(sorted(list(noms_detectes_originaux))) if noms_detectes_originaux else ""
-
-                                final_df['Auteurs_Laboratoire_Détectés'] = final_df['Auteurs_Crossref'].apply(detect_known_authors_optimized)
-                                st.success("Comparaison des auteurs avec le fichier terminée.")
-
-                    except Exception as e_author_file:
-                        st.error(f"Erreur lors du traitement du fichier des auteurs : {e_author_file}")
-            elif compare_authors and not uploaded_authors_file:
-                st.warning("Veuillez téléverser un fichier CSV de chercheurs pour la comparaison des auteurs.")
-            elif compare_authors and not collection_a_chercher:
-                 st.warning("Veuillez spécifier un code de collection HAL pour la comparaison des auteurs.")
-
-        progress_bar.progress(90) # Avant affichage et DL
-        st.success("Déduction des actions et traitement des auteurs terminés.")
-        
-        st.dataframe(final_df)
-
-        if not final_df.empty:
-            csv_export = final_df.to_csv(index=False, encoding='utf-8-sig')
-            filename_coll_part = str(collection_a_chercher).replace(" ", "_") if collection_a_chercher else "HAL_global"
-            output_filename = f"c2LabHAL_resultats_{filename_coll_part}_{start_year}-{end_year}.csv"
-
+                            final_df['Auteurs_Laboratoire_Détectés'] = KnownAuthorDetector(noms_ref_list).detect_all(final_df['Auteurs_Crossref'])
+                            reporter.success("Comparaison des auteurs avec le fichier terminée.")
+
+                except Exception as e_author_file:
+                    reporter.error(f"Erreur lors du traitement du fichier des auteurs : {e_author_file}")
+        elif compare_authors and not authors_file_content:
+            reporter.warning("Veuillez téléverser un fichier CSV de chercheurs pour la comparaison des auteurs.")
+        elif compare_authors and not collection_a_chercher:
+             reporter.warning("Veuillez spécifier un code de collection HAL pour la comparaison des auteurs.")
+
+    reporter.progress(90) # Avant affichage et DL
+    reporter.success("Déduction des actions et traitement des auteurs terminés.")
+    
+    final_df = render_deposit_conditions(final_df)
+    filename_coll_part = str(collection_a_chercher).replace(" ", "_") if collection_a_chercher else "HAL_global"
+
+    # Exports écrits une seule fois dans les fichiers du job : le résultat n'en garde que les chemins
+    reporter.step("Préparation des exports (CSV, notices HAL-TEI)...")
+    deposit_publications = build_deposit_publications(final_df, openalex_authorships)
+    csv_export = None
+    if not final_df.empty:
+        csv_export = write_csv_export(final_df, reporter.export_path("resultats.csv"), index=False, encoding='utf-8-sig')
+    tei_zip_export = None
+    if deposit_publications:
+        tei_zip_export = generate_zip_from_xmls(deposit_publications, output=reporter.export_path("notices_tei.zip"))
+    checkpoints.finish()
+    return {"final_df": final_df, "export_name": f"{filename_coll_part}_{start_year}-{end_year}",
+            "csv_export": csv_export, "tei_zip_export": tei_zip_export, "tei_count": len(deposit_publications)}
+
+
+def show_results(result):
+    """Tableau et exports (CSV, notices HAL-TEI) d'un traitement terminé."""
+    final_df = result["final_df"]
+    st.dataframe(final_df)
+
+    if result.get("csv_export") is not None:
+        output_filename = f"c2LabHAL_resultats_{result['export_name']}.csv"
+        with open(result["csv_export"], "rb") as csv_file:
             st.download_button(
                 label="📥 Télécharger les résultats en CSV",
-                data=csv_export,
+                data=csv_file,
                 file_name=output_filename,
                 mime="text/csv"
             )
-        progress_bar.progress(100)
-        progress_text_area.success("🎉 Traitement terminé avec succès !")
+
+    if result.get("tei_zip_export") is not None:
+        with open(result["tei_zip_export"], "rb") as zip_file:
+            st.download_button(
+                label=f"📦 Télécharger les notices HAL-TEI à créer ({result['tei_count']})",
+                data=zip_file,
+                file_name=f"c2LabHAL_TEI_{result['export_name']}.zip",
+                mime="application/zip"
+            )
+
+
+# Fonction principale
+def main():
+    st.set_page_config(page_title="c2LabHAL", layout="wide")
+    add_sidebar_menu() 
+
+    st.title("🥎 c2LabHAL")
+    st.subheader("Comparez les publications d'un labo dans Scopus, OpenAlex et Pubmed avec sa collection HAL")
+
+    collection_a_chercher = st.text_input(
+        "Collection HAL",
+        value="", 
+        key="collection_hal",
+        help="Saisissez le code de la collection HAL du laboratoire (ex: MIP). Laissez vide pour comparer avec tout HAL (non recommandé, très long)."
+    )
+
+    openalex_institution_id = st.text_input("Identifiant OpenAlex du labo", help="Saisissez l'identifiant du labo dans OpenAlex (ex: i4392021216 pour MIP).")
+
+    pubmed_query_input = st.text_input("Requête PubMed", help="Saisissez la requête Pubmed qui rassemble le mieux les publications du labo, par exemple ((MIP[Affiliation]) AND ((mans[Affiliation]) OR (nantes[Affiliation]))) OR (EA 4334[Affiliation]) OR (EA4334[Affiliation]) OR (UR 4334[Affiliation]) OR (UR4334[Affiliation]) OR (Movement Interactions Performance[Affiliation] OR (Motricité Interactions Performance[Affiliation]) OR (mouvement interactions performance[Affiliation])")
+    
+    scopus_lab_id = st.text_input("Identifiant Scopus du labo (AF-ID)", help="Saisissez le Scopus Affiliation Identifier (AF-ID) du laboratoire, par exemple 60105638.")
+    
+    
+    col1_dates, col2_dates = st.columns(2)
+    with col1_dates:
+        start_year = st.number_input("Année de début", min_value=1900, max_value=2100, value=2020)
+    with col2_dates:
+        end_year = st.number_input("Année de fin", min_value=1900, max_value=2100, value=pd.Timestamp.now().year) 
+
+    with st.expander("🔧 Options avancées"):
+        resume_run = st.checkbox(
+            "♻️ Reprendre un traitement interrompu", value=True,
+            help="Si le dernier traitement avec ces mêmes paramètres n'a pas abouti (moins de 24 h), ses étapes déjà terminées ne sont pas refaites. Un traitement abouti n'est jamais repris. Décochez pour tout recalculer."
+        )
+        fetch_authors = st.checkbox("🧑‍🔬 Récupérer les auteurs via Crossref", value=False)
+        compare_authors = False
+        uploaded_authors_file = None
+        if fetch_authors:
+            compare_authors = st.checkbox("🔍 Comparer les auteurs Crossref avec ma liste de chercheurs", value=False)
+            if compare_authors:
+                uploaded_authors_file = st.file_uploader(
+                    "📤 Téléversez un fichier CSV avec la liste des chercheurs du labo (colonnes: 'collection', 'prénom nom')", 
+                    type=["csv"],
+                    help="Le fichier CSV doit avoir une colonne 'collection' (code de la collection HAL) et une colonne 'prénom nom' avec les noms des chercheurs."
+                )
+
+    if st.button("🚀 Lancer la recherche et la comparaison"):
+        scopus_api_key_secret = st.secrets.get("SCOPUS_API_KEY")
+        pubmed_api_key_secret = st.secrets.get("PUBMED_API_KEY")
+        
+        if pubmed_api_key_secret and pubmed_query_input:
+            os.environ['NCBI_API_KEY'] = pubmed_api_key_secret # PubMedFetcher utilise cette variable d'environnement
+        
+        if not openalex_institution_id and not pubmed_query_input and not scopus_lab_id:
+            st.error("Veuillez configurer au moins une source de données (OpenAlex, PubMed ou Scopus).")
+            st.stop()
+
+        submit_job(
+            APP_NAME, f"{collection_a_chercher or 'HAL'} {start_year}-{end_year}", run_pipeline,
+            collection_a_chercher, openalex_institution_id, pubmed_query_input, scopus_lab_id, start_year, end_year,
+            fetch_authors=fetch_authors, compare_authors=compare_authors,
+            authors_file_content=uploaded_authors_file.getvalue() if uploaded_authors_file else None,
+            resume_run=resume_run, scopus_api_key_secret=scopus_api_key_secret
+        )
+
+    # Le traitement tourne en arrière-plan : une interaction avec la page ou un rechargement ne l'interrompt pas
+    follow_job(APP_NAME, show_results)
+
 
 if __name__ == "__main__":
     main()
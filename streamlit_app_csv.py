@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
 import io
+from exports import write_csv_export
+from jobs import JobError, submit_job, follow_job
 
 # Importer les fonctions nécessaires depuis utils.py
 from utils import (
@@ -8,9 +10,12 @@ from utils import (
     enrich_w_upw_parallel,
     add_permissions_parallel,
     deduce_todo,
+    render_deposit_conditions,
     # normalise, # Utilisé indirectement via HalCollImporter et check_df
-    HalCollImporter
 )
+from stage_cache import import_hal_collection
+
+APP_NAME = "c2labhal_csv" # identifiant des jobs de cette application
 
 # Fonction pour ajouter le menu de navigation dans la barre latérale (spécifique à cette app)
 def add_sidebar_menu():
@@ -37,20 +42,19 @@ def add_sidebar_menu():
     st.sidebar.markdown("[🐙 Voir sur GitHub](https://github.com/GuillaumeGodet/c2labhal)")
 
 
-def process_csv(uploaded_file_data, collection_hal_code, start_year_hal, end_year_hal, progress_bar_st, progress_text_area_st):
+def process_csv(reporter, csv_content, collection_hal_code, start_year_hal, end_year_hal):
     """
-    Traite le fichier CSV uploadé, effectue les vérifications HAL et Unpaywall,
-    et retourne le DataFrame enrichi.
+    Traite le contenu du fichier CSV uploadé, effectue les vérifications HAL et Unpaywall,
+    et retourne le DataFrame enrichi. Exécuté en arrière-plan (voir jobs.py) : reporter
+    remplace la barre de progression et les messages.
     """
     try:
-        df_input = pd.read_csv(uploaded_file_data)
+        df_input = pd.read_csv(io.BytesIO(csv_content))
     except Exception as e:
-        st.error(f"Erreur lors de la lecture du fichier CSV : {e}")
-        return None
+        raise JobError(f"Erreur lors de la lecture du fichier CSV : {e}")
 
     if 'doi' not in df_input.columns and 'Title' not in df_input.columns:
-        st.error("Le fichier CSV doit contenir au moins une colonne 'doi' ou une colonne 'Title'.")
-        return None
+        raise JobError("Le fichier CSV doit contenir au moins une colonne 'doi' ou une colonne 'Title'.")
     
     if 'doi' not in df_input.columns:
         df_input['doi'] = pd.NA
@@ -60,44 +64,68 @@ def process_csv(uploaded_file_data, collection_hal_code, start_year_hal, end_yea
     if 'doi' in df_input.columns: # Nettoyer les DOI
         df_input['doi'] = df_input['doi'].astype(str).str.lower().str.strip().replace(['nan', ''], pd.NA)
 
-    progress_text_area_st.info("Étape 1/5 : Importation de la collection HAL...")
-    progress_bar_st.progress(10)
+    reporter.step("Étape 1/5 : Importation de la collection HAL...")
+    reporter.progress(10)
     
-    coll_importer_obj = HalCollImporter(collection_hal_code, start_year_hal, end_year_hal)
-    coll_df_hal = coll_importer_obj.import_data() 
+    coll_df_hal, coll_titles_df = import_hal_collection(collection_hal_code, start_year_hal, end_year_hal, progress_bar_st=reporter, messages_st=reporter)
     if coll_df_hal.empty:
-        st.warning(f"La collection HAL '{collection_hal_code}' est vide ou n'a pas pu être chargée pour {start_year_hal}-{end_year_hal}.")
+        reporter.warning(f"La collection HAL '{collection_hal_code}' est vide ou n'a pas pu être chargée pour {start_year_hal}-{end_year_hal}.")
     else:
-        st.success(f"{len(coll_df_hal)} notices trouvées dans la collection HAL '{collection_hal_code}'.")
+        reporter.success(f"{len(coll_df_hal)} notices trouvées dans la collection HAL '{collection_hal_code}'.")
     # La barre de progression est mise à jour par HalCollImporter si st.progress y est passé, sinon manuellement ici.
     # Pour l'instant, on gère la progression globale ici.
-    progress_bar_st.progress(25)
+    reporter.progress(25)
 
 
-    progress_text_area_st.info("Étape 2/5 : Comparaison avec les données HAL...")
-    df_checked_hal = check_df(df_input.copy(), coll_df_hal, progress_bar_st=progress_bar_st, progress_text_st=progress_text_area_st) 
-    st.success("Comparaison HAL terminée.")
+    reporter.step("Étape 2/5 : Comparaison avec les données HAL...")
+    df_checked_hal = check_df(df_input.copy(), coll_df_hal, progress_bar_st=reporter, progress_text_st=reporter, collection_code=collection_hal_code, hal_titles_df=coll_titles_df, messages_st=reporter) 
+    reporter.success("Comparaison HAL terminée.")
     # check_df gère sa propre progression jusqu'à la fin de son étape
 
-    progress_text_area_st.info("Étape 3/5 : Enrichissement avec Unpaywall...")
-    progress_bar_st.progress(50) # Marquer le début de l'étape Unpaywall
-    df_enriched_upw = enrich_w_upw_parallel(df_checked_hal.copy())
-    st.success("Enrichissement Unpaywall terminé.")
-    progress_bar_st.progress(70)
+    reporter.step("Étape 3/5 : Enrichissement avec Unpaywall...")
+    reporter.progress(50) # Marquer le début de l'étape Unpaywall
+    df_enriched_upw = enrich_w_upw_parallel(df_checked_hal.copy(), messages_st=reporter)
+    reporter.success("Enrichissement Unpaywall terminé.")
+    reporter.progress(70)
 
-    progress_text_area_st.info("Étape 4/5 : Récupération des permissions de dépôt...")
-    df_enriched_perms = add_permissions_parallel(df_enriched_upw.copy())
-    st.success("Récupération des permissions OA.works terminée.")
-    progress_bar_st.progress(85)
+    reporter.step("Étape 4/5 : Récupération des permissions de dépôt...")
+    df_enriched_perms = add_permissions_parallel(df_enriched_upw.copy(), messages_st=reporter)
+    reporter.success("Récupération des permissions OA.works terminée.")
+    reporter.progress(85)
 
-    progress_text_area_st.info("Étape 5/5 : Déduction des actions...")
+    reporter.step("Étape 5/5 : Déduction des actions...")
     if 'Action' not in df_enriched_perms.columns:
         df_enriched_perms['Action'] = pd.NA
     df_enriched_perms['Action'] = df_enriched_perms.apply(deduce_todo, axis=1)
-    st.success("Déduction des actions terminée.")
-    progress_bar_st.progress(100)
-
-    return df_enriched_perms
+    reporter.success("Déduction des actions terminée.")
+    reporter.progress(100)
+
+    processed_df = render_deposit_conditions(df_enriched_perms)
+    # Export écrit une seule fois dans les fichiers du job : le résultat n'en garde que le chemin
+    csv_export = None
+    if not processed_df.empty:
+        csv_export = write_csv_export(processed_df, reporter.export_path("resultats.csv"), index=False, encoding='utf-8-sig')
+    return {"processed_df": processed_df, "collection": collection_hal_code, "csv_export": csv_export}
+
+
+def show_results_csv(result):
+    """Tableau et export CSV d'un traitement terminé."""
+    processed_df_csv = result["processed_df"]
+    if processed_df_csv.empty:
+        st.warning("Le traitement n'a produit aucun résultat. Vérifiez le contenu de votre fichier CSV et les paramètres.")
+        return
+    st.dataframe(processed_df_csv)
+    filename_coll_part_csv = str(result["collection"]).replace(" ", "_")
+    output_filename_csv = f"c2LabHAL_resultats_CSV_{filename_coll_part_csv}.csv"
+
+    if result.get("csv_export") is not None:
+        with open(result["csv_export"], "rb") as csv_file:
+            st.download_button(
+                label="📥 Télécharger le CSV enrichi",
+                data=csv_file,
+                file_name=output_filename_csv,
+                mime="text/csv"
+            )
 
 
 def main():
@@ -125,42 +153,20 @@ def main():
     with col2_date_csv:
         end_year_coll_csv = st.number_input("Année de fin (collection HAL)", min_value=1900, max_value=2100, value=pd.Timestamp.now().year, key="csv_end_year")
 
-    progress_bar_main_csv = st.progress(0)
-    progress_text_area_main_csv = st.empty()
-
     if st.button("🚀 Lancer le traitement du CSV"):
-        if uploaded_file and collection_a_chercher_csv:
-            progress_text_area_main_csv.info("Traitement du fichier CSV en cours...")
-            processed_df_csv = process_csv(uploaded_file, collection_a_chercher_csv, start_year_coll_csv, end_year_coll_csv, progress_bar_main_csv, progress_text_area_main_csv)
-            
-            if processed_df_csv is not None and not processed_df_csv.empty:
-                st.dataframe(processed_df_csv)
-                csv_export_data = processed_df_csv.to_csv(index=False, encoding='utf-8-sig')
-                
-                filename_coll_part_csv = str(collection_a_chercher_csv).replace(" ", "_")
-                output_filename_csv = f"c2LabHAL_resultats_CSV_{filename_coll_part_csv}.csv"
-                
-                st.download_button(
-                    label="📥 Télécharger le CSV enrichi",
-                    data=csv_export_data,
-                    file_name=output_filename_csv,
-                    mime="text/csv"
-                )
-                progress_text_area_main_csv.success("🎉 Traitement terminé avec succès !")
-            elif processed_df_csv is not None and processed_df_csv.empty:
-                st.warning("Le traitement n'a produit aucun résultat. Vérifiez le contenu de votre fichier CSV et les paramètres.")
-                progress_text_area_main_csv.warning("Aucun résultat à afficher ou télécharger.")
-            # else: # Cas où processed_df_csv is None (erreur déjà gérée dans process_csv)
-                # progress_text_area_main_csv.error("Le traitement a échoué. Veuillez vérifier les messages d'erreur.")
-
-        elif not uploaded_file:
+        if not uploaded_file:
             st.error("Veuillez téléverser un fichier CSV.")
-            progress_text_area_main_csv.empty()
-            progress_bar_main_csv.progress(0)
         elif not collection_a_chercher_csv: # collection_a_chercher_csv est requis ici
             st.error("Veuillez spécifier un code de collection HAL à comparer.")
-            progress_text_area_main_csv.empty()
-            progress_bar_main_csv.progress(0)
+        else:
+            submit_job(
+                APP_NAME, f"{uploaded_file.name} / {collection_a_chercher_csv} {start_year_coll_csv}-{end_year_coll_csv}",
+                process_csv, uploaded_file.getvalue(), collection_a_chercher_csv, start_year_coll_csv, end_year_coll_csv
+            )
+
+    # Le traitement tourne en arrière-plan : une interaction avec la page ou un rechargement ne l'interrompt pas
+    follow_job(APP_NAME, show_results_csv)
+
 
 if __name__ == "__main__":
     main()
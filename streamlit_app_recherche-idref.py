@@ -3,6 +3,7 @@ import pandas as pd
 from io import StringIO
 import datetime
 from pydref import Pydref
+from exports import csv_export_file
 
 st.set_page_config(
     page_title="Recherche d'identifiants IdRef",
@@ -20,19 +21,20 @@ except Exception as e:
     st.stop()
 
 
-def search_idref_for_person(full_name, min_birth_year, min_death_year):
-    try:
-        results = pydref_api.get_idref(
-            query=full_name,
+def search_idref_for_people(full_names, min_birth_year, min_death_year, progress_bar):
+    """Recherche IdRef de toutes les personnes (en parallèle) ; retourne les correspondances dans l'ordre des noms."""
+    matches_by_position = [[] for _ in full_names]
+    for nb_done, (position, matches, error) in enumerate(pydref_api.identify_many(
+            full_names,
             min_birth_year=min_birth_year,
             min_death_year=min_death_year,
             is_scientific=True,
-            exact_fullname=True
-        )
-        return results
-    except Exception as e:
-        st.warning(f"Erreur lors de la recherche pour '{full_name}': {e}") 
-        return []
+            exact_fullname=True), start=1):
+        if error is not None:
+            st.warning(f"Erreur lors de la recherche pour '{full_names[position]}': {error}")
+        matches_by_position[position] = matches
+        progress_bar.progress(nb_done / len(full_names))
+    return matches_by_position
 
 
 def add_sidebar_menu():
@@ -125,20 +127,15 @@ if uploaded_file is not None:
                 all_results = []
                 progress_bar = st.progress(0, text="Progression de la recherche...")
                 
-                for index, row in data.iterrows():
+                full_names = []
+                for _, row in data.iterrows():
                     name = str(row[name_column]) if pd.notna(row[name_column]) else ""
                     first_name = str(row[firstname_column]) if pd.notna(row[firstname_column]) else ""
-                    full_name = f"{first_name} {name}".strip()
-
-                    if not full_name:
-                        matches = []
-                    else:
-                        matches = search_idref_for_person(
-                            full_name=full_name,
-                            min_birth_year=min_birth_year,
-                            min_death_year=min_death_year
-                        )
-                    
+                    full_names.append(f"{first_name} {name}".strip())
+
+                all_matches = search_idref_for_people(full_names, min_birth_year, min_death_year, progress_bar)
+
+                for (_, row), full_name, matches in zip(data.iterrows(), full_names, all_matches):
                     original_data = row.to_dict()
                     result_row = {
                         **original_data,
@@ -194,20 +191,19 @@ if uploaded_file is not None:
                             result_row['idref_status'] = 'ambiguous'
 
                     all_results.append(result_row)
-                    progress_bar.progress((index + 1) / len(data))
 
                 results_df = pd.DataFrame(all_results)
                 
                 st.subheader("Résultats de la recherche")
                 st.dataframe(results_df)
 
-                csv_output = results_df.to_csv(index=False, encoding='utf-8').encode('utf-8')
-                st.download_button(
-                    label="💾 Télécharger les résultats en CSV",
-                    data=csv_output,
-                    file_name=f"idref_results_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                    mime="text/csv",
-                )
+                with csv_export_file(results_df, index=False, encoding='utf-8') as csv_output:
+                    st.download_button(
+                        label="💾 Télécharger les résultats en CSV",
+                        data=csv_output,
+                        file_name=f"idref_results_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                        mime="text/csv",
+                    )
                 st.success("Recherche terminée ! Prête à télécharger.")
 
     except ImportError as ie:
@@ -2,18 +2,27 @@ import os # Pour la variable d'environnement NCBI_API_KEY
 import streamlit as st
 import pandas as pd
 import io
+from exports import write_csv_export
+from hal_xml_export import generate_zip_from_xmls
+from checkpoints import PipelineCheckpoints
+from jobs import JobError, submit_job, follow_job
+from stage_cache import harvest_openalex, harvest_pubmed, harvest_scopus, import_hal_collection
+from author_detection import KnownAuthorDetector
 # Supprimé: requests, json, unicodedata, difflib, tqdm, concurrent
 # Ces imports sont maintenant dans utils.py ou non nécessaires directement ici
 
 # Importer les fonctions et constantes partagées depuis utils.py
 from utils import (
-    get_scopus_data, get_openalex_data, get_pubmed_data, convert_to_dataframe,
-    clean_doi, HalCollImporter, merge_rows_with_sources, get_authors_from_crossref,
-    check_df, enrich_w_upw_parallel, add_permissions_parallel, deduce_todo,
-    normalise, normalize_name, get_initial_form # normalise est utilisé par HalCollImporter et check_df
+    convert_to_dataframe,
+    clean_doi, merge_rows_with_sources, get_authors_from_crossref_parallel,
+    check_df, enrich_w_upw_parallel, add_permissions_parallel, deduce_todo, render_deposit_conditions,
+    normalise, # normalise est utilisé par HalCollImporter et check_df
+    build_openalex_authorship_table, build_deposit_publications
 )
 # Les constantes comme HAL_API_ENDPOINT sont utilisées par les fonctions dans utils.py
 
+APP_NAME = "c2labhal_rennes" # identifiant des jobs et points de reprise de cette application
+
 
 # --- Définition de la liste des laboratoires (spécifique à cette application) ---
 labos_list_rennes = [
@@ -169,67 +178,44 @@ def add_sidebar_menu():
     st.sidebar.markdown("[🐙 Voir sur GitHub](https://github.com/GuillaumeGodet/c2labhal)")
 
 
-def main():
-    st.set_page_config(page_title="c2LabHAL - Rennes", layout="wide")
-    add_sidebar_menu() 
-
-    st.title("🥎 c2LabHAL - Version Université de Rennes")
-    st.subheader("Comparez les publications d’un laboratoire de l'Université de Rennes avec sa collection HAL")
-
-    labo_choisi_nom_rennes = st.selectbox(
-        "Choisissez une collection HAL de laboratoire (Université de Rennes) :", 
-        sorted(labos_df_rennes_global['collection'].unique())
+def run_pipeline_rennes(reporter, collection_a_chercher_rennes, openalex_institution_id_rennes, openalex_institution_raw_rennes,
+                        pubmed_query_labo_rennes, scopus_lab_id_rennes, start_year_rennes, end_year_rennes,
+                        fetch_authors_rennes=False, compare_authors_rennes=False, authors_file_content_rennes=None,
+                        resume_run_rennes=True, scopus_api_key_secret_rennes=None):
+    """
+    Étapes 1 à 9 du traitement d'un laboratoire, exécutées en arrière-plan (voir jobs.py) : reporter y
+    remplace la barre de progression et les messages. Retourne les résultats et la table des auteurs OpenAlex.
+    """
+    # Points de reprise : une étape déjà terminée pour ce laboratoire et ces années n'est pas refaite
+    checkpoints_rennes = PipelineCheckpoints(
+        APP_NAME, resume=resume_run_rennes, collection=collection_a_chercher_rennes,
+        openalex_id=openalex_institution_id_rennes, openalex_raw=openalex_institution_raw_rennes,
+        pubmed_query=pubmed_query_labo_rennes, scopus_id=scopus_lab_id_rennes if scopus_api_key_secret_rennes else "",
+        start_year=int(start_year_rennes), end_year=int(end_year_rennes)
     )
 
-    labo_selectionne_details_rennes = labos_df_rennes_global[labos_df_rennes_global['collection'] == labo_choisi_nom_rennes].iloc[0]
-    collection_a_chercher_rennes = labo_selectionne_details_rennes['collection']
-    scopus_lab_id_rennes = labo_selectionne_details_rennes.get('scopus_id', '') 
-    openalex_institution_id_rennes = labo_selectionne_details_rennes.get('openalex_id', '')
-    openalex_institution_raw_rennes = labo_selectionne_details_rennes.get('openalex_raw', '') # ajout Laurent
-    pubmed_query_labo_rennes = labo_selectionne_details_rennes.get('pubmed_query', '')
-
-    scopus_api_key_secret_rennes = st.secrets.get("SCOPUS_API_KEY")
-    pubmed_api_key_secret_rennes = st.secrets.get("PUBMED_API_KEY")
-
-    col1_dates_rennes, col2_dates_rennes = st.columns(2)
-    with col1_dates_rennes:
-        start_year_rennes = st.number_input("Année de début", min_value=1900, max_value=2100, value=2020, key="rennes_start_year")
-    with col2_dates_rennes:
-        end_year_rennes = st.number_input("Année de fin", min_value=1900, max_value=2100, value=pd.Timestamp.now().year, key="rennes_end_year")
-
-    with st.expander("🔧 Options avancées pour les auteurs"):
-        fetch_authors_rennes = st.checkbox("🧑‍🔬 Récupérer les auteurs via Crossref (peut ralentir)", value=False, key="rennes_fetch_authors_cb")
-        compare_authors_rennes = False
-        uploaded_authors_file_rennes = None
-        if fetch_authors_rennes:
-            compare_authors_rennes = st.checkbox("🔍 Comparer les auteurs avec une liste de chercheurs", value=False, key="rennes_compare_authors_cb")
-            if compare_authors_rennes:
-                uploaded_authors_file_rennes = st.file_uploader(
-                    "📤 Téléversez un fichier CSV de chercheurs (colonnes: 'collection', 'prénom nom')", 
-                    type=["csv"], 
-                    key="rennes_upload_authors_fu",
-                    help="Le fichier CSV doit avoir une colonne 'collection' (code de la collection HAL) et une colonne avec les noms des chercheurs."
-                )
-    
-    progress_bar_rennes = st.progress(0)
-    progress_text_area_rennes = st.empty() # Correction: Suffixe _rennes ajouté
-
-    if st.button(f"🚀 Lancer la recherche pour {collection_a_chercher_rennes}"):
-        if pubmed_api_key_secret_rennes and pubmed_query_labo_rennes:
-            os.environ['NCBI_API_KEY'] = pubmed_api_key_secret_rennes
-
+    sources_checkpoint_rennes = checkpoints_rennes.stage("sources")
+    resumed_sources_rennes = sources_checkpoint_rennes.load()
+    if resumed_sources_rennes is not None:
+        final_merged_data_rennes, openalex_authorships_rennes = resumed_sources_rennes
+        reporter.info(f"Reprise : {len(final_merged_data_rennes)} publications uniques déjà récupérées et fusionnées (étapes 1 à 5).")
+    else:
         scopus_df_rennes = pd.DataFrame()
         openalex_df_rennes = pd.DataFrame()
         pubmed_df_rennes = pd.DataFrame()
+        openalex_authorships_rennes = {} # DOI -> auteurs/affiliations OpenAlex, pour l'export HAL-TEI
+        source_failures_rennes = [] # erreurs de moissonnage : sources incomplètes, étape non enregistrée
 
         # --- Étape 1 : Récupération OpenAlex ---
         if openalex_institution_id_rennes:
-            with st.spinner(f"Récupération OpenAlex pour {collection_a_chercher_rennes}..."):
-                progress_text_area_rennes.info("Étape 1/9 : Récupération des données OpenAlex...") # Corrigé
-                progress_bar_rennes.progress(5) # Corrigé
+            with reporter.spinner(f"Récupération OpenAlex pour {collection_a_chercher_rennes}..."):
+                reporter.step("Étape 1/9 : Récupération des données OpenAlex...") # Corrigé
+                reporter.progress(5) # Corrigé
                 openalex_query_complet_rennes = f"authorships.institutions.id:{openalex_institution_id_rennes},publication_year:{start_year_rennes}-{end_year_rennes}"
-                openalex_data_rennes = get_openalex_data(openalex_query_complet_rennes, max_items=5000)
+                openalex_data_rennes = harvest_openalex(openalex_query_complet_rennes, max_items=5000, refresh=not resume_run_rennes, messages_st=reporter,
+                                                        failures=source_failures_rennes)
                 if openalex_data_rennes:
+                    openalex_authorships_rennes.update(build_openalex_authorship_table(openalex_data_rennes))
                     openalex_df_rennes = convert_to_dataframe(openalex_data_rennes, 'openalex')
                     openalex_df_rennes['Source title'] = openalex_df_rennes.apply(
                         lambda row: row.get('primary_location', {}).get('source', {}).get('display_name') if isinstance(row.get('primary_location'), dict) and row['primary_location'].get('source') else None, axis=1
@@ -242,16 +228,18 @@ def main():
                     openalex_df_rennes = openalex_df_rennes[[col for col in cols_to_keep_rennes if col in openalex_df_rennes.columns]]
                     if 'doi' in openalex_df_rennes.columns:
                         openalex_df_rennes['doi'] = openalex_df_rennes['doi'].apply(clean_doi)
-                st.success(f"{len(openalex_df_rennes)} publications OpenAlex trouvées pour {collection_a_chercher_rennes}.")
-        progress_bar_rennes.progress(10) # Corrigé
+                reporter.success(f"{len(openalex_df_rennes)} publications OpenAlex trouvées pour {collection_a_chercher_rennes}.")
+        reporter.progress(10) # Corrigé
 
         if openalex_institution_raw_rennes:
-            with st.spinner(f"Récupération OpenAlex pour {collection_a_chercher_rennes}..."):
-                progress_text_area_rennes.info("Étape 1/9 : Récupération des données OpenAlex...") # Corrigé
-                progress_bar_rennes.progress(5) # Corrigé
+            with reporter.spinner(f"Récupération OpenAlex pour {collection_a_chercher_rennes}..."):
+                reporter.step("Étape 1/9 : Récupération des données OpenAlex...") # Corrigé
+                reporter.progress(5) # Corrigé
                 openalex_query_complet_rennes = f"raw_affiliation_strings.search:{openalex_institution_raw_rennes},publication_year:{start_year_rennes}-{end_year_rennes}"
-                openalex_data_rennes = get_openalex_data(openalex_query_complet_rennes, max_items=5000)
+                openalex_data_rennes = harvest_openalex(openalex_query_complet_rennes, max_items=5000, refresh=not resume_run_rennes, messages_st=reporter,
+                                                        failures=source_failures_rennes)
                 if openalex_data_rennes:
+                    openalex_authorships_rennes.update(build_openalex_authorship_table(openalex_data_rennes))
                     openalex_df_rennes = convert_to_dataframe(openalex_data_rennes, 'openalex')
                     openalex_df_rennes['Source title'] = openalex_df_rennes.apply(
                         lambda row: row.get('primary_location', {}).get('source', {}).get('display_name') if isinstance(row.get('primary_location'), dict) and row['primary_location'].get('source') else None, axis=1
@@ -264,30 +252,32 @@ def main():
                     openalex_df_rennes = openalex_df_rennes[[col for col in cols_to_keep_rennes if col in openalex_df_rennes.columns]]
                     if 'doi' in openalex_df_rennes.columns:
                         openalex_df_rennes['doi'] = openalex_df_rennes['doi'].apply(clean_doi)
-                st.success(f"{len(openalex_df_rennes)} publications OpenAlex trouvées pour {collection_a_chercher_rennes}.")
-        progress_bar_rennes.progress(10) # Corrigé
+                reporter.success(f"{len(openalex_df_rennes)} publications OpenAlex trouvées pour {collection_a_chercher_rennes}.")
+        reporter.progress(10) # Corrigé
 
         # --- Étape 2 : Récupération PubMed ---
         if pubmed_query_labo_rennes: 
-            with st.spinner(f"Récupération PubMed pour {collection_a_chercher_rennes}..."):
-                progress_text_area_rennes.info("Étape 2/9 : Récupération des données PubMed...") # Corrigé
-                progress_bar_rennes.progress(20) # Corrigé (ajusté pour être après l'info)
+            with reporter.spinner(f"Récupération PubMed pour {collection_a_chercher_rennes}..."):
+                reporter.step("Étape 2/9 : Récupération des données PubMed...") # Corrigé
+                reporter.progress(20) # Corrigé (ajusté pour être après l'info)
                 pubmed_full_query_rennes = f"({pubmed_query_labo_rennes}) AND ({start_year_rennes}/01/01[Date - Publication] : {end_year_rennes}/12/31[Date - Publication])"
-                pubmed_data_rennes = get_pubmed_data(pubmed_full_query_rennes, max_items=5000)
+                pubmed_data_rennes = harvest_pubmed(pubmed_full_query_rennes, max_items=5000, refresh=not resume_run_rennes, messages_st=reporter,
+                                                    failures=source_failures_rennes)
                 if pubmed_data_rennes:
                     pubmed_df_rennes = pd.DataFrame(pubmed_data_rennes)
-                st.success(f"{len(pubmed_df_rennes)} publications PubMed trouvées pour {collection_a_chercher_rennes}.")
+                reporter.success(f"{len(pubmed_df_rennes)} publications PubMed trouvées pour {collection_a_chercher_rennes}.")
         else:
-            st.info(f"Aucune requête PubMed configurée pour {collection_a_chercher_rennes}.")
-        progress_bar_rennes.progress(20) # Corrigé (ou 25 si on veut marquer la fin de l'étape)
+            reporter.info(f"Aucune requête PubMed configurée pour {collection_a_chercher_rennes}.")
+        reporter.progress(20) # Corrigé (ou 25 si on veut marquer la fin de l'étape)
 
         # --- Étape 3 : Récupération Scopus ---
         if scopus_lab_id_rennes and scopus_api_key_secret_rennes:
-            with st.spinner(f"Récupération Scopus pour {collection_a_chercher_rennes}..."):
-                progress_text_area_rennes.info("Étape 3/9 : Récupération des données Scopus...") # Corrigé
-                progress_bar_rennes.progress(25) # Corrigé (ajusté)
+            with reporter.spinner(f"Récupération Scopus pour {collection_a_chercher_rennes}..."):
+                reporter.step("Étape 3/9 : Récupération des données Scopus...") # Corrigé
+                reporter.progress(25) # Corrigé (ajusté)
                 scopus_query_complet_rennes = f"AF-ID({scopus_lab_id_rennes}) AND PUBYEAR > {start_year_rennes - 1} AND PUBYEAR < {end_year_rennes + 1}"
-                scopus_data_rennes = get_scopus_data(scopus_api_key_secret_rennes, scopus_query_complet_rennes, max_items=5000)
+                scopus_data_rennes = harvest_scopus(scopus_api_key_secret_rennes, scopus_query_complet_rennes, max_items=5000, refresh=not resume_run_rennes, messages_st=reporter,
+                                                    failures=source_failures_rennes)
                 if scopus_data_rennes:
                     scopus_df_raw_rennes = convert_to_dataframe(scopus_data_rennes, 'scopus')
                     required_scopus_cols_rennes = {'dc:title', 'prism:doi', 'dc:identifier', 'prism:publicationName', 'prism:coverDate'}
@@ -297,34 +287,33 @@ def main():
                         if 'doi' in scopus_df_rennes.columns:
                             scopus_df_rennes['doi'] = scopus_df_rennes['doi'].apply(clean_doi)
                     else:
-                        st.warning(f"Données Scopus incomplètes pour {collection_a_chercher_rennes}. Scopus sera ignoré.")
+                        reporter.warning(f"Données Scopus incomplètes pour {collection_a_chercher_rennes}. Scopus sera ignoré.")
                         scopus_df_rennes = pd.DataFrame()
-                st.success(f"{len(scopus_df_rennes)} publications Scopus trouvées pour {collection_a_chercher_rennes}.")
+                reporter.success(f"{len(scopus_df_rennes)} publications Scopus trouvées pour {collection_a_chercher_rennes}.")
         elif scopus_lab_id_rennes and not scopus_api_key_secret_rennes:
-            st.warning(f"L'ID Scopus est fourni pour {collection_a_chercher_rennes} mais la clé API Scopus n'est pas configurée. Scopus sera ignoré.")
-        progress_bar_rennes.progress(30) # Corrigé
-        
+            reporter.warning(f"L'ID Scopus est fourni pour {collection_a_chercher_rennes} mais la clé API Scopus n'est pas configurée. Scopus sera ignoré.")
+        reporter.progress(30) # Corrigé
+    
         # --- Étape 4 : Combinaison des données ---
-        progress_text_area_rennes.info("Étape 4/9 : Combinaison des données sources...") # Corrigé
+        reporter.step("Étape 4/9 : Combinaison des données sources...") # Corrigé
         combined_df_rennes = pd.concat([scopus_df_rennes, openalex_df_rennes, pubmed_df_rennes], ignore_index=True)
 
         if combined_df_rennes.empty:
-            st.error(f"Aucune publication récupérée pour {collection_a_chercher_rennes}. Vérifiez la configuration du laboratoire.")
-            st.stop()
-        
+            raise JobError(f"Aucune publication récupérée pour {collection_a_chercher_rennes}. Vérifiez la configuration du laboratoire.")
+    
         if 'doi' not in combined_df_rennes.columns:
             combined_df_rennes['doi'] = pd.NA
         combined_df_rennes['doi'] = combined_df_rennes['doi'].astype(str).str.lower().str.strip().replace(['nan', 'none', 'NaN', ''], pd.NA, regex=False)
 
 
         # --- Étape 5 : Fusion des lignes en double ---
-        progress_text_area_rennes.info("Étape 5/9 : Fusion des doublons...") # Corrigé
-        progress_bar_rennes.progress(40) # Corrigé
-        
+        reporter.step("Étape 5/9 : Fusion des doublons...") # Corrigé
+        reporter.progress(40) # Corrigé
+    
         with_doi_df_rennes = combined_df_rennes[combined_df_rennes['doi'].notna()].copy()
         without_doi_df_rennes = combined_df_rennes[combined_df_rennes['doi'].isna()].copy()
-        
-        
+    
+    
         merged_data_doi_rennes = pd.DataFrame()
         if not with_doi_df_rennes.empty:
             merged_data_doi_rennes = with_doi_df_rennes.groupby('doi', as_index=False).apply(merge_rows_with_sources)
@@ -332,132 +321,238 @@ def main():
                 merged_data_doi_rennes.reset_index(inplace=True)
             if isinstance(merged_data_doi_rennes.columns, pd.MultiIndex):
                  merged_data_doi_rennes.columns = merged_data_doi_rennes.columns.droplevel(0)
-        
-       
+    
+   
         merged_data_no_doi_rennes = pd.DataFrame()
         if not without_doi_df_rennes.empty:
             merged_data_no_doi_rennes = without_doi_df_rennes.copy() 
-        
-       
+    
+   
         final_merged_data_rennes = pd.concat([merged_data_doi_rennes, merged_data_no_doi_rennes], ignore_index=True)
 
         if final_merged_data_rennes.empty:
-            st.error(f"Aucune donnée après fusion pour {collection_a_chercher_rennes}.")
-            st.stop()
-        st.success(f"{len(final_merged_data_rennes)} publications uniques après fusion pour {collection_a_chercher_rennes}.")
-        progress_bar_rennes.progress(50) # Corrigé
-
-        # --- Étape 6 : Comparaison HAL ---
+            raise JobError(f"Aucune donnée après fusion pour {collection_a_chercher_rennes}.")
+        reporter.success(f"{len(final_merged_data_rennes)} publications uniques après fusion pour {collection_a_chercher_rennes}.")
+        sources_checkpoint_rennes.save((final_merged_data_rennes, openalex_authorships_rennes),
+                                       is_final=not source_failures_rennes)
+    reporter.progress(50) # Corrigé
+
+    # --- Étape 6 : Comparaison HAL ---
+    hal_checkpoint_rennes = checkpoints_rennes.stage("hal")
+    result_df_rennes = hal_checkpoint_rennes.load()
+    if result_df_rennes is not None:
+        reporter.info(f"Reprise : comparaison HAL pour {collection_a_chercher_rennes} déjà effectuée.")
+    else:
         coll_df_hal_rennes = pd.DataFrame()
-        with st.spinner(f"Importation de la collection HAL '{collection_a_chercher_rennes}'..."):
-            progress_text_area_rennes.info(f"Étape 6a/9 : Importation de la collection HAL '{collection_a_chercher_rennes}'...") # Corrigé
-            coll_importer_rennes_obj = HalCollImporter(collection_a_chercher_rennes, start_year_rennes, end_year_rennes)
-            coll_df_hal_rennes = coll_importer_rennes_obj.import_data()
+        hal_failures_rennes = [] # erreurs d'import ou de vérification HAL : statuts par défaut, étape non enregistrée
+        with reporter.spinner(f"Importation de la collection HAL '{collection_a_chercher_rennes}'..."):
+            reporter.step(f"Étape 6a/9 : Importation de la collection HAL '{collection_a_chercher_rennes}'...") # Corrigé
+            coll_df_hal_rennes, coll_titles_df_rennes = import_hal_collection(
+                collection_a_chercher_rennes, start_year_rennes, end_year_rennes,
+                progress_bar_st=reporter, refresh=not resume_run_rennes, messages_st=reporter,
+                failures=hal_failures_rennes)
             if coll_df_hal_rennes.empty:
-                st.warning(f"Collection HAL '{collection_a_chercher_rennes}' vide ou non chargée.")
+                reporter.warning(f"Collection HAL '{collection_a_chercher_rennes}' vide ou non chargée.")
+            else:
+                reporter.success(f"{len(coll_df_hal_rennes)} notices HAL pour {collection_a_chercher_rennes}.")
+    
+        reporter.step("Étape 6b/9 : Comparaison avec les données HAL...") # Corrigé
+        result_df_rennes = check_df(final_merged_data_rennes.copy(), coll_df_hal_rennes, progress_bar_st=reporter, progress_text_st=reporter, collection_code=collection_a_chercher_rennes, hal_titles_df=coll_titles_df_rennes, messages_st=reporter, failures=hal_failures_rennes) # Passé les bons objets
+        reporter.success(f"Comparaison HAL pour {collection_a_chercher_rennes} terminée.")
+        hal_checkpoint_rennes.save(result_df_rennes, is_final=not hal_failures_rennes)
+    # progress_bar_rennes est géré par check_df
+
+    # --- Étape 7 : Enrichissement Unpaywall ---
+    # (à la reprise d'une étape interrompue, seuls les DOI pas encore traités sont interrogés)
+    upw_checkpoint_rennes = checkpoints_rennes.stage("unpaywall", shared_rows=True)
+    upw_df_rennes = upw_checkpoint_rennes.load()
+    if upw_df_rennes is not None:
+        result_df_rennes = upw_df_rennes
+        reporter.info(f"Reprise : enrichissement Unpaywall pour {collection_a_chercher_rennes} déjà effectué.")
+    else:
+        with reporter.spinner(f"Enrichissement Unpaywall pour {collection_a_chercher_rennes}..."):
+            reporter.step("Étape 7/9 : Enrichissement Unpaywall...") # Corrigé
+            reporter.progress(70) # Corrigé (ajouté avant l'appel)
+            upw_failures_rennes = []
+            result_df_rennes = enrich_w_upw_parallel(result_df_rennes.copy(), checkpoint=upw_checkpoint_rennes, messages_st=reporter,
+                                                     failures=upw_failures_rennes)
+            upw_checkpoint_rennes.save(result_df_rennes, is_final=not upw_failures_rennes)
+            reporter.success(f"Enrichissement Unpaywall pour {collection_a_chercher_rennes} terminé.")
+    # reporter.progress(70) # Déplacé avant l'appel
+
+    # --- Étape 8 : Permissions de dépôt ---
+    permissions_checkpoint_rennes = checkpoints_rennes.stage("permissions", shared_rows=True)
+    permissions_df_rennes = permissions_checkpoint_rennes.load()
+    if permissions_df_rennes is not None:
+        result_df_rennes = permissions_df_rennes
+        reporter.info(f"Reprise : permissions pour {collection_a_chercher_rennes} déjà récupérées.")
+    else:
+        with reporter.spinner(f"Récupération des permissions pour {collection_a_chercher_rennes}..."):
+            reporter.step("Étape 8/9 : Récupération des permissions de dépôt...") # Corrigé
+            reporter.progress(80) # Corrigé (ajouté avant l'appel)
+            permissions_failures_rennes = []
+            result_df_rennes = add_permissions_parallel(result_df_rennes.copy(), checkpoint=permissions_checkpoint_rennes, messages_st=reporter,
+                                                        failures=permissions_failures_rennes)
+            permissions_checkpoint_rennes.save(result_df_rennes, is_final=not permissions_failures_rennes)
+            reporter.success(f"Permissions pour {collection_a_chercher_rennes} récupérées.")
+    # reporter.progress(80) # Déplacé avant l'appel
+
+    # --- Étape 9 : Déduction des actions et auteurs ---
+    reporter.step("Étape 9/9 : Déduction des actions et traitement des auteurs...") # Corrigé
+    if 'Action' not in result_df_rennes.columns: result_df_rennes['Action'] = pd.NA
+    result_df_rennes['Action'] = result_df_rennes.apply(deduce_todo, axis=1)
+
+    if fetch_authors_rennes: 
+        with reporter.spinner(f"Récupération des auteurs Crossref pour {collection_a_chercher_rennes}..."):
+            if 'doi' in result_df_rennes.columns:
+                authors_checkpoint_rennes = checkpoints_rennes.stage("crossref_authors", shared_rows=True)
+                authors_results_rennes = authors_checkpoint_rennes.load()
+                if authors_results_rennes is None:
+                    authors_failures_rennes = []
+                    authors_results_rennes = get_authors_from_crossref_parallel(result_df_rennes['doi'].tolist(), checkpoint=authors_checkpoint_rennes,
+                                                                                failures=authors_failures_rennes)
+                    authors_checkpoint_rennes.save(authors_results_rennes, is_final=not authors_failures_rennes)
+
+                result_df_rennes['Auteurs_Crossref'] = ['; '.join(author_l) if isinstance(author_l, list) and not any("Erreur" in str(a) or "Timeout" in str(a) for a in author_l) else (author_l[0] if isinstance(author_l, list) and author_l else '') for author_l in authors_results_rennes]
+                reporter.success(f"Auteurs Crossref pour {collection_a_chercher_rennes} récupérés.")
             else:
-                st.success(f"{len(coll_df_hal_rennes)} notices HAL pour {collection_a_chercher_rennes}.")
+                reporter.warning("Colonne 'doi' non trouvée, impossible de récupérer les auteurs pour la version rennes.")
+                result_df_rennes['Auteurs_Crossref'] = ''
         
-        progress_text_area_rennes.info("Étape 6b/9 : Comparaison avec les données HAL...") # Corrigé
-        result_df_rennes = check_df(final_merged_data_rennes.copy(), coll_df_hal_rennes, progress_bar_st=progress_bar_rennes, progress_text_st=progress_text_area_rennes) # Passé les bons objets
-        st.success(f"Comparaison HAL pour {collection_a_chercher_rennes} terminée.")
-        # progress_bar_rennes est géré par check_df
-
-        # --- Étape 7 : Enrichissement Unpaywall ---
-        with st.spinner(f"Enrichissement Unpaywall pour {collection_a_chercher_rennes}..."):
-            progress_text_area_rennes.info("Étape 7/9 : Enrichissement Unpaywall...") # Corrigé
-            progress_bar_rennes.progress(70) # Corrigé (ajouté avant l'appel)
-            result_df_rennes = enrich_w_upw_parallel(result_df_rennes.copy())
-            st.success(f"Enrichissement Unpaywall pour {collection_a_chercher_rennes} terminé.")
-        # progress_bar_rennes.progress(70) # Déplacé avant l'appel
-
-        # --- Étape 8 : Permissions de dépôt ---
-        with st.spinner(f"Récupération des permissions pour {collection_a_chercher_rennes}..."):
-            progress_text_area_rennes.info("Étape 8/9 : Récupération des permissions de dépôt...") # Corrigé
-            progress_bar_rennes.progress(80) # Corrigé (ajouté avant l'appel)
-            result_df_rennes = add_permissions_parallel(result_df_rennes.copy())
-            st.success(f"Permissions pour {collection_a_chercher_rennes} récupérées.")
-        # progress_bar_rennes.progress(80) # Déplacé avant l'appel
-
-        # --- Étape 9 : Déduction des actions et auteurs ---
-        progress_text_area_rennes.info("Étape 9/9 : Déduction des actions et traitement des auteurs...") # Corrigé
-        if 'Action' not in result_df_rennes.columns: result_df_rennes['Action'] = pd.NA
-        result_df_rennes['Action'] = result_df_rennes.apply(deduce_todo, axis=1)
-
-        if fetch_authors_rennes: 
-            with st.spinner(f"Récupération des auteurs Crossref pour {collection_a_chercher_rennes}..."):
-                if 'doi' in result_df_rennes.columns:
-                    from concurrent.futures import ThreadPoolExecutor 
-                    from tqdm import tqdm 
-
-                    dois_for_authors_rennes = result_df_rennes['doi'].fillna("").tolist()
-                    authors_results_rennes = []
-                    with ThreadPoolExecutor(max_workers=10) as executor:
-                        authors_results_rennes = list(tqdm(executor.map(get_authors_from_crossref, dois_for_authors_rennes), total=len(dois_for_authors_rennes), desc="Auteurs Crossref (rennes)"))
-                    
-                    result_df_rennes['Auteurs_Crossref'] = ['; '.join(author_l) if isinstance(author_l, list) and not any("Erreur" in str(a) or "Timeout" in str(a) for a in author_l) else (author_l[0] if isinstance(author_l, list) and author_l else '') for author_l in authors_results_rennes]
-                    st.success(f"Auteurs Crossref pour {collection_a_chercher_rennes} récupérés.")
-                else:
-                    st.warning("Colonne 'doi' non trouvée, impossible de récupérer les auteurs pour la version rennes.")
-                    result_df_rennes['Auteurs_Crossref'] = ''
-            
-            if compare_authors_rennes and uploaded_authors_file_rennes:
-                with st.spinner(f"Comparaison des auteurs (fichier) pour {collection_a_chercher_rennes}..."):
-                    try:
-                        user_authors_df_rennes_file = pd.read_csv(uploaded_authors_file_rennes)
-                        if not ({'collection', user_authors_df_rennes_file.columns[1]} <= set(user_authors_df_rennes_file.columns)):
-                            st.error("Fichier CSV auteurs mal formaté pour la version rennes.")
+        if compare_authors_rennes and authors_file_content_rennes:
+            with reporter.spinner(f"Comparaison des auteurs (fichier) pour {collection_a_chercher_rennes}..."):
+                try:
+                    user_authors_df_rennes_file = pd.read_csv(io.BytesIO(authors_file_content_rennes))
+                    if not ({'collection', user_authors_df_rennes_file.columns[1]} <= set(user_authors_df_rennes_file.columns)):
+                        reporter.error("Fichier CSV auteurs mal formaté pour la version rennes.")
+                    else:
+                        author_name_col_rennes_file = user_authors_df_rennes_file.columns[1]
+                        noms_ref_rennes_list = user_authors_df_rennes_file[user_authors_df_rennes_file["collection"].astype(str).str.lower() == str(collection_a_chercher_rennes).lower()][author_name_col_rennes_file].dropna().unique().tolist()
+                        if not noms_ref_rennes_list:
+                            reporter.warning(f"Aucun chercheur pour '{collection_a_chercher_rennes}' dans le fichier fourni (rennes).")
                         else:
-                            author_name_col_rennes_file = user_authors_df_rennes_file.columns[1]
-                            noms_ref_rennes_list = user_authors_df_rennes_file[user_authors_df_rennes_file["collection"].astype(str).str.lower() == str(collection_a_chercher_rennes).lower()][author_name_col_rennes_file].dropna().unique().tolist()
-                            if not noms_ref_rennes_list:
-                                st.warning(f"Aucun chercheur pour '{collection_a_chercher_rennes}' dans le fichier fourni (rennes).")
-                            else:
-                                chercheur_map_rennes_file = {normalize_name(n): n for n in noms_ref_rennes_list}
-                                initial_map_rennes_file = {get_initial_form(normalize_name(n)): n for n in noms_ref_rennes_list}
-                                from difflib import get_close_matches 
-
-                                def detect_known_authors_rennes_file(authors_str_rennes):
-                                    if pd.isna(authors_str_rennes) or not str(authors_str_rennes).strip() or "Erreur" in authors_str_rennes or "Timeout" in authors_str_rennes: return ""
-                                    authors_pub_rennes = [a.strip() for a in str(authors_str_rennes).split(';') if a.strip()]
-                                    detectes_originaux_rennes = set()
-                                    for author_o_rennes in authors_pub_rennes:
-                                        author_n_rennes = normalize_name(author_o_rennes)
-                                        author_i_n_rennes = get_initial_form(author_n_rennes)
-                                        match_c_rennes = get_close_matches(author_n_rennes, chercheur_map_rennes_file.keys(), n=1, cutoff=0.85)
-                                        if match_c_rennes:
-                                            detectes_originaux_rennes.add(chercheur_map_rennes_file[match_c_rennes[0]])
-                                            continue
-                                        match_i_rennes = get_close_matches(author_i_n_rennes, initial_map_rennes_file.keys(), n=1, cutoff=0.9)
-                                        if match_i_rennes:
-                                            detectes_originaux_rennes.add(initial_map_rennes_file[match_i_rennes[0]])
-                                    return "; ".join(sorted(list(detectes_originaux_rennes))) if detectes_originaux_rennes else ""
-                                result_df_rennes['Auteurs_Laboratoire_Détectés'] = result_df_rennes['Auteurs_Crossref'].apply(detect_known_authors_rennes_file)
-                                st.success(f"Comparaison auteurs (fichier) pour {collection_a_chercher_rennes} terminée.")
-                    except Exception as e_auth_file_rennes_exc:
-                        st.error(f"Erreur fichier auteurs (rennes): {e_auth_file_rennes_exc}")
-            elif compare_authors_rennes and not uploaded_authors_file_rennes:
-                 st.warning("Veuillez téléverser un fichier CSV de chercheurs pour la comparaison des auteurs (rennes).")
-
-        progress_bar_rennes.progress(90) # Corrigé
-        st.success(f"Déduction des actions et traitement des auteurs pour {collection_a_chercher_rennes} terminés.")
-        
-        st.dataframe(result_df_rennes)
-
-        # --- Export CSV classique ---
-        if not result_df_rennes.empty:
-            csv_export_rennes_data = result_df_rennes.to_csv(index=False, encoding='utf-8-sig')
-            output_filename_rennes_final = f"c2LabHAL_resultats_{collection_a_chercher_rennes.replace(' ', '_')}_{start_year_rennes}-{end_year_rennes}.csv"
+                            result_df_rennes['Auteurs_Laboratoire_Détectés'] = KnownAuthorDetector(noms_ref_rennes_list).detect_all(result_df_rennes['Auteurs_Crossref'])
+                            reporter.success(f"Comparaison auteurs (fichier) pour {collection_a_chercher_rennes} terminée.")
+                except Exception as e_auth_file_rennes_exc:
+                    reporter.error(f"Erreur fichier auteurs (rennes): {e_auth_file_rennes_exc}")
+        elif compare_authors_rennes and not authors_file_content_rennes:
+             reporter.warning("Veuillez téléverser un fichier CSV de chercheurs pour la comparaison des auteurs (rennes).")
+
+    reporter.progress(90) # Corrigé
+    reporter.success(f"Déduction des actions et traitement des auteurs pour {collection_a_chercher_rennes} terminés.")
+    result_df_rennes = render_deposit_conditions(result_df_rennes)
+
+    # Exports écrits une seule fois dans les fichiers du job : le résultat n'en garde que les chemins
+    reporter.step(f"Préparation des exports pour {collection_a_chercher_rennes} (CSV, notices HAL-TEI)...")
+    deposit_publications_rennes = build_deposit_publications(result_df_rennes, openalex_authorships_rennes)
+    csv_export_rennes = None
+    if not result_df_rennes.empty:
+        csv_export_rennes = write_csv_export(result_df_rennes, reporter.export_path("resultats.csv"),
+                                             index=False, encoding='utf-8-sig')
+    tei_zip_export_rennes = None
+    if deposit_publications_rennes:
+        tei_zip_export_rennes = generate_zip_from_xmls(deposit_publications_rennes,
+                                                       output=reporter.export_path("notices_tei.zip"))
+    checkpoints_rennes.finish()
+    return {"result_df": result_df_rennes, "collection": collection_a_chercher_rennes,
+            "export_name": f"{collection_a_chercher_rennes.replace(' ', '_')}_{start_year_rennes}-{end_year_rennes}",
+            "csv_export": csv_export_rennes, "tei_zip_export": tei_zip_export_rennes,
+            "tei_count": len(deposit_publications_rennes)}
+
+
+def show_results_rennes(result):
+    """Tableau et exports (CSV, notices HAL-TEI) d'un traitement terminé."""
+    result_df_rennes = result["result_df"]
+    collection_rennes = result["collection"]
+    st.dataframe(result_df_rennes)
+
+    # --- Export CSV classique ---
+    if result.get("csv_export") is not None:
+        output_filename_rennes_final = f"c2LabHAL_resultats_{result['export_name']}.csv"
+        with open(result["csv_export"], "rb") as csv_file_rennes:
             st.download_button(
-                label=f"📥 Télécharger les résultats pour {collection_a_chercher_rennes}",
-                data=csv_export_rennes_data,
+                label=f"📥 Télécharger les résultats pour {collection_rennes}",
+                data=csv_file_rennes,
                 file_name=output_filename_rennes_final,
                 mime="text/csv",
-                key=f"download_rennes_{collection_a_chercher_rennes}"
+                key=f"download_rennes_{collection_rennes}"
+            )
+
+    if result.get("tei_zip_export") is not None:
+        with open(result["tei_zip_export"], "rb") as zip_file_rennes:
+            st.download_button(
+                label=f"📦 Télécharger les notices HAL-TEI à créer ({result['tei_count']})",
+                data=zip_file_rennes,
+                file_name=f"c2LabHAL_TEI_{result['export_name']}.zip",
+                mime="application/zip",
+                key=f"download_tei_rennes_{collection_rennes}"
             )
 
-        progress_bar_rennes.progress(100)
-        progress_text_area_rennes.success(f"🎉 Traitement pour {collection_a_chercher_rennes} terminé avec succès !")
+
+def main():
+    st.set_page_config(page_title="c2LabHAL - Rennes", layout="wide")
+    add_sidebar_menu() 
+
+    st.title("🥎 c2LabHAL - Version Université de Rennes")
+    st.subheader("Comparez les publications d’un laboratoire de l'Université de Rennes avec sa collection HAL")
+
+    labo_choisi_nom_rennes = st.selectbox(
+        "Choisissez une collection HAL de laboratoire (Université de Rennes) :", 
+        sorted(labos_df_rennes_global['collection'].unique())
+    )
+
+    labo_selectionne_details_rennes = labos_df_rennes_global[labos_df_rennes_global['collection'] == labo_choisi_nom_rennes].iloc[0]
+    collection_a_chercher_rennes = labo_selectionne_details_rennes['collection']
+    scopus_lab_id_rennes = labo_selectionne_details_rennes.get('scopus_id', '') 
+    openalex_institution_id_rennes = labo_selectionne_details_rennes.get('openalex_id', '')
+    openalex_institution_raw_rennes = labo_selectionne_details_rennes.get('openalex_raw', '') # ajout Laurent
+    pubmed_query_labo_rennes = labo_selectionne_details_rennes.get('pubmed_query', '')
+
+    scopus_api_key_secret_rennes = st.secrets.get("SCOPUS_API_KEY")
+    pubmed_api_key_secret_rennes = st.secrets.get("PUBMED_API_KEY")
+
+    col1_dates_rennes, col2_dates_rennes = st.columns(2)
+    with col1_dates_rennes:
+        start_year_rennes = st.number_input("Année de début", min_value=1900, max_value=2100, value=2020, key="rennes_start_year")
+    with col2_dates_rennes:
+        end_year_rennes = st.number_input("Année de fin", min_value=1900, max_value=2100, value=pd.Timestamp.now().year, key="rennes_end_year")
+
+    with st.expander("🔧 Options avancées pour les auteurs"):
+        fetch_authors_rennes = st.checkbox("🧑‍🔬 Récupérer les auteurs via Crossref (peut ralentir)", value=False, key="rennes_fetch_authors_cb")
+        compare_authors_rennes = False
+        uploaded_authors_file_rennes = None
+        if fetch_authors_rennes:
+            compare_authors_rennes = st.checkbox("🔍 Comparer les auteurs avec une liste de chercheurs", value=False, key="rennes_compare_authors_cb")
+            if compare_authors_rennes:
+                uploaded_authors_file_rennes = st.file_uploader(
+                    "📤 Téléversez un fichier CSV de chercheurs (colonnes: 'collection', 'prénom nom')", 
+                    type=["csv"], 
+                    key="rennes_upload_authors_fu",
+                    help="Le fichier CSV doit avoir une colonne 'collection' (code de la collection HAL) et une colonne avec les noms des chercheurs."
+                )
+    
+    resume_run_rennes = st.checkbox(
+        "♻️ Reprendre un traitement interrompu", value=True, key="rennes_resume_cb",
+        help="Si le dernier traitement pour ce laboratoire et ces années n'a pas abouti (moins de 24 h), ses étapes déjà terminées ne sont pas refaites. Un traitement abouti n'est jamais repris. Décochez pour tout recalculer."
+    )
+
+    if st.button(f"🚀 Lancer la recherche pour {collection_a_chercher_rennes}"):
+        if pubmed_api_key_secret_rennes and pubmed_query_labo_rennes:
+            os.environ['NCBI_API_KEY'] = pubmed_api_key_secret_rennes
+
+        submit_job(
+            APP_NAME, f"{collection_a_chercher_rennes} {start_year_rennes}-{end_year_rennes}", run_pipeline_rennes,
+            collection_a_chercher_rennes, openalex_institution_id_rennes, openalex_institution_raw_rennes,
+            pubmed_query_labo_rennes, scopus_lab_id_rennes, start_year_rennes, end_year_rennes,
+            fetch_authors_rennes=fetch_authors_rennes, compare_authors_rennes=compare_authors_rennes,
+            authors_file_content_rennes=uploaded_authors_file_rennes.getvalue() if uploaded_authors_file_rennes else None,
+            resume_run_rennes=resume_run_rennes, scopus_api_key_secret_rennes=scopus_api_key_secret_rennes
+        )
+
+    # Le traitement tourne en arrière-plan : plusieurs laboratoires peuvent être lancés à la suite,
+    # et une interaction avec la page ou un rechargement ne les interrompt pas
+    follow_job(APP_NAME, show_results_rennes)
+
 
 if __name__ == "__main__":
     main()
@@ -4,13 +4,15 @@ import requests
 import json
 from metapub import PubMedFetcher
 import regex as re
-from unidecode import unidecode
-import unicodedata
 from difflib import get_close_matches
 from langdetect import detect # Bien que non utilisé directement, gardé si une fonction importée en dépend
 from tqdm import tqdm 
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import namedtuple, OrderedDict
+from enum import IntEnum
+import threading
 import time
+from normalisation import normalise, normalise_many, normalize_name # mémoïsées, réexportées pour les applications
 
 tqdm.pandas()
 
@@ -18,6 +20,15 @@ tqdm.pandas()
 HAL_API_ENDPOINT = "http://api.archives-ouvertes.fr/search/"
 # Ajout de uri_s pour récupérer l'URL directe de la notice HAL
 HAL_FIELDS_TO_FETCH = "docid,doiId_s,title_s,submitType_s,linkExtUrl_s,linkExtId_s,uri_s"
+# Vérification groupée des DOI : collCode_s suffit à situer le dépôt par rapport à la collection
+HAL_DOI_PRESENCE_FIELDS = "docid,doiId_s,collCode_s,submitType_s,uri_s,title_s,linkExtUrl_s,linkExtId_s"
+HAL_DOI_CHUNK_SIZE = 50
+HAL_TITLE_ROWS = 5 # candidats évalués localement par recherche de titre
+HAL_TITLE_BATCH_SIZE = 10 # titres par requête groupée (in_hal_batch)
+HAL_TITLE_BATCH_ROWS = 100
+HAL_IMPORT_MAX_WORKERS = 4 # partitions (années) de collection importées en parallèle
+HAL_COLLECTION_COLUMNS = ['Hal_ids', 'DOIs', 'Titres', 'Types de dépôts', 'HAL Link', 'HAL Ext ID', 'HAL_URI']
+HAL_TITLES_COLUMNS = ['Titres', 'nti', 'doc_offset'] # doc_offset : position du document dans le DataFrame de collection
 DEFAULT_START_YEAR = 2018
 DEFAULT_END_YEAR = '*' 
 
@@ -27,25 +38,137 @@ SOLR_ESCAPE_RULES = {
     '~': r'\~', '*': r'\*', '?': r'\?', ':': r'\:', '"': r'\"'
 }
 
+# --- Statuts HAL ---
+# Les statuts sont manipulés en interne sous forme de codes entiers ; la colonne
+# Statut_HAL est une colonne catégorielle dont les libellés ne servent qu'à l'affichage/export.
+class StatutHAL(IntEnum):
+    DANS_COLLECTION = 0
+    HORS_COLLECTION = 1
+    TITRE_DANS_COLLECTION = 2
+    TITRE_APPROCHANT_COLLECTION = 3
+    TITRE_HORS_COLLECTION = 4
+    TITRE_APPROCHANT_HORS_COLLECTION = 5
+    HORS_HAL = 6
+    TITRE_INCORRECT = 7
+    PAS_DE_DOI = 8
+    TITRE_INVALIDE = 9
+    DONNEES_INSUFFISANTES = 10
+
+    @property
+    def label(self):
+        return STATUT_HAL_LABELS[self]
+
+STATUT_HAL_LABELS = {
+    StatutHAL.DANS_COLLECTION: "Dans la collection",
+    StatutHAL.HORS_COLLECTION: "Dans HAL mais hors de la collection",
+    StatutHAL.TITRE_DANS_COLLECTION: "Titre trouvé dans la collection : probablement déjà présent",
+    StatutHAL.TITRE_APPROCHANT_COLLECTION: "Titre approchant trouvé dans la collection : à vérifier",
+    StatutHAL.TITRE_HORS_COLLECTION: "Titre trouvé dans HAL mais hors de la collection : affiliation probablement à corriger",
+    StatutHAL.TITRE_APPROCHANT_HORS_COLLECTION: "Titre approchant trouvé dans HAL mais hors de la collection : vérifier les affiliations",
+    StatutHAL.HORS_HAL: "Hors HAL",
+    StatutHAL.TITRE_INCORRECT: "Titre incorrect, probablement absent de HAL",
+    StatutHAL.PAS_DE_DOI: "Pas de DOI valide",
+    StatutHAL.TITRE_INVALIDE: "Titre invalide",
+    StatutHAL.DONNEES_INSUFFISANTES: "Données d'entrée insuffisantes (ni DOI ni Titre)",
+}
+STATUT_HAL_CATEGORIES = [STATUT_HAL_LABELS[code] for code in StatutHAL]
+_STATUT_HAL_BY_LABEL = {label: code for code, label in STATUT_HAL_LABELS.items()}
+
+# --- Permissions de dépôt (OA.works) ---
+# Résultat structuré de l'API permissions ; le message lisible (deposit_condition)
+# n'est construit qu'à l'affichage/export par render_deposit_conditions.
+PermissionRecord = namedtuple(
+    'PermissionRecord', ['version', 'licence', 'embargo_months', 'archive', 'erreur', 'detail'],
+    defaults=("", "", None, False, None, "")
+)
+
+class ErreurPermission(IntEnum):
+    DOI_MANQUANT = 0
+    AUCUNE_PERMISSION = 1
+    DEPOT_NON_LISTE = 2
+    TIMEOUT = 3
+    NON_TROUVEE = 4
+    NON_APPLICABLE = 5
+    ERREUR_HTTP = 6
+    ERREUR_REQUETE = 7
+    ERREUR_JSON = 8
+
+ERREUR_PERMISSION_LABELS = {
+    ErreurPermission.DOI_MANQUANT: "DOI manquant",
+    ErreurPermission.AUCUNE_PERMISSION: "Aucune permission",
+    ErreurPermission.DEPOT_NON_LISTE: "Dépôt en archive non listé",
+    ErreurPermission.TIMEOUT: "Timeout",
+    ErreurPermission.NON_TROUVEE: "Non trouvé (404)",
+    ErreurPermission.NON_APPLICABLE: "Non applicable (501)",
+    ErreurPermission.ERREUR_HTTP: "Erreur HTTP",
+    ErreurPermission.ERREUR_REQUETE: "Erreur requête",
+    ErreurPermission.ERREUR_JSON: "Erreur JSON",
+}
+ERREUR_PERMISSION_CATEGORIES = [ERREUR_PERMISSION_LABELS[code] for code in ErreurPermission]
+_ERREUR_PERMISSION_BY_LABEL = {label: code for code, label in ERREUR_PERMISSION_LABELS.items()}
+_ERREURS_PERMISSION_TRANSITOIRES = (ErreurPermission.TIMEOUT, ErreurPermission.ERREUR_HTTP, ErreurPermission.ERREUR_REQUETE)
+
+PERMISSION_COLUMNS = ['permission_version', 'permission_licence', 'permission_embargo_mois',
+                      'permission_archive', 'permission_erreur', 'permission_detail']
+PERMISSIONS_CACHE_MAX_SIZE = 20000
+_PERMISSIONS_CACHE = OrderedDict() # doi -> PermissionRecord (hors erreurs transitoires), le plus ancien en tête
+_PERMISSIONS_CACHE_LOCK = threading.Lock() # add_permissions est appelé depuis plusieurs threads
+
+# Colonnes à faible cardinalité stockées en catégories (mémoire réduite, filtres/groupby rapides)
+CATEGORICAL_RESULT_COLUMNS = ['type_dépôt_si_trouvé', 'Statut Unpaywall', 'oa_status', 'Data source']
+
 # --- Fonctions Utilitaires ---
 
-def _display_long_warning(base_message, item_identifier, item_value, exception_details, max_len=70):
+def _display_long_warning(base_message, item_identifier, item_value, exception_details, max_len=70, messages_st=st):
     """
     Helper function to display a potentially long warning message with an expander.
+    messages_st reçoit les messages : st, ou le JobReporter d'un traitement en arrière-plan
+    (sans expander, le message complet est alors enregistré directement).
     """
     full_error_message = f"{base_message} pour {item_identifier} '{item_value}': {exception_details}"
     item_value_str = str(item_value) 
 
-    if len(item_value_str) > max_len:
+    if len(item_value_str) > max_len and hasattr(messages_st, "expander"):
         short_item_value = item_value_str[:max_len-3] + "..."
-        st.warning(f"{base_message} pour {item_identifier} '{short_item_value}' (détails ci-dessous).")
-        with st.expander("Voir les détails de l'erreur"):
-            st.error(full_error_message)
+        messages_st.warning(f"{base_message} pour {item_identifier} '{short_item_value}' (détails ci-dessous).")
+        with messages_st.expander("Voir les détails de l'erreur"):
+            messages_st.error(full_error_message)
     else:
-        st.warning(full_error_message)
+        messages_st.warning(full_error_message)
+
+
+def to_statut_hal(statut_value):
+    """Convertit un statut HAL (code ou libellé) en StatutHAL, ou None si inconnu."""
+    if isinstance(statut_value, StatutHAL):
+        return statut_value
+    if not isinstance(statut_value, str):
+        return None
+    return _STATUT_HAL_BY_LABEL.get(statut_value.strip())
+
+
+def to_erreur_permission(erreur_value):
+    """Convertit une erreur de permission (code ou libellé) en ErreurPermission, ou None."""
+    if isinstance(erreur_value, ErreurPermission):
+        return erreur_value
+    if not isinstance(erreur_value, str):
+        return None
+    return _ERREUR_PERMISSION_BY_LABEL.get(erreur_value.strip())
+
 
+def compact_result_columns(result_df):
+    """Convertit en place les colonnes de statut répétitives en colonnes catégorielles."""
+    for col_name in CATEGORICAL_RESULT_COLUMNS:
+        if col_name in result_df.columns and not isinstance(result_df[col_name].dtype, pd.CategoricalDtype):
+            result_df[col_name] = result_df[col_name].astype('category')
+    return result_df
 
-def get_scopus_data(api_key, query, max_items=2000):
+
+def get_scopus_data(api_key, query, max_items=2000, messages_st=st, failures=None):
+    """
+    Notices Scopus de la requête. failures (liste) reçoit chaque erreur qui a interrompu la récupération :
+    le résultat, alors partiel, ne doit pas être conservé comme complet.
+    """
+    failures = [] if failures is None else failures
     found_items_num = -1 
     start_item = 0
     items_per_query = 25 
@@ -66,7 +189,8 @@ def get_scopus_data(api_key, query, max_items=2000):
             resp.raise_for_status()  
             data = resp.json()
         except requests.exceptions.RequestException as e:
-            st.error(f"Erreur lors de la requête Scopus (start_item: {start_item}): {e}")
+            messages_st.error(f"Erreur lors de la requête Scopus (start_item: {start_item}): {e}")
+            failures.append(f"Scopus (start_item: {start_item}): {e}")
             return results_json 
 
         search_results = data.get('search-results', {})
@@ -75,10 +199,11 @@ def get_scopus_data(api_key, query, max_items=2000):
             try:
                 found_items_num = int(search_results.get('opensearch:totalResults', 0))
                 if found_items_num == 0:
-                    st.info("Aucun résultat trouvé sur Scopus pour cette requête.")
+                    messages_st.info("Aucun résultat trouvé sur Scopus pour cette requête.")
                     return []
             except (ValueError, TypeError):
-                st.error("Réponse inattendue de Scopus (totalResults non trouvé ou invalide).")
+                messages_st.error("Réponse inattendue de Scopus (totalResults non trouvé ou invalide).")
+                failures.append("Scopus : totalResults non trouvé ou invalide")
                 return []
         
         entries = search_results.get('entry')
@@ -87,7 +212,8 @@ def get_scopus_data(api_key, query, max_items=2000):
             processed_items += len(entries)
         else: 
             if found_items_num > 0 and not entries and start_item < found_items_num :
-                 st.warning(f"Scopus: {found_items_num} résultats attendus, mais 'entry' est vide à start_item {start_item}. Arrêt.")
+                 messages_st.warning(f"Scopus: {found_items_num} résultats attendus, mais 'entry' est vide à start_item {start_item}. Arrêt.")
+                 failures.append(f"Scopus : 'entry' vide à start_item {start_item}")
             break 
 
         start_item += items_per_query
@@ -97,7 +223,9 @@ def get_scopus_data(api_key, query, max_items=2000):
 
     return results_json[:max_items]
 
-def get_openalex_data(query, max_items=2000):
+def get_openalex_data(query, max_items=2000, messages_st=st, failures=None):
+    """Notices OpenAlex de la requête ; failures comme pour get_scopus_data."""
+    failures = [] if failures is None else failures
     url = 'https://api.openalex.org/works'
     email = "laurent.jonchere@univ-rennes.fr" 
     params = {'filter': query, 'per-page': 200, 'mailto': email} 
@@ -127,15 +255,17 @@ def get_openalex_data(query, max_items=2000):
             
             except requests.exceptions.RequestException as e:
                 current_try += 1
-                st.warning(f"Erreur OpenAlex (tentative {current_try}/{retries}): {e}. Réessai...")
+                messages_st.warning(f"Erreur OpenAlex (tentative {current_try}/{retries}): {e}. Réessai...")
                 if current_try >= retries:
-                    st.error(f"Échec de la récupération des données OpenAlex après {retries} tentatives.")
+                    messages_st.error(f"Échec de la récupération des données OpenAlex après {retries} tentatives.")
+                    failures.append(f"OpenAlex : {e}")
                     return results_json[:max_items] 
             except json.JSONDecodeError:
                 current_try +=1
-                st.warning(f"Erreur de décodage JSON OpenAlex (tentative {current_try}/{retries}). Réessai...")
+                messages_st.warning(f"Erreur de décodage JSON OpenAlex (tentative {current_try}/{retries}). Réessai...")
                 if current_try >= retries:
-                    st.error("Échec du décodage JSON OpenAlex.")
+                    messages_st.error("Échec du décodage JSON OpenAlex.")
+                    failures.append("OpenAlex : réponse JSON invalide")
                     return results_json[:max_items]
         
         if current_try >= retries: 
@@ -144,7 +274,9 @@ def get_openalex_data(query, max_items=2000):
     return results_json[:max_items] 
 
 
-def get_pubmed_data(query, max_items=1000):
+def get_pubmed_data(query, max_items=1000, messages_st=st, failures=None):
+    """Notices PubMed de la requête ; failures comme pour get_scopus_data."""
+    failures = [] if failures is None else failures
     fetch = PubMedFetcher()
     data = []
     try:
@@ -170,19 +302,21 @@ def get_pubmed_data(query, max_items=1000):
                 err_msg = str(e_article).lower()
                 # 🔸 Si PubMed renvoie un message de surcharge (ajouté par Laurent)
                 if "too many requests" in err_msg or "429" in err_msg:
-                    st.warning("⚠️ Trop de requêtes PubMed détectées. Pause de 5 secondes...")
+                    messages_st.warning("⚠️ Trop de requêtes PubMed détectées. Pause de 5 secondes...")
                     time.sleep(5)
                 # 🔸 Autres erreurs : on ralentit un peu (ajouté par Laurent)
                 else:
-                    st.warning(f"Erreur lors de la récupération des détails pour l'article PubMed (PMID: {pmid}): {e_article}")
+                    messages_st.warning(f"Erreur lors de la récupération des détails pour l'article PubMed (PMID: {pmid}): {e_article}")
                     time.sleep(0.5)
+                failures.append(f"PubMed (PMID: {pmid}): {e_article}")
                 data.append({
                     'Data source': 'pubmed', 'Title': "Erreur de récupération", 'doi': None,
                     'id': pmid, 'Source title': "N/A", 'Date': "N/A"
                 })
         return data
     except Exception as e_query:
-        st.error(f"Erreur lors de la requête PMIDs à PubMed: {e_query}")
+        messages_st.error(f"Erreur lors de la requête PMIDs à PubMed: {e_query}")
+        failures.append(f"PubMed : {e_query}")
         return [] 
 
 def convert_to_dataframe(data, source_name):
@@ -211,14 +345,6 @@ def escapeSolrArg(term_to_escape):
     return "".join(list(escapedSeq(term_escaped)))
 
 
-def normalise(text_to_normalise):
-    if not isinstance(text_to_normalise, str):
-        return "" 
-    text_unaccented = unidecode(text_to_normalise)
-    text_alphanum_spaces = re.sub(r'[^\w\s]', ' ', text_unaccented)
-    text_normalised = re.sub(r'\s+', ' ', text_alphanum_spaces).lower().strip()
-    return text_normalised
-
 def compare_inex(norm_title1, norm_title2, threshold_strict=0.9, threshold_short=0.85, short_len_def=20):
     if not norm_title1 or not norm_title2: 
         return False
@@ -230,94 +356,125 @@ def compare_inex(norm_title1, norm_title2, threshold_strict=0.9, threshold_short
     return bool(matches)
 
 
-def ex_in_coll(original_title_to_check, collection_df):
+def build_hal_titles_df(collection_df):
+    """
+    Table des titres (Titres, nti, doc_offset) pour un DataFrame de collection qui n'a pas
+    été produit avec sa table de titres (ancien format à une ligne par titre, par exemple).
+    """
     if 'Titres' not in collection_df.columns or collection_df.empty:
+        return pd.DataFrame(columns=HAL_TITLES_COLUMNS)
+    titles_list = collection_df['Titres'].tolist()
+    nti_list = collection_df['nti'].tolist() if 'nti' in collection_df.columns else normalise_many(titles_list)
+    return pd.DataFrame({'Titres': titles_list, 'nti': nti_list, 'doc_offset': range(len(titles_list))})
+
+
+def _collection_match(statut_code, matched_title, collection_df, doc_offset):
+    row = collection_df.iloc[int(doc_offset)]
+    return [
+        statut_code,
+        matched_title, 
+        row.get('Hal_ids', ''),
+        row.get('Types de dépôts', ''),
+        row.get('HAL Link', ''), 
+        row.get('HAL Ext ID', ''),
+        row.get('HAL_URI', '') 
+    ]
+
+
+def ex_in_coll(original_title_to_check, collection_df, hal_titles_df=None):
+    if hal_titles_df is None:
+        hal_titles_df = build_hal_titles_df(collection_df)
+    if hal_titles_df.empty or collection_df.empty:
         return False 
     
-    match_df = collection_df[collection_df['Titres'] == original_title_to_check]
+    match_df = hal_titles_df[hal_titles_df['Titres'] == original_title_to_check]
     if not match_df.empty:
-        row = match_df.iloc[0]
-        return [
-            "Titre trouvé dans la collection : probablement déjà présent",
-            original_title_to_check, 
-            row.get('Hal_ids', ''),
-            row.get('Types de dépôts', ''),
-            row.get('HAL Link', ''), 
-            row.get('HAL Ext ID', ''),
-            row.get('HAL_URI', '') 
-        ]
+        return _collection_match(StatutHAL.TITRE_DANS_COLLECTION, original_title_to_check,
+                                 collection_df, match_df['doc_offset'].iat[0])
     return False
 
-def inex_in_coll(normalised_title_to_check, original_title, collection_df):
-    if 'nti' not in collection_df.columns or collection_df.empty:
+
+def inex_in_coll(normalised_title_to_check, original_title, collection_df, hal_titles_df=None):
+    if hal_titles_df is None:
+        hal_titles_df = build_hal_titles_df(collection_df)
+    if hal_titles_df.empty or collection_df.empty:
         return False
         
-    for idx, hal_title_norm_from_coll in enumerate(collection_df['nti']):
+    for idx, hal_title_norm_from_coll in enumerate(hal_titles_df['nti']):
         if compare_inex(normalised_title_to_check, hal_title_norm_from_coll): 
-            row = collection_df.iloc[idx]
-            return [
-                "Titre approchant trouvé dans la collection : à vérifier",
-                row.get('Titres', ''), 
-                row.get('Hal_ids', ''),
-                row.get('Types de dépôts', ''),
-                row.get('HAL Link', ''), 
-                row.get('HAL Ext ID', ''),
-                row.get('HAL_URI', '') 
-            ]
+            return _collection_match(StatutHAL.TITRE_APPROCHANT_COLLECTION, hal_titles_df['Titres'].iat[idx],
+                                     collection_df, hal_titles_df['doc_offset'].iat[idx])
     return False
 
 
-def in_hal(title_solr_escaped_exact, original_title_to_check):
-    default_return = ["Hors HAL", original_title_to_check, "", "", "", "", ""]
+def _hal_doc_to_statut(statut_code, hal_doc):
+    return [
+        statut_code,
+        hal_doc.get('title_s', [""])[0], 
+        hal_doc.get('docid', ''),
+        hal_doc.get('submitType_s', ''),
+        hal_doc.get('linkExtUrl_s', ''), 
+        hal_doc.get('linkExtId_s', ''),
+        hal_doc.get('uri_s', '') 
+    ]
+
+
+def _match_hal_title_docs(hal_docs, original_title_to_check, title_orig_norm=None):
+    """
+    Évalue localement des documents HAL pour un titre : correspondance exacte sur title_s,
+    sinon correspondance approchante (compare_inex). Retourne le statut ou None.
+    """
+    for hal_doc in hal_docs:
+        if any(original_title_to_check == hal_title for hal_title in hal_doc.get('title_s', [])):
+            return _hal_doc_to_statut(StatutHAL.TITRE_HORS_COLLECTION, hal_doc)
+
+    if title_orig_norm is None:
+        title_orig_norm = normalise(original_title_to_check)
+    for hal_doc in hal_docs:
+        if any(compare_inex(title_orig_norm, normalise(hal_title)) for hal_title in hal_doc.get('title_s', [])):
+            return _hal_doc_to_statut(StatutHAL.TITRE_APPROCHANT_HORS_COLLECTION, hal_doc)
+    return None
+
+
+def in_hal(title_solr_escaped_exact, original_title_to_check, messages_st=st, failures=None):
+    """Statut du titre dans tout HAL ; en cas d'erreur, HORS_HAL par défaut et le titre est ajouté à failures."""
+    default_return = [StatutHAL.HORS_HAL, original_title_to_check, "", "", "", "", ""]
     try:
-        query_exact = f'title_t:({title_solr_escaped_exact})' 
+        # Une seule requête : les correspondances exacte et approchante sont évaluées localement
+        query_title = f'title_t:({title_solr_escaped_exact})' 
         
-        r_exact_req = requests.get(f"{HAL_API_ENDPOINT}?q={query_exact}&rows=1&fl={HAL_FIELDS_TO_FETCH}", timeout=10)
-        r_exact_req.raise_for_status()
-        r_exact_json = r_exact_req.json()
+        r_req = requests.get(f"{HAL_API_ENDPOINT}?q={query_title}&rows={HAL_TITLE_ROWS}&fl={HAL_FIELDS_TO_FETCH}", timeout=10)
+        r_req.raise_for_status()
+        r_json = r_req.json()
         
-        if r_exact_json.get('response', {}).get('numFound', 0) > 0:
-            doc_exact = r_exact_json['response']['docs'][0]
-            if any(original_title_to_check == hal_title for hal_title in doc_exact.get('title_s', [])):
-                return [
-                    "Titre trouvé dans HAL mais hors de la collection : affiliation probablement à corriger",
-                    doc_exact.get('title_s', [""])[0],
-                    doc_exact.get('docid', ''),
-                    doc_exact.get('submitType_s', ''),
-                    doc_exact.get('linkExtUrl_s', ''), 
-                    doc_exact.get('linkExtId_s', ''),
-                    doc_exact.get('uri_s', '') 
-                ]
-
-        query_approx = f'title_t:({escapeSolrArg(original_title_to_check)})'
-
-        r_approx_req = requests.get(f"{HAL_API_ENDPOINT}?q={query_approx}&rows=1&fl={HAL_FIELDS_TO_FETCH}", timeout=10)
-        r_approx_req.raise_for_status()
-        r_approx_json = r_approx_req.json()
-
-        if r_approx_json.get('response', {}).get('numFound', 0) > 0:
-            doc_approx = r_approx_json['response']['docs'][0]
-            title_orig_norm = normalise(original_title_to_check)
-            if any(compare_inex(title_orig_norm, normalise(hal_title)) for hal_title in doc_approx.get('title_s', [])):
-                return [
-                    "Titre approchant trouvé dans HAL mais hors de la collection : vérifier les affiliations",
-                    doc_approx.get('title_s', [""])[0],
-                    doc_approx.get('docid', ''),
-                    doc_approx.get('submitType_s', ''),
-                    doc_approx.get('linkExtUrl_s', ''), 
-                    doc_approx.get('linkExtId_s', ''),
-                    doc_approx.get('uri_s', '') 
-                ]
+        if r_json.get('response', {}).get('numFound', 0) > 0:
+            hal_title_result = _match_hal_title_docs(r_json['response']['docs'], original_title_to_check)
+            if hal_title_result:
+                return hal_title_result
     except requests.exceptions.RequestException as e:
-        _display_long_warning("Erreur de requête à l'API HAL", "titre", original_title_to_check, e)
+        _display_long_warning("Erreur de requête à l'API HAL", "titre", original_title_to_check, e, messages_st=messages_st)
+        if failures is not None: failures.append(original_title_to_check)
     except (KeyError, IndexError, json.JSONDecodeError) as e_json:
-        _display_long_warning("Structure de réponse HAL inattendue ou erreur JSON", "titre", original_title_to_check, e_json)
+        _display_long_warning("Structure de réponse HAL inattendue ou erreur JSON", "titre", original_title_to_check, e_json, messages_st=messages_st)
+        if failures is not None: failures.append(original_title_to_check)
     
     return default_return
 
 
-def statut_titre(title_to_check, collection_df):
-    default_return_statut = ["Titre invalide", "", "", "", "", "", ""]
+def statut_titre(title_to_check, collection_df, hal_title_results=None, hal_titles_df=None, messages_st=st, failures=None):
+    res_coll = statut_titre_collection(title_to_check, collection_df, hal_titles_df=hal_titles_df)
+    if res_coll:
+        return res_coll
+
+    if hal_title_results is not None and title_to_check in hal_title_results:
+        return hal_title_results[title_to_check]
+    res_hal_global = in_hal(escapeSolrArg(title_to_check), title_to_check, messages_st=messages_st, failures=failures)
+    return res_hal_global
+
+
+def statut_titre_collection(title_to_check, collection_df, hal_titles_df=None):
+    """Partie locale de statut_titre (titre invalide, titre exact ou approchant dans la collection), sinon False."""
+    default_return_statut = [StatutHAL.TITRE_INVALIDE, "", "", "", "", "", ""]
     if not isinstance(title_to_check, str) or not title_to_check.strip():
         return default_return_statut
 
@@ -335,20 +492,152 @@ def statut_titre(title_to_check, collection_df):
 
     title_normalised = normalise(processed_title_for_norm) 
 
-    res_ex_coll = ex_in_coll(original_title, collection_df)
+    if hal_titles_df is None:
+        hal_titles_df = build_hal_titles_df(collection_df)
+
+    res_ex_coll = ex_in_coll(original_title, collection_df, hal_titles_df)
     if res_ex_coll: 
         return res_ex_coll
 
-    res_inex_coll = inex_in_coll(title_normalised, original_title, collection_df)
+    res_inex_coll = inex_in_coll(title_normalised, original_title, collection_df, hal_titles_df)
     if res_inex_coll: 
         return res_inex_coll
-        
-    res_hal_global = in_hal(escapeSolrArg(original_title), original_title) 
-    return res_hal_global
+    return False
+
+
+def _fetch_hal_titles_chunk(titles_chunk):
+    # Même clause que in_hal pour chaque titre, reliées par OR
+    or_query = " OR ".join(f'title_t:({escapeSolrArg(title_item)})' for title_item in titles_chunk)
+    query_params = {'q': or_query, 'rows': HAL_TITLE_BATCH_ROWS, 'fl': HAL_FIELDS_TO_FETCH, 'wt': 'json'}
+    response = requests.get(HAL_API_ENDPOINT, params=query_params, timeout=30)
+    response.raise_for_status()
+    response_json = response.json().get('response', {})
+    return response_json.get('docs', []), response_json.get('numFound', 0)
+
+
+def in_hal_batch(titles_to_check, batch_size=HAL_TITLE_BATCH_SIZE, messages_st=st, failures=None):
+    """
+    Version groupée de in_hal : plusieurs titres par requête HAL (clauses title_t reliées par OR).
+    Les documents renvoyés sont réattribués localement à chaque titre (titre exact, puis compare_inex).
+    Un titre sans correspondance est déclaré hors HAL si la réponse du lot est complète
+    (numFound <= rows) ; sinon (réponse tronquée ou lot en erreur) il est vérifié avec in_hal.
+    Retourne un dict titre -> statut au format de in_hal (failures : voir in_hal).
+    """
+    unique_titles = list(dict.fromkeys(t for t in titles_to_check if isinstance(t, str) and t.strip()))
+    if not unique_titles:
+        return {}
+    titles_chunks = [unique_titles[i:i + batch_size] for i in range(0, len(unique_titles), batch_size)]
+
+    hal_title_results = {}
+    ambiguous_titles = []
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        future_to_chunk = {executor.submit(_fetch_hal_titles_chunk, chunk): chunk for chunk in titles_chunks}
+        for future in tqdm(as_completed(future_to_chunk), total=len(titles_chunks), desc="Recherche groupée des titres dans HAL"):
+            titles_chunk = future_to_chunk[future]
+            try:
+                hal_docs, num_found = future.result()
+            except (requests.exceptions.RequestException, json.JSONDecodeError):
+                ambiguous_titles.extend(titles_chunk)
+                continue
+
+            is_complete_response = num_found <= len(hal_docs)
+            for title_item in titles_chunk:
+                hal_title_result = _match_hal_title_docs(hal_docs, title_item)
+                if hal_title_result:
+                    hal_title_results[title_item] = hal_title_result
+                elif is_complete_response:
+                    hal_title_results[title_item] = [StatutHAL.HORS_HAL, title_item, "", "", "", "", ""]
+                else:
+                    ambiguous_titles.append(title_item)
+
+    for title_item in tqdm(ambiguous_titles, desc="Recherche des titres ambigus dans HAL"):
+        hal_title_results[title_item] = in_hal(escapeSolrArg(title_item), title_item, messages_st=messages_st,
+                                               failures=failures)
+    return hal_title_results
+
+
+def _normalise_doi_key(doi_value):
+    return str(doi_value).lower().strip().replace("https://doi.org/", "")
+
+
+def _fetch_hal_doi_chunk(dois_chunk):
+    or_query = " OR ".join(f'"{escapeSolrArg(doi_item)}"' for doi_item in dois_chunk)
+    query_params = {
+        'q': f'doiId_s:({or_query})',
+        # Un même DOI peut correspondre à plusieurs dépôts HAL
+        'rows': len(dois_chunk) * 3,
+        'fl': HAL_DOI_PRESENCE_FIELDS,
+        'wt': 'json'
+    }
+    response = requests.get(HAL_API_ENDPOINT, params=query_params, timeout=30)
+    response.raise_for_status()
+    response_json = response.json().get('response', {})
+    return response_json.get('docs', []), response_json.get('numFound', 0)
 
 
-def statut_doi(doi_to_check, collection_df):
-    default_return_doi = ["Pas de DOI valide", "", "", "", "", "", ""]
+def hal_doi_presence(dois_to_check, collection_code, chunk_size=HAL_DOI_CHUNK_SIZE, messages_st=st):
+    """
+    Vérifie en une passe la présence d'une liste de DOI dans tout HAL, par lots de requêtes OR.
+    Chaque DOI est classé à partir de collCode_s seul : dans la collection, dans HAL hors
+    de la collection, ou absent de HAL.
+    Retourne un dict doi (minuscule) -> statut au format de statut_doi, ou None si le DOI
+    est absent de HAL. Les DOI des lots en erreur ne figurent pas dans le dict, ni ceux sans
+    document d'un lot dont la réponse est tronquée (numFound > rows) : statut_doi les vérifie
+    alors un par un.
+    """
+    unique_dois = list(dict.fromkeys(_normalise_doi_key(d) for d in dois_to_check if pd.notna(d) and str(d).strip()))
+    if not unique_dois:
+        return {}
+    collection_code_upper = str(collection_code or "").strip().upper()
+    dois_chunks = [unique_dois[i:i + chunk_size] for i in range(0, len(unique_dois), chunk_size)]
+
+    presence_results = {}
+    failed_chunks_count = 0
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        future_to_chunk = {executor.submit(_fetch_hal_doi_chunk, chunk): chunk for chunk in dois_chunks}
+        for future in tqdm(as_completed(future_to_chunk), total=len(dois_chunks), desc="Présence des DOI dans HAL"):
+            dois_chunk = future_to_chunk[future]
+            try:
+                hal_docs, num_found = future.result()
+            except (requests.exceptions.RequestException, json.JSONDecodeError):
+                failed_chunks_count += 1
+                continue
+            is_complete_response = num_found <= len(hal_docs)
+
+            docs_by_doi = {}
+            for hal_doc in hal_docs:
+                hal_doi = hal_doc.get('doiId_s')
+                if isinstance(hal_doi, list):
+                    hal_doi = hal_doi[0] if hal_doi else None
+                if hal_doi:
+                    docs_by_doi.setdefault(_normalise_doi_key(hal_doi), []).append(hal_doc)
+
+            for doi_item in dois_chunk:
+                matching_docs = docs_by_doi.get(doi_item)
+                if not matching_docs:
+                    if is_complete_response:
+                        presence_results[doi_item] = None
+                    continue
+                in_collection_doc = None
+                if collection_code_upper:
+                    in_collection_doc = next(
+                        (hal_doc for hal_doc in matching_docs
+                         if collection_code_upper in (str(code).upper() for code in hal_doc.get('collCode_s', []))),
+                        None
+                    )
+                if in_collection_doc is not None:
+                    presence_results[doi_item] = _hal_doc_to_statut(StatutHAL.DANS_COLLECTION, in_collection_doc)
+                else:
+                    presence_results[doi_item] = _hal_doc_to_statut(StatutHAL.HORS_COLLECTION, matching_docs[0])
+
+    if failed_chunks_count:
+        messages_st.warning(f"Vérification groupée des DOI dans HAL : {failed_chunks_count} lot(s) en erreur, vérification DOI par DOI pour ces lots.")
+    return presence_results
+
+
+def statut_doi(doi_to_check, collection_df, hal_presence=None, messages_st=st, failures=None):
+    """Statut du DOI dans la collection ou dans HAL ; en cas d'erreur, PAS_DE_DOI par défaut et le DOI est ajouté à failures."""
+    default_return_doi = [StatutHAL.PAS_DE_DOI, "", "", "", "", "", ""]
     if pd.isna(doi_to_check) or not str(doi_to_check).strip():
         return default_return_doi
 
@@ -359,7 +648,7 @@ def statut_doi(doi_to_check, collection_df):
         if doi_cleaned_lower in dois_coll_set:
             match_series = collection_df[collection_df['DOIs'].astype(str).str.lower().str.strip() == doi_cleaned_lower].iloc[0]
             return [
-                "Dans la collection",
+                StatutHAL.DANS_COLLECTION,
                 match_series.get('Titres', ''), 
                 match_series.get('Hal_ids', ''),
                 match_series.get('Types de dépôts', ''),
@@ -368,6 +657,11 @@ def statut_doi(doi_to_check, collection_df):
                 match_series.get('HAL_URI', '') 
             ]
 
+    if hal_presence is not None:
+        doi_presence_key = _normalise_doi_key(doi_cleaned_lower)
+        if doi_presence_key in hal_presence:
+            return hal_presence[doi_presence_key] or default_return_doi
+
     solr_doi_query_val = escapeSolrArg(doi_cleaned_lower.replace("https://doi.org/", ""))
     
     try:
@@ -376,20 +670,13 @@ def statut_doi(doi_to_check, collection_df):
         r_json = r_req.json()
         
         if r_json.get('response', {}).get('numFound', 0) > 0:
-            doc = r_json['response']['docs'][0]
-            return [
-                "Dans HAL mais hors de la collection", 
-                doc.get('title_s', [""])[0], 
-                doc.get('docid', ''),
-                doc.get('submitType_s', ''),
-                doc.get('linkExtUrl_s', ''), 
-                doc.get('linkExtId_s', ''),
-                doc.get('uri_s', '') 
-            ]
+            return _hal_doc_to_statut(StatutHAL.HORS_COLLECTION, r_json['response']['docs'][0])
     except requests.exceptions.RequestException as e:
-        _display_long_warning("Erreur de requête à l'API HAL", "DOI", doi_to_check, e)
+        _display_long_warning("Erreur de requête à l'API HAL", "DOI", doi_to_check, e, messages_st=messages_st)
+        if failures is not None: failures.append(doi_to_check)
     except (KeyError, IndexError, json.JSONDecodeError) as e_json:
-        _display_long_warning("Structure de réponse HAL inattendue ou erreur JSON", "DOI", doi_to_check, e_json)
+        _display_long_warning("Structure de réponse HAL inattendue ou erreur JSON", "DOI", doi_to_check, e_json, messages_st=messages_st)
+        if failures is not None: failures.append(doi_to_check)
         
     return default_return_doi 
 
@@ -445,9 +732,41 @@ def query_upw(doi_value):
     return upw_info
 
 
-def enrich_w_upw_parallel(input_df):
+def map_with_row_checkpoint(func, row_keys, checkpoint=None, is_final=None, max_workers=10, desc=None, failures=None):
+    """
+    Résultats de func pour chaque clé (dans l'ordre de row_keys), calculés en parallèle, une seule fois par clé.
+    Avec checkpoint, les clés déjà traitées par un traitement interrompu sont reprises telles quelles
+    et chaque nouveau résultat pour lequel is_final(résultat) est vrai y est enregistré ; les clés des
+    autres (erreurs transitoires) sont ajoutées à failures.
+    """
+    unique_keys = list(dict.fromkeys(row_keys))
+    results_by_key = checkpoint.get_rows(unique_keys) if checkpoint is not None else {}
+    keys_to_compute = [row_key for row_key in unique_keys if row_key not in results_by_key]
+
+    if keys_to_compute:
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(func, row_key): row_key for row_key in keys_to_compute}
+                for future in tqdm(as_completed(futures), total=len(futures), desc=desc):
+                    row_key = futures[future]
+                    result = future.result()
+                    results_by_key[row_key] = result
+                    if is_final is not None and not is_final(result):
+                        if failures is not None:
+                            failures.append(row_key)
+                    elif checkpoint is not None:
+                        checkpoint.save_row(row_key, result)
+        finally:
+            # Même si l'étape est interrompue, les lignes déjà obtenues sont conservées
+            if checkpoint is not None:
+                checkpoint.flush()
+
+    return [results_by_key[row_key] for row_key in row_keys]
+
+
+def enrich_w_upw_parallel(input_df, checkpoint=None, messages_st=st, failures=None):
     if input_df.empty or 'doi' not in input_df.columns:
-        st.warning("DataFrame vide ou colonne 'doi' manquante pour l'enrichissement Unpaywall.")
+        messages_st.warning("DataFrame vide ou colonne 'doi' manquante pour l'enrichissement Unpaywall.")
         upw_cols = ["Statut Unpaywall", "oa_status", "oa_publisher_license", "oa_publisher_link", "oa_repo_link", "publisher", "doi_interroge"]
         for col in upw_cols:
             if col not in input_df.columns:
@@ -459,9 +778,12 @@ def enrich_w_upw_parallel(input_df):
 
     dois_to_query = df_copy['doi'].fillna("").tolist()
 
-    results = []
-    with ThreadPoolExecutor(max_workers=10) as executor: 
-        results = list(tqdm(executor.map(query_upw, dois_to_query), total=len(dois_to_query), desc="Enrichissement Unpaywall"))
+    # Les timeouts et erreurs réseau/HTTP/JSON ne sont pas enregistrés : ces DOI seront réinterrogés à la reprise
+    results = map_with_row_checkpoint(
+        query_upw, dois_to_query, checkpoint=checkpoint,
+        is_final=lambda upw_info: not upw_info["Statut Unpaywall"].startswith(
+            ("timeout", "erreur HTTP", "erreur requête", "erreur JSON")),
+        desc="Enrichissement Unpaywall", failures=failures)
 
     if results:
         upw_results_df = pd.DataFrame(results)
@@ -469,8 +791,9 @@ def enrich_w_upw_parallel(input_df):
             if col not in df_copy.columns: 
                  df_copy[col] = pd.NA 
             df_copy[col] = upw_results_df[col].values 
+        compact_result_columns(df_copy)
     else: 
-        st.info("Aucun résultat d'enrichissement Unpaywall à ajouter.")
+        messages_st.info("Aucun résultat d'enrichissement Unpaywall à ajouter.")
         upw_cols = ["Statut Unpaywall", "oa_status", "oa_publisher_license", "oa_publisher_link", "oa_repo_link", "publisher", "doi_interroge"]
         for col in upw_cols:
             if col not in df_copy.columns:
@@ -479,12 +802,7 @@ def enrich_w_upw_parallel(input_df):
     return df_copy
 
 
-def add_permissions(row_series_data):
-    doi_val = row_series_data.get('doi') 
-    if pd.isna(doi_val) or not str(doi_val).strip():
-        return "DOI manquant pour permissions"
-
-    doi_cleaned_for_api = str(doi_val).strip()
+def _permission_from_api(doi_cleaned_for_api):
     permissions_api_url = f"https://bg.api.oa.works/permissions/{doi_cleaned_for_api}"
     try:
         req = requests.get(permissions_api_url, timeout=15)
@@ -493,71 +811,162 @@ def add_permissions(row_series_data):
         
         best_permission_info = res_json.get("best_permission") 
         if not best_permission_info:
-            return "Aucune permission trouvée (oa.works)"
+            return PermissionRecord(erreur=ErreurPermission.AUCUNE_PERMISSION)
 
     except requests.exceptions.Timeout:
-        return f"Timeout permissions (oa.works) pour DOI {doi_cleaned_for_api}"
+        return PermissionRecord(erreur=ErreurPermission.TIMEOUT)
     except requests.exceptions.HTTPError as e:
         status_code = e.response.status_code if hasattr(e, 'response') and e.response is not None else 'N/A'
         if status_code == 404:
-            return f"Permissions non trouvées (404 oa.works) pour DOI {doi_cleaned_for_api}"
+            return PermissionRecord(erreur=ErreurPermission.NON_TROUVEE)
         elif status_code == 501: 
-            return f"Permissions API non applicable pour ce type de document (501 oa.works) pour DOI {doi_cleaned_for_api}"
+            return PermissionRecord(erreur=ErreurPermission.NON_APPLICABLE)
         else:
-            return f"Erreur HTTP {status_code} permissions (oa.works) pour DOI {doi_cleaned_for_api}: {str(e)}"
+            return PermissionRecord(erreur=ErreurPermission.ERREUR_HTTP, detail=str(status_code))
     except requests.exceptions.RequestException as e:
-        return f"Erreur requête permissions (oa.works) pour DOI {doi_cleaned_for_api}: {type(e).__name__}"
+        return PermissionRecord(erreur=ErreurPermission.ERREUR_REQUETE, detail=type(e).__name__)
     except json.JSONDecodeError:
-        return f"Erreur JSON permissions (oa.works) pour DOI {doi_cleaned_for_api}"
+        return PermissionRecord(erreur=ErreurPermission.ERREUR_JSON)
 
     locations_allowed = best_permission_info.get("locations", [])
     if not any("repository" in str(loc).lower() for loc in locations_allowed):
-        return "Dépôt en archive non listé dans les permissions (oa.works)"
+        return PermissionRecord(erreur=ErreurPermission.DEPOT_NON_LISTE)
 
-    version_allowed = best_permission_info.get("version", "Version inconnue")
-    licence_info = best_permission_info.get("licence", "Licence inconnue")
     embargo_months_val = best_permission_info.get("embargo_months") 
+    return PermissionRecord(
+        version=str(best_permission_info.get("version") or ""),
+        licence=str(best_permission_info.get("licence") or ""),
+        embargo_months=embargo_months_val if isinstance(embargo_months_val, int) else None,
+        archive=True
+    )
+
 
+def add_permissions(row_series_data):
+    doi_val = row_series_data.get('doi') 
+    if pd.isna(doi_val) or not str(doi_val).strip():
+        return PermissionRecord(erreur=ErreurPermission.DOI_MANQUANT)
+
+    doi_cleaned_for_api = str(doi_val).strip()
+    with _PERMISSIONS_CACHE_LOCK:
+        cached_record = _PERMISSIONS_CACHE.get(doi_cleaned_for_api)
+    if cached_record is not None:
+        return cached_record
+
+    record = _permission_from_api(doi_cleaned_for_api)
+    # Les erreurs transitoires (timeout, réseau, HTTP) ne sont pas mises en cache
+    if record.erreur not in _ERREURS_PERMISSION_TRANSITOIRES:
+        with _PERMISSIONS_CACHE_LOCK:
+            while len(_PERMISSIONS_CACHE) >= PERMISSIONS_CACHE_MAX_SIZE:
+                _PERMISSIONS_CACHE.popitem(last=False)
+            _PERMISSIONS_CACHE[doi_cleaned_for_api] = record
+    return record
+
+
+def format_deposit_condition(record, doi_val=""):
+    """Construit le message lisible (colonne deposit_condition) à partir d'un PermissionRecord."""
+    doi_str = str(doi_val).strip() if pd.notna(doi_val) else ""
+    erreur = record.erreur
+    if erreur == ErreurPermission.DOI_MANQUANT:
+        return "DOI manquant pour permissions"
+    if erreur == ErreurPermission.AUCUNE_PERMISSION:
+        return "Aucune permission trouvée (oa.works)"
+    if erreur == ErreurPermission.TIMEOUT:
+        return f"Timeout permissions (oa.works) pour DOI {doi_str}"
+    if erreur == ErreurPermission.NON_TROUVEE:
+        return f"Permissions non trouvées (404 oa.works) pour DOI {doi_str}"
+    if erreur == ErreurPermission.NON_APPLICABLE:
+        return f"Permissions API non applicable pour ce type de document (501 oa.works) pour DOI {doi_str}"
+    if erreur == ErreurPermission.ERREUR_HTTP:
+        return f"Erreur HTTP {record.detail} permissions (oa.works) pour DOI {doi_str}"
+    if erreur == ErreurPermission.ERREUR_REQUETE:
+        return f"Erreur requête permissions (oa.works) pour DOI {doi_str}: {record.detail}"
+    if erreur == ErreurPermission.ERREUR_JSON:
+        return f"Erreur JSON permissions (oa.works) pour DOI {doi_str}"
+    if erreur == ErreurPermission.DEPOT_NON_LISTE:
+        return "Dépôt en archive non listé dans les permissions (oa.works)"
+
+    version_allowed = record.version or "Version inconnue"
+    licence_info = record.licence or "Licence inconnue"
     embargo_display_str = "Pas d'embargo spécifié"
-    if isinstance(embargo_months_val, int):
-        if embargo_months_val == 0:
+    if isinstance(record.embargo_months, int):
+        if record.embargo_months == 0:
             embargo_display_str = "Pas d'embargo"
-        elif embargo_months_val > 0:
-            embargo_display_str = f"{embargo_months_val} mois d'embargo"
+        elif record.embargo_months > 0:
+            embargo_display_str = f"{record.embargo_months} mois d'embargo"
     
-    if isinstance(version_allowed, str) and version_allowed.lower() in ["publishedversion", "acceptedversion"]:
+    if version_allowed.lower() in ["publishedversion", "acceptedversion"]:
         return f"Version autorisée (oa.works): {version_allowed} ; Licence: {licence_info} ; Embargo: {embargo_display_str}"
     
     return f"Info permission (oa.works): {version_allowed} ; {licence_info} ; {embargo_display_str}"
 
 
-def add_permissions_parallel(input_df):
+def _permission_record_from_values(version, licence, embargo_months, archive, erreur, detail):
+    return PermissionRecord(
+        version="" if pd.isna(version) else str(version),
+        licence="" if pd.isna(licence) else str(licence),
+        embargo_months=None if pd.isna(embargo_months) else int(embargo_months),
+        archive=pd.api.types.is_bool(archive) and bool(archive),
+        erreur=to_erreur_permission(erreur),
+        detail="" if pd.isna(detail) else str(detail)
+    )
+
+
+def permission_record_from_row(row_data):
+    """Reconstruit le PermissionRecord d'une ligne de résultats (None si les permissions n'ont pas été récupérées)."""
+    if 'permission_archive' not in row_data.index:
+        return None
+    return _permission_record_from_values(*(row_data.get(col_name) for col_name in PERMISSION_COLUMNS))
+
+
+def render_deposit_conditions(result_df):
+    """Ajoute la colonne lisible deposit_condition (affichage/export) à partir des colonnes de permission."""
+    if result_df.empty or any(col_name not in result_df.columns for col_name in PERMISSION_COLUMNS):
+        return result_df
+    df_copy = result_df.copy()
+    dois = df_copy['doi'].tolist() if 'doi' in df_copy.columns else [""] * len(df_copy)
+    permission_values = zip(*(df_copy[col_name].tolist() for col_name in PERMISSION_COLUMNS))
+    df_copy['deposit_condition'] = [
+        format_deposit_condition(_permission_record_from_values(*values), doi_val)
+        for values, doi_val in zip(permission_values, dois)
+    ]
+    return df_copy
+
+
+def _add_empty_permission_columns(target_df):
+    for col_name in PERMISSION_COLUMNS:
+        if col_name not in target_df.columns:
+            target_df[col_name] = pd.NA
+
+
+def add_permissions_parallel(input_df, checkpoint=None, messages_st=st, failures=None):
     if input_df.empty or 'doi' not in input_df.columns: 
-        st.warning("DataFrame vide ou colonne 'doi' manquante pour l'ajout des permissions.")
-        if 'deposit_condition' not in input_df.columns and not input_df.empty:
-             input_df['deposit_condition'] = pd.NA 
+        messages_st.warning("DataFrame vide ou colonne 'doi' manquante pour l'ajout des permissions.")
+        if not input_df.empty:
+            _add_empty_permission_columns(input_df)
         return input_df
 
     df_copy = input_df.copy() 
-    
-    if 'deposit_condition' not in df_copy.columns:
-        df_copy['deposit_condition'] = pd.NA
 
-    def apply_add_permissions_to_row(row_as_series):
-        return add_permissions(row_as_series)
+    dois = ["" if pd.isna(doi_val) else str(doi_val) for doi_val in df_copy['doi'].tolist()]
 
-    rows_as_series_list = [row_data for _, row_data in df_copy.iterrows()]
-    
-    results = []
-    with ThreadPoolExecutor(max_workers=10) as executor: 
-        results = list(tqdm(executor.map(apply_add_permissions_to_row, rows_as_series_list), total=len(df_copy), desc="Ajout des permissions de dépôt"))
+    results = map_with_row_checkpoint(
+        lambda doi_val: add_permissions({'doi': doi_val}), dois, checkpoint=checkpoint,
+        is_final=lambda record: record.erreur not in _ERREURS_PERMISSION_TRANSITOIRES,
+        desc="Ajout des permissions de dépôt", failures=failures)
 
     if results:
-        df_copy['deposit_condition'] = results
+        df_copy['permission_version'] = [record.version for record in results]
+        df_copy['permission_licence'] = [record.licence for record in results]
+        df_copy['permission_embargo_mois'] = pd.array([record.embargo_months for record in results], dtype="Int64")
+        df_copy['permission_archive'] = [record.archive for record in results]
+        df_copy['permission_erreur'] = pd.Categorical.from_codes(
+            [int(record.erreur) if record.erreur is not None else -1 for record in results],
+            categories=ERREUR_PERMISSION_CATEGORIES
+        )
+        df_copy['permission_detail'] = [record.detail for record in results]
     else: 
-        st.info("Aucun résultat d'ajout de permissions.")
-        if 'deposit_condition' not in df_copy.columns:
-            df_copy['deposit_condition'] = pd.NA
+        messages_st.info("Aucun résultat d'ajout de permissions.")
+        _add_empty_permission_columns(df_copy)
             
     return df_copy
 
@@ -567,6 +976,7 @@ def deduce_todo(row_data):
     has_doi = pd.notna(doi_val) and str(doi_val).strip() != ""
 
     statut_hal_val = str(row_data.get("Statut_HAL", "")).strip()
+    statut_hal_code = to_statut_hal(row_data.get("Statut_HAL"))
     type_depot_hal_val = str(row_data.get("type_dépôt_si_trouvé", "")).strip().lower()
     id_hal_val = str(row_data.get("identifiant_hal_si_trouvé", "")).strip()
     hal_uri_val = str(row_data.get("HAL_URI", "")).strip() 
@@ -574,29 +984,29 @@ def deduce_todo(row_data):
     statut_upw_val = str(row_data.get("Statut Unpaywall", "")).strip().lower()
     oa_repo_link_val = str(row_data.get("oa_repo_link", "") or "").strip()
     oa_publisher_link_val = str(row_data.get("oa_publisher_link", "") or "").strip()
-    deposit_condition_val = str(row_data.get("deposit_condition", "")).lower()
+    permission = permission_record_from_row(row_data) or PermissionRecord()
+    permission_version_val = permission.version.lower() if permission.archive else ""
 
-    is_hal_ok_with_file = (statut_hal_val == "Dans la collection" and type_depot_hal_val == "file") or \
-                          (statut_hal_val == "Titre trouvé dans la collection : probablement déjà présent" and type_depot_hal_val == "file")
+    is_in_collection = statut_hal_code in (StatutHAL.DANS_COLLECTION, StatutHAL.TITRE_DANS_COLLECTION)
+    is_hal_ok_with_file = is_in_collection and type_depot_hal_val == "file"
     
-    needs_hal_creation = (statut_hal_val in ["Hors HAL", "Titre incorrect, probablement absent de HAL"] and not id_hal_val) or \
-                         (statut_hal_val == "Pas de DOI valide" and not id_hal_val)
+    needs_hal_creation = (statut_hal_code in (StatutHAL.HORS_HAL, StatutHAL.TITRE_INCORRECT) and not id_hal_val) or \
+                         (statut_hal_code == StatutHAL.PAS_DE_DOI and not id_hal_val)
 
     is_in_collection_as_notice = (
-        (statut_hal_val == "Dans la collection" or \
-         statut_hal_val == "Titre trouvé dans la collection : probablement déjà présent") and \
+        is_in_collection and \
         type_depot_hal_val == "notice" and \
         id_hal_val
     )
     
-    needs_affiliation_check = statut_hal_val in [
-        "Dans HAL mais hors de la collection",
-        "Titre trouvé dans HAL mais hors de la collection : affiliation probablement à corriger",
-        "Titre approchant trouvé dans HAL mais hors de la collection : vérifier les affiliations"
-    ]
+    needs_affiliation_check = statut_hal_code in (
+        StatutHAL.HORS_COLLECTION,
+        StatutHAL.TITRE_HORS_COLLECTION,
+        StatutHAL.TITRE_APPROCHANT_HORS_COLLECTION
+    )
 
-    can_deposit_published_oaw = "version autorisée (oa.works): publishedversion" in deposit_condition_val
-    can_deposit_accepted_oaw = "version autorisée (oa.works): acceptedversion" in deposit_condition_val
+    can_deposit_published_oaw = permission_version_val == "publishedversion"
+    can_deposit_accepted_oaw = permission_version_val == "acceptedversion"
 
     action_parts = []
     primary_hal_action_taken = False 
@@ -645,7 +1055,7 @@ def deduce_todo(row_data):
         action_parts.append(f"{base_text} {deposit_suggestion}".strip())
 
 
-    elif statut_hal_val == "Titre approchant trouvé dans la collection : à vérifier":
+    elif statut_hal_code == StatutHAL.TITRE_APPROCHANT_COLLECTION:
         primary_hal_action_taken = True
         action_parts.append(f"🧐 Titre approchant dans la collection ({notice_link_text}).") # Removed "Vérifier si c'est une variante..."
         if type_depot_hal_val == "notice" and id_hal_val : # If this approaching title is a notice
@@ -671,7 +1081,7 @@ def deduce_todo(row_data):
         if not primary_hal_action_taken and not is_hal_ok_with_file : primary_hal_action_taken = True
             
     if not primary_hal_action_taken and not is_hal_ok_with_file:
-        if statut_hal_val == "Titre invalide":
+        if statut_hal_code == StatutHAL.TITRE_INVALIDE:
             action_parts.append("❌ Titre considéré invalide par le script. Vérifier/corriger le titre source.")
         # "Titre approchant..." without being a notice was handled above if it's the primary action.
 
@@ -692,7 +1102,7 @@ def deduce_todo(row_data):
         is_oa_path_identified_for_contact = is_specific_deposit_action_formed_using_oaw or \
                                 oa_repo_link_val or \
                                 oa_publisher_link_val or \
-                                any(info_type in deposit_condition_val for info_type in ["501 oa.works", "404 oa.works"]) or \
+                                permission.erreur in (ErreurPermission.NON_APPLICABLE, ErreurPermission.NON_TROUVEE) or \
                                 any("déposer la version" in act for act in action_parts)
 
         if statut_upw_val == "closed" and not is_oa_path_identified_for_contact :
@@ -726,9 +1136,19 @@ def addCaclLinkFormula(pre_url_str, post_url_str, text_for_link):
     return "" 
 
 
-def check_df(input_df_to_check, hal_collection_df, progress_bar_st=None, progress_text_st=None):
+def check_df(input_df_to_check, hal_collection_df, progress_bar_st=None, progress_text_st=None, collection_code=None, hal_titles_df=None, messages_st=st, failures=None):
+    """
+    Situe chaque publication par rapport à HAL (colonnes Statut_HAL, titre_HAL_si_trouvé, etc.).
+    Si collection_code est fourni (chaîne vide = tout HAL), les DOI absents de hal_collection_df
+    sont vérifiés en une passe groupée (hal_doi_presence) au lieu d'une requête par DOI :
+    l'import complet de la collection n'est alors plus nécessaire pour les lignes avec DOI.
+    hal_titles_df est la table des titres de la collection (HalCollImporter.titles_df) ;
+    à défaut, elle est reconstruite à partir de la colonne Titres de hal_collection_df.
+    Les messages (erreurs HAL...) sont affichés avec messages_st : st, ou le JobReporter du traitement.
+    Les DOI et titres dont la vérification a échoué (statut par défaut) sont ajoutés à failures.
+    """
     if input_df_to_check.empty:
-        st.info("Le DataFrame d'entrée pour check_df est vide. Aucune vérification HAL à effectuer.")
+        messages_st.info("Le DataFrame d'entrée pour check_df est vide. Aucune vérification HAL à effectuer.")
         hal_output_cols = ['Statut_HAL', 'titre_HAL_si_trouvé', 'identifiant_hal_si_trouvé', 
                            'type_dépôt_si_trouvé', 'HAL Link', 'HAL Ext ID', 'HAL_URI']
         for col_name in hal_output_cols:
@@ -747,144 +1167,224 @@ def check_df(input_df_to_check, hal_collection_df, progress_bar_st=None, progres
     hal_uris_list = [] 
 
 
+    hal_presence = None
+    if collection_code is not None and 'doi' in df_to_process.columns:
+        dois_in_collection = set()
+        if 'DOIs' in hal_collection_df.columns and not hal_collection_df.empty:
+            dois_in_collection = set(hal_collection_df['DOIs'].dropna().astype(str).str.lower().str.strip())
+        dois_to_check = [
+            doi_item for doi_item in df_to_process['doi'].dropna().astype(str).str.lower().str.strip()
+            if doi_item and doi_item not in dois_in_collection
+        ]
+        hal_presence = hal_doi_presence(dois_to_check, collection_code, messages_st=messages_st)
+
+    if hal_titles_df is None:
+        hal_titles_df = build_hal_titles_df(hal_collection_df)
+
     total_rows_to_process = len(df_to_process)
+    hal_status_results = []
+    pending_hal_titles = {} # titre -> positions des lignes à vérifier dans HAL hors collection
     for index, row_to_check in tqdm(df_to_process.iterrows(), total=total_rows_to_process, desc="Vérification HAL (check_df)"):
         doi_value_from_row = row_to_check.get('doi') 
         title_value_from_row = row_to_check.get('Title') 
 
-        hal_status_result = ["Pas de DOI valide", "", "", "", "", "", ""] 
+        hal_status_result = [StatutHAL.PAS_DE_DOI, "", "", "", "", "", ""] 
         
         if pd.notna(doi_value_from_row) and str(doi_value_from_row).strip():
-            hal_status_result = statut_doi(str(doi_value_from_row), hal_collection_df)
+            hal_status_result = statut_doi(str(doi_value_from_row), hal_collection_df, hal_presence=hal_presence, messages_st=messages_st, failures=failures)
         
-        if hal_status_result[0] not in ("Dans la collection", "Dans HAL mais hors de la collection"):
+        if hal_status_result[0] not in (StatutHAL.DANS_COLLECTION, StatutHAL.HORS_COLLECTION):
             if pd.notna(title_value_from_row) and str(title_value_from_row).strip():
-                hal_status_result = statut_titre(str(title_value_from_row), hal_collection_df)
+                title_str = str(title_value_from_row)
+                hal_status_result = statut_titre_collection(title_str, hal_collection_df, hal_titles_df=hal_titles_df)
+                if not hal_status_result:
+                    # Recherche dans tout HAL différée : les titres sont interrogés par lots
+                    pending_hal_titles.setdefault(title_str, []).append(len(hal_status_results))
             elif not (pd.notna(doi_value_from_row) and str(doi_value_from_row).strip()): 
-                hal_status_result = ["Données d'entrée insuffisantes (ni DOI ni Titre)", "", "", "", "", "", ""]
+                hal_status_result = [StatutHAL.DONNEES_INSUFFISANTES, "", "", "", "", "", ""]
+        
+        hal_status_results.append(hal_status_result)
         
-        statuts_hal_list.append(hal_status_result[0])
+        if progress_bar_st is not None and progress_text_st is not None:
+            current_progress_val = (index + 1) / total_rows_to_process
+            progress_bar_st.progress(int(current_progress_val * 100))
+
+    if pending_hal_titles:
+        hal_title_results = in_hal_batch(list(pending_hal_titles), messages_st=messages_st, failures=failures)
+        for title_str, row_positions in pending_hal_titles.items():
+            for row_position in row_positions:
+                hal_status_results[row_position] = hal_title_results[title_str]
+
+    for hal_status_result in hal_status_results:
+        statuts_hal_list.append(int(hal_status_result[0]))
         titres_hal_list.append(hal_status_result[1]) 
         ids_hal_list.append(hal_status_result[2])
         types_depot_hal_list.append(hal_status_result[3])
         links_hal_list.append(hal_status_result[4]) 
         ext_ids_hal_list.append(hal_status_result[5])
         hal_uris_list.append(hal_status_result[6]) 
-        
-        if progress_bar_st is not None and progress_text_st is not None:
-            current_progress_val = (index + 1) / total_rows_to_process
-            progress_bar_st.progress(int(current_progress_val * 100))
 
-    df_to_process['Statut_HAL'] = statuts_hal_list
+    df_to_process['Statut_HAL'] = pd.Categorical.from_codes(statuts_hal_list, categories=STATUT_HAL_CATEGORIES)
     df_to_process['titre_HAL_si_trouvé'] = titres_hal_list
     df_to_process['identifiant_hal_si_trouvé'] = ids_hal_list
     df_to_process['type_dépôt_si_trouvé'] = types_depot_hal_list
     df_to_process['HAL Link'] = links_hal_list 
     df_to_process['HAL Ext ID'] = ext_ids_hal_list
     df_to_process['HAL_URI'] = hal_uris_list 
+    compact_result_columns(df_to_process)
     
     if progress_bar_st: progress_bar_st.progress(100) 
     return df_to_process
 
 
 class HalCollImporter:
-    def __init__(self, collection_code: str, start_year_val=None, end_year_val=None):
+    def __init__(self, collection_code: str, start_year_val=None, end_year_val=None, messages_st=st):
+        self.messages_st = messages_st # st, ou le JobReporter d'un traitement en arrière-plan
         self.collection_code = str(collection_code).strip() if collection_code else "" 
         self.start_year = start_year_val if start_year_val is not None else DEFAULT_START_YEAR
         self.end_year = end_year_val if end_year_val is not None else DEFAULT_END_YEAR 
+        self.year_counts = {} # année -> nombre de documents (facette publicationDateY_i)
+        self.titles_df = pd.DataFrame(columns=HAL_TITLES_COLUMNS) # rempli par import_data
+        self.failures = [] # erreurs d'API du comptage ou de l'import : collection incomplète si non vide
         
         self.num_docs_in_collection = self._get_num_docs()
 
+    def _base_search_url(self):
+        return f"{HAL_API_ENDPOINT}{self.collection_code}/" if self.collection_code else HAL_API_ENDPOINT
+
     def _get_num_docs(self):
         try:
             query_params_count = {
                 'q': '*:*', 
                 'fq': f'publicationDateY_i:[{self.start_year} TO {self.end_year}]',
                 'rows': 0, 
+                'facet': 'true',
+                'facet.field': 'publicationDateY_i',
+                'facet.limit': -1,
+                'facet.mincount': 1,
                 'wt': 'json'
             }
-            base_search_url = f"{HAL_API_ENDPOINT}{self.collection_code}/" if self.collection_code else HAL_API_ENDPOINT
-            
-            response_count = requests.get(base_search_url, params=query_params_count, timeout=15)
+            response_count = requests.get(self._base_search_url(), params=query_params_count, timeout=15)
             response_count.raise_for_status()
-            return response_count.json().get('response', {}).get('numFound', 0)
+            response_json = response_count.json()
+            # Facette Solr : liste à plat [année1, nb1, année2, nb2, ...]
+            year_facet = response_json.get('facet_counts', {}).get('facet_fields', {}).get('publicationDateY_i', [])
+            self.year_counts = {int(year): int(count) for year, count in zip(year_facet[::2], year_facet[1::2])}
+            return response_json.get('response', {}).get('numFound', 0)
         except requests.exceptions.RequestException as e:
-            st.error(f"Erreur API HAL (comptage) pour '{self.collection_code or 'HAL global'}': {e}")
+            self.messages_st.error(f"Erreur API HAL (comptage) pour '{self.collection_code or 'HAL global'}': {e}")
+            self.failures.append(f"HAL (comptage) : {e}")
             return 0
-        except (KeyError, json.JSONDecodeError):
-            st.error(f"Réponse API HAL (comptage) inattendue pour '{self.collection_code or 'HAL global'}'.")
+        except (KeyError, ValueError, json.JSONDecodeError):
+            self.messages_st.error(f"Réponse API HAL (comptage) inattendue pour '{self.collection_code or 'HAL global'}'.")
+            self.failures.append("HAL (comptage) : réponse inattendue")
             return 0
 
-    def import_data(self):
-        expected_cols = ['Hal_ids', 'DOIs', 'Titres', 'Types de dépôts', 
-                         'HAL Link', 'HAL Ext ID', 'HAL_URI', 'nti']
-        if self.num_docs_in_collection == 0:
-            st.info(f"Aucun document trouvé pour la collection '{self.collection_code or 'HAL global'}' entre {self.start_year} et {self.end_year}.")
-            return pd.DataFrame(columns=expected_cols)
+    def _partition_filters(self):
+        """Une partition (filtre fq) par année ; à défaut de facette, une seule partition sur l'intervalle."""
+        year_counts_total = sum(self.year_counts.values())
+        if self.year_counts and year_counts_total == self.num_docs_in_collection:
+            return [f'publicationDateY_i:{year}' for year in sorted(self.year_counts, key=self.year_counts.get, reverse=True)]
+        return [f'publicationDateY_i:[{self.start_year} TO {self.end_year}]']
 
-        all_docs_list = []
+    def _import_partition(self, partition_fq, pbar_hal):
+        """Parcourt la chaîne de curseurs d'une partition. Retourne (documents, message d'erreur ou None)."""
+        partition_docs = []
         rows_per_api_page = 1000 
         current_api_cursor = "*" 
+        while True:
+            query_params_page = {
+                'q': '*:*',
+                'fq': partition_fq,
+                'fl': HAL_FIELDS_TO_FETCH, 
+                'rows': rows_per_api_page,
+                'sort': 'docid asc', 
+                'cursorMark': current_api_cursor,
+                'wt': 'json'
+            }
+            try:
+                response_page = requests.get(self._base_search_url(), params=query_params_page, timeout=45) 
+                response_page.raise_for_status()
+                data_page = response_page.json()
+            except requests.exceptions.RequestException as e:
+                return partition_docs, f"Erreur API HAL (import page, {partition_fq}, curseur {current_api_cursor}): {e}"
+            except json.JSONDecodeError:
+                return partition_docs, f"Erreur décodage JSON (import page HAL, {partition_fq}, curseur {current_api_cursor})."
+
+            docs_on_current_page = data_page.get('response', {}).get('docs', [])
+            if not docs_on_current_page: 
+                break
+            partition_docs.extend(docs_on_current_page)
+            pbar_hal.update(len(docs_on_current_page)) 
+
+            next_api_cursor = data_page.get('nextCursorMark')
+            if current_api_cursor == next_api_cursor or not next_api_cursor:
+                break
+            current_api_cursor = next_api_cursor
+        return partition_docs, None
+
+    def import_data(self, progress_bar_st=None):
+        """
+        Retourne un DataFrame à une ligne par document (Titres = premier titre).
+        Tous les titres (traductions comprises) sont dans self.titles_df, avec leur forme
+        normalisée (nti) et la position du document (doc_offset).
+        """
+        expected_cols = HAL_COLLECTION_COLUMNS
+        self.titles_df = pd.DataFrame(columns=HAL_TITLES_COLUMNS)
+        if self.num_docs_in_collection == 0:
+            self.messages_st.info(f"Aucun document trouvé pour la collection '{self.collection_code or 'HAL global'}' entre {self.start_year} et {self.end_year}.")
+            return pd.DataFrame(columns=expected_cols)
 
-        base_search_url = f"{HAL_API_ENDPOINT}{self.collection_code}/" if self.collection_code else HAL_API_ENDPOINT
-
+        # Les partitions (une par année) sont importées en parallèle, chacune avec sa chaîne de curseurs
+        hal_docs = []
+        partition_errors = []
         with tqdm(total=self.num_docs_in_collection, desc=f"Import HAL ({self.collection_code or 'Global'})") as pbar_hal:
-            while True:
-                query_params_page = {
-                    'q': '*:*',
-                    'fq': f'publicationDateY_i:[{self.start_year} TO {self.end_year}]',
-                    'fl': HAL_FIELDS_TO_FETCH, 
-                    'rows': rows_per_api_page,
-                    'sort': 'docid asc', 
-                    'cursorMark': current_api_cursor,
-                    'wt': 'json'
-                }
-                try:
-                    response_page = requests.get(base_search_url, params=query_params_page, timeout=45) 
-                    response_page.raise_for_status()
-                    data_page = response_page.json()
-                except requests.exceptions.RequestException as e:
-                    st.error(f"Erreur API HAL (import page, curseur {current_api_cursor}): {e}")
-                    break 
-                except json.JSONDecodeError:
-                    st.error(f"Erreur décodage JSON (import page HAL, curseur {current_api_cursor}).")
-                    break
-
-                docs_on_current_page = data_page.get('response', {}).get('docs', [])
-                if not docs_on_current_page: 
-                    break
-
-                for doc_data in docs_on_current_page:
-                    hal_titles_list = doc_data.get('title_s', [""]) 
-                    if not isinstance(hal_titles_list, list): hal_titles_list = [str(hal_titles_list)] 
-
-                    for title_item in hal_titles_list:
-                        all_docs_list.append({
-                            'Hal_ids': doc_data.get('docid', ''),
-                            'DOIs': str(doc_data.get('doiId_s', '')).lower() if doc_data.get('doiId_s') else '', 
-                            'Titres': str(title_item), 
-                            'Types de dépôts': doc_data.get('submitType_s', ''),
-                            'HAL Link': doc_data.get('linkExtUrl_s', ''), 
-                            'HAL Ext ID': doc_data.get('linkExtId_s', ''),
-                            'HAL_URI': doc_data.get('uri_s', '') 
-                        })
-                pbar_hal.update(len(docs_on_current_page)) 
-
-                next_api_cursor = data_page.get('nextCursorMark')
-                if current_api_cursor == next_api_cursor or not next_api_cursor:
-                    break
-                current_api_cursor = next_api_cursor
+            with ThreadPoolExecutor(max_workers=HAL_IMPORT_MAX_WORKERS) as executor:
+                partition_futures = [executor.submit(self._import_partition, partition_fq, pbar_hal)
+                                     for partition_fq in self._partition_filters()]
+                for future in as_completed(partition_futures):
+                    partition_docs, error_message = future.result()
+                    hal_docs.extend(partition_docs)
+                    if error_message:
+                        partition_errors.append(error_message)
+                    if progress_bar_st is not None:
+                        progress_bar_st.progress(min(int(len(hal_docs) / self.num_docs_in_collection * 100), 100))
+
+        for error_message in partition_errors:
+            self.messages_st.error(error_message)
+        self.failures.extend(partition_errors)
+
+        # Même ordre que l'import séquentiel (docid croissant)
+        hal_docs.sort(key=lambda doc_data: int(doc_data.get('docid', 0) or 0))
+
+        doc_rows = {col_name: [] for col_name in expected_cols}
+        titles_list = []
+        titles_doc_offsets = []
+        for doc_offset, doc_data in enumerate(hal_docs):
+            hal_titles_list = doc_data.get('title_s', [""]) 
+            if not isinstance(hal_titles_list, list): hal_titles_list = [str(hal_titles_list)] 
+            if not hal_titles_list: hal_titles_list = [""]
+
+            doc_rows['Hal_ids'].append(doc_data.get('docid', ''))
+            doc_rows['DOIs'].append(str(doc_data.get('doiId_s', '')).lower() if doc_data.get('doiId_s') else '')
+            doc_rows['Titres'].append(str(hal_titles_list[0]))
+            doc_rows['Types de dépôts'].append(doc_data.get('submitType_s', ''))
+            doc_rows['HAL Link'].append(doc_data.get('linkExtUrl_s', ''))
+            doc_rows['HAL Ext ID'].append(doc_data.get('linkExtId_s', ''))
+            doc_rows['HAL_URI'].append(doc_data.get('uri_s', ''))
+
+            titles_list.extend(str(title_item) for title_item in hal_titles_list)
+            titles_doc_offsets.extend([doc_offset] * len(hal_titles_list))
         
-        if not all_docs_list: 
+        if not hal_docs: 
              return pd.DataFrame(columns=expected_cols)
 
-        df_collection_hal = pd.DataFrame(all_docs_list)
-        if 'Titres' in df_collection_hal.columns:
-            df_collection_hal['nti'] = df_collection_hal['Titres'].apply(normalise)
-        else: 
-            df_collection_hal['nti'] = ""
-            
-        return df_collection_hal
+        self.titles_df = pd.DataFrame({
+            'Titres': titles_list,
+            'nti': normalise_many(titles_list),
+            'doc_offset': pd.array(titles_doc_offsets, dtype='int32'),
+        })
+        return pd.DataFrame(doc_rows)
 
 
 def merge_rows_with_sources(grouped_data):
@@ -959,21 +1459,16 @@ def get_authors_from_crossref(doi_value):
     return author_names_list
 
 
-def normalize_name(name_to_normalize):
-    if not isinstance(name_to_normalize, str): return ""
-    
-    name_lower = name_to_normalize.strip().lower()
-    name_unaccented = ''.join(c for c in unicodedata.normalize('NFD', name_lower) 
-                              if unicodedata.category(c) != 'Mn')
-    name_cleaned_spaces = name_unaccented.replace('-', ' ').replace('.', ' ')
-    name_single_spaced = re.sub(r'\s+', ' ', name_cleaned_spaces).strip()
-
-    if ',' in name_single_spaced:
-        parts = [part.strip() for part in name_single_spaced.split(',', 1)]
-        if len(parts) == 2 and parts[0] and parts[1]: 
-            return f"{parts[1]} {parts[0]}"
-            
-    return name_single_spaced
+def get_authors_from_crossref_parallel(dois, checkpoint=None, failures=None):
+    """
+    Auteurs Crossref de chaque DOI (mêmes résultats que get_authors_from_crossref). Les erreurs et les
+    listes vides (notice Crossref incomplète) ne sont pas enregistrées dans checkpoint ; leurs DOI vont à failures.
+    """
+    dois = ["" if pd.isna(doi_val) else str(doi_val) for doi_val in dois]
+    return map_with_row_checkpoint(
+        get_authors_from_crossref, dois, checkpoint=checkpoint,
+        is_final=lambda author_list: bool(author_list) and not any("Erreur" in str(a) or "Timeout" in str(a) for a in author_list),
+        desc="Récupération auteurs Crossref", failures=failures)
 
 
 def get_initial_form(normalised_author_name):
@@ -1022,3 +1517,72 @@ def extract_authors_from_openalex_json(openalex_json):
 
     return authors_list
 
+
+
+TEI_DEPOSIT_ACTION = "Créer la notice" # commun aux actions de deduce_todo menant à un dépôt de notice
+
+
+def openalex_doi_key(doi_value):
+    """DOI normalisé comme la colonne 'doi' des applications (sans préfixe https://doi.org/, minuscules)."""
+    if not isinstance(doi_value, str):
+        return ""
+    return clean_doi(doi_value).lower().strip()
+
+
+def _tei_author_from_openalex(openalex_author):
+    """Auteur d'extract_authors_from_openalex_json au format de hal_xml_export (prénom/nom séparés, ORCID nu)."""
+    author_name = openalex_author["raw_author_name"].strip()
+    if ',' in author_name:
+        surname, forename = [part.strip() for part in author_name.split(',', 1)]
+    else:
+        forename, _, surname = author_name.rpartition(' ')
+    orcid = openalex_author["orcid"].rstrip('/').rsplit('/', 1)[-1] if openalex_author["orcid"] else ""
+    return {"forename": forename, "surname": surname, "orcid": orcid,
+            "affiliations": openalex_author["raw_affiliations"]}
+
+
+def build_openalex_authorship_table(openalex_records):
+    """
+    Table annexe DOI -> métadonnées TEI (auteurs, affiliations, revue, éditeur, PMID), construite
+    pendant la moisson OpenAlex, avant que les colonnes brutes (authorships...) ne soient abandonnées.
+    """
+    authorship_table = {}
+    for record in openalex_records:
+        doi_key = openalex_doi_key(record.get("doi"))
+        if not doi_key:
+            continue
+        authors = [_tei_author_from_openalex(author) for author in extract_authors_from_openalex_json(record)]
+        source = (record.get("primary_location") or {}).get("source") or {}
+        pmid = (record.get("ids") or {}).get("pmid") or ""
+        authorship_table[doi_key] = {
+            "Title": record.get("title") or "",
+            "Date": record.get("publication_date") or "",
+            "Source title": source.get("display_name") or "",
+            "publisher": source.get("host_organization_name") or "",
+            "pubmed": pmid.rstrip('/').rsplit('/', 1)[-1],
+            "keywords": [kw.get("display_name") for kw in record.get("keywords") or [] if kw.get("display_name")],
+            "authors": authors,
+            "raw_affiliations": list(dict.fromkeys(aff for author in authors for aff in author["affiliations"])),
+        }
+    return authorship_table
+
+
+def build_deposit_publications(result_df, authorship_table):
+    """
+    (id_pub, publication) pour hal_xml_export.generate_zip_from_xmls, pour chaque ligne dont
+    l'action (deduce_todo) est de créer la notice HAL. Les métadonnées viennent de la table
+    annexe OpenAlex quand le DOI y figure, à défaut des colonnes du DataFrame.
+    """
+    if result_df.empty or 'Action' not in result_df.columns:
+        return []
+    to_deposit = result_df['Action'].fillna('').astype(str).str.contains(TEI_DEPOSIT_ACTION, regex=False)
+    publications = []
+    for row_index, row in result_df[to_deposit].iterrows():
+        doi_key = openalex_doi_key(row.get('doi'))
+        publication = {col_name: ("" if pd.isna(row.get(col_name)) else str(row.get(col_name)))
+                       for col_name in ('Title', 'Date', 'Source title')}
+        publication.update({"doi": doi_key, "publisher": "", "authors": [], "raw_affiliations": []})
+        publication.update({key: value for key, value in authorship_table.get(doi_key, {}).items() if value})
+        pub_id = re.sub(r'[^\w.-]+', '_', doi_key) if doi_key else f"publication_{row_index}"
+        publications.append((pub_id, publication))
+    return publications